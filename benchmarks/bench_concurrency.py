@@ -0,0 +1,72 @@
+"""
+Benchmark de concurrencia: latencia p50/p95/p99 con N clientes simultaneos.
+
+Levantar la API (uvicorn main:app --port 8000) y ejecutar:
+
+    python benchmarks/bench_concurrency.py --url http://localhost:8000 \
+        --token <JWT> --path /appointments --clients 200 --requests 2000
+
+Para comparar antes/despues, correr el mismo comando sobre el commit anterior
+(pymongo sincrono) y sobre el actual (pymongo async) con la misma base de datos.
+Requiere httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[k]
+
+
+async def worker(client: httpx.AsyncClient, path: str, headers: dict, queue: asyncio.Queue, latencies: list, errors: list):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            resp = await client.get(path, headers=headers)
+            if resp.status_code >= 500:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(url: str, path: str, token: str, clients: int, total: int) -> None:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    latencies: list = []
+    errors: list = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, path, headers, queue, latencies, errors) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    print(f"{path}: {len(latencies)} requests, {clients} clients, {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"  p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms "
+          f"p99={percentile(latencies, 99):.1f}ms mean={statistics.fmean(latencies):.1f}ms errors={len(errors)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/appointments")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.path, args.token, args.clients, args.requests))
@@ -0,0 +1,93 @@
+"""
+Load test: un /login lento no debe bloquear el resto del trafico del worker.
+
+1. Levantar un stub del identity toolkit que tarda --delay segundos en responder:
+
+    python benchmarks/bench_login.py stub --port 9099 --delay 2
+
+2. Levantar la API apuntando al stub (un solo worker):
+
+    IDENTITY_TOOLKIT_URL=http://localhost:9099/v1 uvicorn main:app --port 8000
+
+3. Lanzar /login y /services en paralelo y medir la latencia de /services:
+
+    python benchmarks/bench_login.py run --url http://localhost:8000 \
+        --email user@example.com --password secret --logins 20 --requests 500
+
+Con el requests.post sincrono anterior, cada /login congelaba el worker
+--delay segundos y el p99 de /services subia a varios segundos; con el
+cliente async se mantiene igual que sin logins en curso.
+Requiere httpx y uvicorn.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_concurrency import percentile  # noqa: E402
+
+
+def stub_app(delay: float):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(delay)
+        body = b'{"error": {"message": "INVALID_PASSWORD"}}'
+        await send({"type": "http.response.start", "status": 400,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def timed_get(client: httpx.AsyncClient, path: str, latencies: list):
+    start = time.perf_counter()
+    await client.get(path)
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(args) -> None:
+    latencies = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        # primero el /login (que se queda esperando al stub), despues el resto del trafico
+        logins = [
+            asyncio.create_task(client.post("/login", json={"email": args.email, "password": args.password}))
+            for _ in range(args.logins)
+        ]
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        await asyncio.gather(*(timed_get(client, args.path, latencies) for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*logins, return_exceptions=True)
+
+    print(f"{args.path} with {args.logins} slow logins in flight: {len(latencies)} requests in {elapsed:.2f}s")
+    print(f"p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms "
+          f"p99={percentile(latencies, 99):.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia de /services mientras hay /login lentos en curso")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stub = sub.add_parser("stub", help="stub lento del identity toolkit")
+    stub.add_argument("--port", type=int, default=9099)
+    stub.add_argument("--delay", type=float, default=2.0)
+
+    bench = sub.add_parser("run", help="lanza el load test contra la API")
+    bench.add_argument("--url", default="http://localhost:8000")
+    bench.add_argument("--path", default="/services")
+    bench.add_argument("--email", default="user@example.com")
+    bench.add_argument("--password", default="secret")
+    bench.add_argument("--logins", type=int, default=20)
+    bench.add_argument("--requests", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        import uvicorn
+        uvicorn.run(stub_app(args.delay), host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        asyncio.run(run(args))
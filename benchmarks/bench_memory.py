@@ -0,0 +1,104 @@
+"""
+Benchmark de memoria: GET /services como lista vs. en streaming (NDJSON).
+
+Llama a la app ASGI en el mismo proceso con una coleccion falsa que genera
+--rows servicios bajo demanda, como un cursor del servidor, y mide el pico de
+memoria con tracemalloc. El cuerpo se descarta a medida que se envia, asi que
+el pico es el de la respuesta del lado de la API.
+
+    python benchmarks/bench_memory.py --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+
+import controllers.service as service_controller  # noqa: E402
+from main import app  # noqa: E402
+
+
+class FakeCursor:
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    def batch_size(self, n: int):
+        return self
+
+    async def _docs(self):
+        for i in range(self.rows):
+            yield {
+                "_id": ObjectId(),
+                "name": f"servicio {i}",
+                "description": "Instalacion y configuracion de linea telefonica residencial",
+                "price": 100.0 + i % 500,
+                "active": True,
+            }
+
+    def __aiter__(self):
+        return self._docs()
+
+
+class FakeServices:
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self.rows)
+
+
+async def call(path: str, query: str, asgi_app=app) -> int:
+    """GET directo a la app ASGI; devuelve los bytes del cuerpo sin guardarlos."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    size = 0
+    requested = False
+    done = asyncio.Event()
+
+    async def receive():
+        # primero el request; despues (StreamingResponse espera un disconnect) no llega nada mas
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"Unexpected status {message['status']}")
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await asgi_app(scope, receive, send)
+    done.set()
+    return size
+
+
+def peak_mb(path: str, query: str = "") -> tuple:
+    tracemalloc.start()
+    size = asyncio.run(call(path, query))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, size / 1024 / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pico de memoria de /services: lista vs. NDJSON")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    service_controller.coll = FakeServices(args.rows)
+    for label, query in (("list", ""), ("stream", "stream=true")):
+        peak, size = peak_mb("/services", query)
+        print(f"{label:6}  rows={args.rows}  body={size:7.1f}MB  peak={peak:7.1f}MB")
@@ -0,0 +1,58 @@
+"""
+Benchmark: N ordenes con POST /orders (una por request) vs. POST /orders/batch.
+
+Levantar la API (uvicorn main:app --port 8000) y ejecutar con un token de admin
+y una cita existente (las ordenes de prueba quedan guardadas en Orders):
+
+    python benchmarks/bench_orders_batch.py --url http://localhost:8000 \
+        --token <JWT admin> --appointment-id <id> --orders 500 --batch-size 500
+
+Requiere httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def order_payload(appointment_id: str, i: int) -> dict:
+    return {"appointment_id": appointment_id, "subtotal": 100.0 + i % 50}
+
+
+async def one_by_one(client: httpx.AsyncClient, appointment_id: str, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        resp = await client.post("/orders", json=order_payload(appointment_id, i))
+        resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def batched(client: httpx.AsyncClient, appointment_id: str, n: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        batch = [order_payload(appointment_id, i) for i in range(offset, min(n, offset + batch_size))]
+        resp = await client.post("/orders/batch", json=batch)
+        resp.raise_for_status()
+        if resp.json()["failed"]:
+            raise RuntimeError(f"Batch had failures: {resp.json()}")
+    return time.perf_counter() - start
+
+
+async def run(args) -> None:
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=120) as client:
+        single = await one_by_one(client, args.appointment_id, args.orders)
+        batch = await batched(client, args.appointment_id, args.orders, args.batch_size)
+    print(f"POST /orders x{args.orders}: {single:.2f}s ({args.orders / single:.0f} orders/s)")
+    print(f"POST /orders/batch: {batch:.2f}s ({args.orders / batch:.0f} orders/s, {single / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ordenes una a una vs. en lote")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--appointment-id", required=True)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
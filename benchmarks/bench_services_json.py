@@ -0,0 +1,59 @@
+"""
+Benchmark de serializacion: GET /services con --rows servicios.
+
+Compara la ruta anterior (un Service por documento, response_model y
+jsonable_encoder) con la actual (documentos proyectados escritos con orjson).
+Ambas leen de la misma coleccion falsa de bench_memory y se llaman en el mismo
+proceso, asi que la diferencia es solo validacion + serializacion.
+
+    python benchmarks/bench_services_json.py --rows 10000 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+from fastapi import FastAPI  # noqa: E402
+
+import controllers.service as service_controller  # noqa: E402
+from bench_memory import FakeServices, call  # noqa: E402
+from main import app  # noqa: E402
+from models.service import Service  # noqa: E402
+
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/services", response_model=list[Service])
+async def legacy_services() -> list[Service]:
+    # la implementacion previa de get_services
+    services = []
+    async for doc in service_controller.coll.find({}):
+        doc["id"] = str(doc["_id"])
+        del doc["_id"]
+        services.append(Service(**doc))
+    return services
+
+
+async def run(asgi_app, requests: int) -> tuple:
+    start = time.perf_counter()
+    size = 0
+    for _ in range(requests):
+        size = await call("/services", "", asgi_app)
+    return time.perf_counter() - start, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/services: modelos Pydantic vs. orjson directo")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    service_controller.coll = FakeServices(args.rows)
+    for label, asgi_app in (("models", legacy_app), ("orjson", app)):
+        elapsed, size = asyncio.run(run(asgi_app, args.requests))
+        print(f"{label:6}  rows={args.rows}  body={size / 1024:8.1f}KB  "
+              f"{args.requests / elapsed:7.1f} req/s  {elapsed / args.requests * 1000:7.1f} ms/req")
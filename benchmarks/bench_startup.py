@@ -0,0 +1,88 @@
+"""
+Benchmark de arranque: tiempo de import (python -X importtime) y tiempo
+hasta la primera respuesta de un worker de uvicorn.
+
+    python benchmarks/bench_startup.py --runs 5 --port 8765
+
+Se ejecuta desde la raiz del repo. El import se mide sin secretos en el
+entorno (importar la app no debe necesitar MONGODB_URI ni credenciales de
+Firebase); el tiempo hasta la primera respuesta usa el entorno actual.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+# variables vacias: load_dotenv no las sobreescribe con las del .env
+NO_SECRETS = {
+    "MONGODB_URI": "",
+    "DATABASE_NAME": "",
+    "FIREBASE_CREDENTIALS_BASE64": "",
+    "FIREBASE_API_KEY": "",
+}
+
+
+def import_profile() -> list:
+    """Lista de (modulo, self_us, cumulative_us) para `import main` en un proceso nuevo."""
+    env = {**os.environ, **NO_SECRETS}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return rows
+
+
+def time_to_first_response(port: int, timeout: float = 60.0) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("The server did not answer in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de import y de primera respuesta")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--skip-server", action="store_true", help="solo medir el import")
+    args = parser.parse_args()
+
+    totals = []
+    profile = []
+    for _ in range(args.runs):
+        profile = import_profile()
+        totals.append(next(cum for name, _, cum in profile if name == "main") / 1000)
+    print(f"import main: median {statistics.median(totals):.1f}ms over {args.runs} runs")
+    print(f"slowest modules (cumulative, last run):")
+    for name, self_us, cum_us in sorted(profile, key=lambda row: row[2], reverse=True)[1:args.top + 1]:
+        print(f"  {cum_us / 1000:8.1f}ms  {name}")
+
+    if not args.skip_server:
+        ttfr = [time_to_first_response(args.port) for _ in range(args.runs)]
+        print(f"time to first response: median {statistics.median(ttfr) * 1000:.0f}ms over {args.runs} runs")
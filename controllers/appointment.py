@@ -1,18 +1,25 @@
 import logging
+from typing import Optional
 from xmlrpc.client import _datetime
 
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 from models.appointment import Appointment
 from utils.mongodb import get_collection
+from utils.pagination import decode_cursor, paginate, paginate_cursor
+from utils.slots import booked_buckets, claim_slot, claim_slots, release_slot, release_slots, slot_bucket
+from utils.availability import SLOT_MINUTES, availability_index
+from utils.settings import settings_service
+from utils.user_cache import get_request_user, user_cache
+from utils.streaming import STREAM_BATCH_SIZE, ndjson_stream
 from fastapi import HTTPException, Request
-from datetime import datetime, time, timedelta
+from datetime import datetime, time, timedelta, timezone
 
 
 from pipelines.appointment_pipelines import (
-    date_appointment_pipeline,
-    get_all_appointments_pipeline,
+    all_appointments_query,
     get_appointment_by_id_pipeline,
-    get_user_appointments_pipeline
+    user_appointments_query
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +27,9 @@ logger = logging.getLogger(__name__)
 
 coll= get_collection("Appointments")
 users_coll = get_collection("Users")
-settings_collection = get_collection("Services")
+
+MAX_AVAILABILITY_DAYS = 31
+MAX_BATCH_APPOINTMENTS = 500
 
 
 async def create_appointment_users(request: Request, appointment: Appointment) -> Appointment:
@@ -31,12 +40,9 @@ async def create_appointment_users(request: Request, appointment: Appointment) -
             raise HTTPException(status_code=400, detail="Appointments can only be created between 9:00 AM and 5:00 PM")
 
         # Obtener usuario autenticado desde el token
-        email = request.state.email
-        user_doc = users_coll.find_one({"email": email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
+        user_doc = await get_request_user(request)
 
-        is_admin = user_doc.get("admin", False)
+        is_admin = user_doc["admin"]
 
         # VALIDACIÓN: Si es admin, debe mandar user_id
         if is_admin:
@@ -51,19 +57,27 @@ async def create_appointment_users(request: Request, appointment: Appointment) -
                 raise HTTPException(status_code=403, detail="Not authorized to create appointment for another user")
             user_obj_id = user_doc["_id"]
 
-        # VALIDACIÓN 2: Evitar citas solapadas a nivel global
-        pipeline = date_appointment_pipeline(appointment.date_appointment)
-        result = list(coll.aggregate(pipeline))
-        if result and result[0]["count"] > 0:
+        # VALIDACIÓN 2: Evitar citas solapadas a nivel global (reserva atómica del bloque)
+        appointment_oid = ObjectId()
+        if not await claim_slot(appointment.date_appointment, appointment_oid):
             raise HTTPException(status_code=400, detail="There is already an appointment scheduled at that time")
 
         # Preparar e insertar cita
         appointment_dict = appointment.model_dump(exclude={"id"})
+        appointment_dict["_id"] = appointment_oid
         appointment_dict["user_id"] = user_obj_id
         appointment_dict["date_creation"] = datetime.utcnow()
         appointment_dict["active"] = True  # si usas campo active
 
-        inserted = coll.insert_one(appointment_dict)
+        try:
+            inserted = await coll.insert_one(appointment_dict)
+        except Exception:
+            try:
+                await release_slot(appointment.date_appointment, appointment_oid)
+            except Exception as e:
+                # el bloque queda huerfano; lo libera release_orphan_slots
+                logger.error(f"Could not release slot for appointment {appointment_oid}: {e}")
+            raise
 
         # Preparar respuesta
         appointment.id = str(inserted.inserted_id)
@@ -75,77 +89,166 @@ async def create_appointment_users(request: Request, appointment: Appointment) -
     except HTTPException:
         raise
     except Exception as e:
-        result = list(coll.aggregate(pipeline))
-        if result and result[0]["count"] > 0:
-             raise HTTPException(status_code=400, detail="There is already an appointment scheduled at that time")
-        # Insertar la cita
-        appointment_dict = appointment.model_dump(exclude={"id"})
-        appointment_dict["user_id"] = user_obj_id
-        appointment_dict["date_creation"] = datetime.utcnow()
+        raise HTTPException(status_code=500, detail=f"Error creating appointment: {str(e)}")
+    
 
-        inserted = coll.insert_one(appointment_dict)
+async def create_appointments_batch(request: Request, appointments: list[Appointment]) -> dict:
+    """Crea varias citas con una consulta de rango, un insert_many de bloques y un insert_many de citas.
 
-        # Preparar respuesta
-        appointment.id = str(inserted.inserted_id)
-        appointment.user_id = str(user_obj_id)
-        appointment.date_creation = appointment_dict["date_creation"]
+    Devuelve un resultado por elemento (en el mismo orden); los que fallan no impiden crear el resto.
+    """
+    try:
+        if not appointments:
+            raise HTTPException(status_code=400, detail="The batch is empty")
+        if len(appointments) > MAX_BATCH_APPOINTMENTS:
+            raise HTTPException(status_code=400, detail=f"A batch can not exceed {MAX_BATCH_APPOINTMENTS} appointments")
+
+        user_doc = await get_request_user(request)
+        is_admin = user_doc["admin"]
+
+        results = [{"index": i, "success": False} for i in range(len(appointments))]
+        pending = {}
+
+        # 1. Validaciones por elemento (mismas reglas que create_appointment_users)
+        for i, appointment in enumerate(appointments):
+            appointment_time = appointment.date_appointment.time()
+            if not (time(9, 0) <= appointment_time <= time(17, 0)):
+                results[i]["error"] = "Appointments can only be created between 9:00 AM and 5:00 PM"
+                continue
+            if is_admin:
+                if not appointment.user_id:
+                    results[i]["error"] = "Admin must provide user_id to create an appointment"
+                    continue
+                if not ObjectId.is_valid(appointment.user_id):
+                    results[i]["error"] = "Invalid user_id format"
+                    continue
+                pending[i] = ObjectId(appointment.user_id)
+            else:
+                if appointment.user_id and appointment.user_id != str(user_doc["_id"]):
+                    results[i]["error"] = "Not authorized to create appointment for another user"
+                    continue
+                pending[i] = user_doc["_id"]
+
+        # 2. Los usuarios indicados deben existir (una sola consulta)
+        if is_admin and pending:
+            cursor = users_coll.find({"_id": {"$in": list(set(pending.values()))}}, {"_id": 1})
+            existing_users = {doc["_id"] async for doc in cursor}
+            for i in [i for i, user_oid in pending.items() if user_oid not in existing_users]:
+                results[i]["error"] = "User not found"
+                del pending[i]
+
+        # 3. Conflictos dentro del lote y contra las reservas existentes (una consulta de rango)
+        if pending:
+            dates = [appointments[i].date_appointment for i in pending]
+            booked = await booked_buckets(min(dates), max(dates))
+            seen = set()
+            for i in list(pending):
+                bucket = slot_bucket(appointments[i].date_appointment)
+                if bucket in booked or bucket in seen:
+                    results[i]["error"] = "There is already an appointment scheduled at that time"
+                    del pending[i]
+                else:
+                    seen.add(bucket)
+
+        # 4. Reserva atómica de los bloques; si otra petición ganó alguno, ese elemento falla
+        ids = {i: ObjectId() for i in pending}
+        claimed = await claim_slots([(appointments[i].date_appointment, ids[i]) for i in pending])
+        for i in [i for i in pending if ids[i] not in claimed]:
+            results[i]["error"] = "There is already an appointment scheduled at that time"
+            del pending[i]
+
+        # 5. Insertar todas las citas de una vez
+        now = datetime.utcnow()
+        docs = []
+        for i, user_oid in pending.items():
+            appointment_dict = appointments[i].model_dump(exclude={"id"})
+            appointment_dict["_id"] = ids[i]
+            appointment_dict["user_id"] = user_oid
+            appointment_dict["date_creation"] = now
+            appointment_dict["active"] = True
+            docs.append((i, appointment_dict))
+
+        failed = {}
+        if docs:
+            try:
+                await coll.insert_many([doc for _, doc in docs], ordered=False)
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    failed[docs[err["index"]][0]] = err.get("errmsg", "Error creating appointment")
+            if failed:
+                await release_slots([(appointments[i].date_appointment, ids[i]) for i in failed])
+
+        for i, doc in docs:
+            if i in failed:
+                results[i]["error"] = failed[i]
+                continue
+            results[i].update({
+                "success": True,
+                "id": str(doc["_id"]),
+                "user_id": str(doc["user_id"]),
+                "date_appointment": doc["date_appointment"],
+                "date_creation": doc["date_creation"]
+            })
 
-        return appointment
+        created = sum(1 for r in results if r["success"])
+        return {"created": created, "failed": len(results) - created, "results": results}
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating appointment: {str(e)}")
-    
+        raise HTTPException(status_code=500, detail=f"Error creating appointments: {str(e)}")
 
-async def get_appointments(request: Request) -> dict:
-    try:
-        email = request.state.email
-        is_admin = request.state.admin
 
-        if is_admin:
-            pipeline = get_all_appointments_pipeline(0, 10)
-            items = list(coll.aggregate(pipeline))
-            total = coll.count_documents({"active": True})
-        else:
-            user_doc = users_coll.find_one({"email": email}, {"_id": 1})
-            if not user_doc:
-                return {"appointments": [], "total": 0, "skip": 0, "limit": 10}
-
-            user_oid = user_doc["_id"]
-            pipeline = get_user_appointments_pipeline(user_oid, 0, 10)
-            items = list(coll.aggregate(pipeline))
-            total = coll.count_documents({
-                "active": True,
-                "$or": [
-                    {"user_id": user_oid},
-                    {"user_id": str(user_oid)}
-                ]
-            })
+async def _appointments_query(request: Request, skip: int, limit: Optional[int], after: Optional[tuple]):
+    """Admin: todas las citas; usuario: las suyas. None si el usuario no existe."""
+    if request.state.admin:
+        return all_appointments_query(skip, limit, after)
+    user_oid = getattr(request.state, "user_id", None)
+    if user_oid is None:
+        user_doc = await user_cache.get(request.state.email)
+        if not user_doc:
+            return None
+        user_oid = user_doc["_id"]
+    return user_appointments_query(user_oid, skip, limit, after=after)
+
+
+async def stream_appointments(request: Request, cursor: Optional[str] = None):
+    """Las mismas citas que get_appointments (desde el cursor, si se pasa) como NDJSON, sin skip/limit."""
+    after = decode_cursor(cursor) if cursor else None
+    query = await _appointments_query(request, 0, None, after)
+
+    async def rows():
+        if query is None:
+            return
+        result = await coll.aggregate(query.build(), batchSize=STREAM_BATCH_SIZE)
+        async for chunk in ndjson_stream(result):
+            yield chunk
+    return rows()
 
-        # 🔹 Mark as inactive if date has passed (and persist to DB)
-        now = datetime.utcnow()
-        for appt in items:
-            try:
-                appt_date = appt.get("date_appointment")
-                if isinstance(appt_date, str):
-                    appt_date = datetime.fromisoformat(appt_date)
-
-                if appt_date and appt_date < now and appt.get("active", True):
-                    appt["active"] = False
-                    # update in DB
-                    coll.update_one(
-                        {"_id": ObjectId(appt["_id"])},
-                        {"$set": {"active": False}}
-                    )
-            except Exception:
-                pass  # ignore date format errors
 
+async def get_appointments(
+    request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, approximate: bool = False
+) -> dict:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        query = await _appointments_query(request, skip, limit, after)
+        if query is None:
+            return {"appointments": [], "total": 0, "skip": skip, "limit": limit, "next_cursor": None}
+
+        # Con cursor se pagina por keyset (date_creation, _id); sin cursor, por offset
+        if cursor:
+            page = await paginate_cursor(coll, query, limit, "date_creation")
+            skip = 0
+        else:
+            page = await paginate(coll, query, skip, limit, approximate, cursor_field="date_creation")
+        # "active" ya viene calculado por el pipeline; las citas pasadas las
+        # desactiva en la base utils/expiry.py, no este GET
         return {
-            "appointments": items,
-            "total": int(total),
-            "skip": 0,
-            "limit": 10
+            "appointments": page["items"],
+            "total": int(page["total"]),
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": page["next_cursor"]
         }
 
     except HTTPException:
@@ -154,35 +257,41 @@ async def get_appointments(request: Request) -> dict:
         raise HTTPException(status_code=500, detail=f"Error retrieving appointments: {str(e)}")
 
 
+async def get_availability(date_from: datetime, date_to: datetime) -> dict:
+    # Se responde desde el índice en memoria (utils/availability.py), sin consultar Mongo
+    # Las fechas se guardan en UTC sin zona horaria
+    if date_from.tzinfo:
+        date_from = date_from.astimezone(timezone.utc).replace(tzinfo=None)
+    if date_to.tzinfo:
+        date_to = date_to.astimezone(timezone.utc).replace(tzinfo=None)
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if date_to - date_from > timedelta(days=MAX_AVAILABILITY_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range can not exceed {MAX_AVAILABILITY_DAYS} days")
+
+    free = availability_index.free_slots(date_from, date_to)
+    return {
+        "from": date_from,
+        "to": date_to,
+        "slot_minutes": SLOT_MINUTES,
+        "free_slots": free
+    }
+
+
 # ==========================
 # Get appointment by ID
 # ==========================
 async def get_appointment_by_id(appointment_id: str) -> dict:
     try:
         pipeline = get_appointment_by_id_pipeline(appointment_id)
-        result = list(coll.aggregate(pipeline))
+        cursor = await coll.aggregate(pipeline)
+        result = await cursor.to_list()
 
         if not result:
             raise HTTPException(status_code=404, detail="Appointment not found")
 
         appt = result[0]
 
-        # 🔹 Mark as inactive if date has passed (and persist to DB)
-        now = datetime.utcnow()
-        try:
-            appt_date = appt.get("date_appointment")
-            if isinstance(appt_date, str):
-                appt_date = datetime.fromisoformat(appt_date)
-
-            if appt_date and appt_date < now and appt.get("active", True):
-                appt["active"] = False
-                coll.update_one(
-                    {"_id": ObjectId(appointment_id)},
-                    {"$set": {"active": False}}
-                )
-        except Exception:
-            pass
-
         return appt
 
     except HTTPException:
@@ -195,17 +304,15 @@ async def update_appointment(appointment_id: str, appointment: Appointment, requ
             if not ObjectId.is_valid(appointment_id):
                 raise HTTPException(status_code=400, detail="Invalid appointment ID format")
 
-            existing = coll.find_one({"_id": ObjectId(appointment_id)})
+            existing = await coll.find_one({"_id": ObjectId(appointment_id)})
             if not existing:
                 raise HTTPException(status_code=404, detail="Appointment not found")
             
             # Validar que el usuario autenticado sea el dueño de la cita o admin
-            user_doc = users_coll.find_one({"email": request.state.email})
-            if not user_doc:
-                 raise HTTPException(status_code=403, detail="User not found")
+            user_doc = await get_request_user(request)
 
             is_owner = str(existing.get("user_id")) == str(user_doc["_id"])
-            is_admin = user_doc.get("admin", False)
+            is_admin = user_doc["admin"]
 
             if not (is_owner or is_admin):
                 raise HTTPException(status_code=403, detail="Not authorized to modify this appointment")
@@ -216,12 +323,7 @@ async def update_appointment(appointment_id: str, appointment: Appointment, requ
                 raise HTTPException(status_code=500, detail="Invalid date format stored in DB")
             
             #calcular lo de lad dos horas
-            hours_result = settings_collection.find_one({"key": "hours_before_changes"})
-            if hours_result and "value" in hours_result:
-                hours_change = hours_result["value"]
-            else: 
-                print("DEBUG: No se encontro las horas que se pueden cambiar")    
-                hours_change=2
+            hours_change = await settings_service.get_value("hours_before_changes", 2)
 
             time_now = datetime.utcnow()
             if current_appointment_datetime - time_now < timedelta(hours=hours_change):
@@ -230,25 +332,37 @@ async def update_appointment(appointment_id: str, appointment: Appointment, requ
                     detail="Appointments can only be updated at least 2 hours in advance"
                 )
                 
-             # Validar que no haya citas solapadas (excluyendo la cita actual)
-            pipeline = date_appointment_pipeline(appointment.date_appointment, appointment_id)
-            conflicts = list(coll.aggregate(pipeline))
-            if conflicts and conflicts[0]["count"] > 0:
-                 raise HTTPException(status_code=400, detail="Ya hay una cita programada a esa hora")    
+            # Validar que no haya citas solapadas: si cambia de bloque se reserva el nuevo
+            appointment_oid = ObjectId(appointment_id)
+            had_slot = existing.get("active", True)
+            keeps_slot = appointment.active is not False
+            moves_slot = slot_bucket(appointment.date_appointment) != slot_bucket(current_appointment_datetime)
+            claim_new = keeps_slot and (moves_slot or not had_slot)
+            if claim_new and not await claim_slot(appointment.date_appointment, appointment_oid):
+                raise HTTPException(status_code=400, detail="Ya hay una cita programada a esa hora")
 
             # Validación y limpieza de comentario
             appointment.comment = appointment.comment.strip()
 
-            result = coll.update_one(
-                {"_id": ObjectId(appointment_id)},
-                {"$set": appointment.model_dump(exclude={"id", "user_id"})}
-            )
+            try:
+                result = await coll.update_one(
+                    {"_id": appointment_oid},
+                    {"$set": appointment.model_dump(exclude={"id", "user_id"})}
+                )
 
-            if result.modified_count == 0:
-                raise HTTPException(status_code=400, detail="No changes were made")
+                if result.modified_count == 0:
+                    raise HTTPException(status_code=400, detail="No changes were made")
+            except Exception:
+                if claim_new:
+                    await release_slot(appointment.date_appointment, appointment_oid)
+                raise
+
+            # Liberar el bloque anterior si la cita se movió o se desactivó
+            if had_slot and (moves_slot or not keeps_slot):
+                await release_slot(current_appointment_datetime, appointment_oid)
 
             # Obtener cita actualizada
-            updated = coll.find_one({"_id": ObjectId(appointment_id)})
+            updated = await coll.find_one({"_id": ObjectId(appointment_id)})
             updated["id"] = str(updated["_id"])
             updated["user_id"] = str(updated["user_id"])  # <-- ESTA LÍNEA es crucial
             return Appointment(**updated)
@@ -264,17 +378,15 @@ async def disable_appointment(appointment_id: str,request:Request) -> dict:
             if not ObjectId.is_valid(appointment_id):
                 raise HTTPException(status_code=400, detail="Formato invalido de Id")
             
-            existing = coll.find_one({"_id": ObjectId(appointment_id)})
+            existing = await coll.find_one({"_id": ObjectId(appointment_id)})
             if not existing:
                 raise HTTPException(status_code=404, detail="La cita no fue encontrada")
             
             # Validar que el usuario autenticado sea el dueño de la cita o admin
-            user_doc = users_coll.find_one({"email": request.state.email})
-            if not user_doc:
-                raise HTTPException(status_code=403, detail="User not found")
+            user_doc = await get_request_user(request)
 
             is_owner = str(existing.get("user_id")) == str(user_doc["_id"])
-            is_admin = user_doc.get("admin", False)
+            is_admin = user_doc["admin"]
 
             if not (is_owner or is_admin):
                 raise HTTPException(status_code=403, detail="No autorizado para modificar")
@@ -285,12 +397,7 @@ async def disable_appointment(appointment_id: str,request:Request) -> dict:
             if not isinstance(appointment_datetime, datetime):
                 raise HTTPException(status_code=500, detail="Invalid date format stored in DB")
             
-            hours_result = settings_collection.find_one({"key": "hours_before_changes"})
-            if hours_result and "value" in hours_result:
-                hours_change = hours_result["value"]
-            else: 
-                print("DEBUG: No se encontro las horas que se pueden cambiar")    
-                hours_change=2
+            hours_change = await settings_service.get_value("hours_before_changes", 2)
 
             if appointment_datetime - datetime.utcnow() < timedelta(hours=hours_change):
                 raise HTTPException(
@@ -298,7 +405,7 @@ async def disable_appointment(appointment_id: str,request:Request) -> dict:
                     detail="Las citas solo se pueden deshabilitar con 2 horas de anticipación"
                 )
 
-            result = coll.update_one(
+            result = await coll.update_one(
                 {"_id": ObjectId(appointment_id)},
                 {"$set": {"active": False}}
             )
@@ -306,6 +413,8 @@ async def disable_appointment(appointment_id: str,request:Request) -> dict:
             if result.modified_count == 0:
                 raise HTTPException(status_code=400, detail="No se hicieron cambios")
 
+            await release_slot(appointment_datetime, ObjectId(appointment_id))
+
             return {"message": "La cita ya fue deshabilitada "}
 
         except HTTPException:
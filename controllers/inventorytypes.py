@@ -10,15 +10,18 @@ from pipelines.inventory_type_pipelines import (
 
 coll = get_collection("inventorytypes")
 
+# campos de InventoryType que se leen en las rutas de lectura (se sirven sin re-validar)
+INVENTORY_TYPE_PROJECTION = {"name": 1, "active": 1}
+
 async def create_inventory_type(inv_type: InventoryType) -> InventoryType:
     try:
         inv_type.name = inv_type.name.strip().lower()
-        existing = coll.find_one({"name": inv_type.name})
+        existing = await coll.find_one({"name": inv_type.name})
         if existing:
             raise HTTPException(status_code=400, detail="Inventory type already exists")
 
         doc = inv_type.model_dump(exclude={"id"})
-        inserted = coll.insert_one(doc)
+        inserted = await coll.insert_one(doc)
         inv_type.id = str(inserted.inserted_id)
         return inv_type
     except Exception as e:
@@ -27,28 +30,30 @@ async def create_inventory_type(inv_type: InventoryType) -> InventoryType:
 async def get_inventory_types() -> list:
     try:
         pipeline = get_inventory_type_pipeline()
-        return list(coll.aggregate(pipeline))
+        cursor = await coll.aggregate(pipeline)
+        return await cursor.to_list()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching inventory types: {str(e)}")
 
-async def get_inventory_type_by_id(inv_type_id: str) -> InventoryType:
+async def get_inventory_type_by_id(inv_type_id: str) -> dict:
     try:
-        doc = coll.find_one({"_id": ObjectId(inv_type_id)})
+        doc = await coll.find_one({"_id": ObjectId(inv_type_id)}, INVENTORY_TYPE_PROJECTION)
         if not doc:
             raise HTTPException(status_code=404, detail="Inventory type not found")
-        doc["id"] = str(doc["_id"]); del doc["_id"]
-        return InventoryType(**doc)
+        doc["id"] = str(doc.pop("_id"))
+        doc.setdefault("active", True)
+        return doc
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching inventory type: {str(e)}")
 
-async def update_inventory_type(inv_type_id: str, inv_type: InventoryType) -> InventoryType:
+async def update_inventory_type(inv_type_id: str, inv_type: InventoryType) -> dict:
     try:
         inv_type.name = inv_type.name.strip().lower()
-        existing = coll.find_one({"name": inv_type.name, "_id": {"$ne": ObjectId(inv_type_id)}})
+        existing = await coll.find_one({"name": inv_type.name, "_id": {"$ne": ObjectId(inv_type_id)}})
         if existing:
             raise HTTPException(status_code=400, detail="Inventory type already exists")
 
-        res = coll.update_one(
+        res = await coll.update_one(
             {"_id": ObjectId(inv_type_id)},
             {"$set": inv_type.model_dump(exclude={"id"})}
         )
@@ -66,7 +71,8 @@ async def deactivate_inventory_type(inv_type_id: str) -> dict:
 
         # 🔹 Usar pipeline que incluye number_of_items
         pipeline = [{"$match": {"_id": ObjectId(inv_type_id)}}] + get_inventory_type_pipeline()
-        assigned = list(coll.aggregate(pipeline))
+        cursor = await coll.aggregate(pipeline)
+        assigned = await cursor.to_list()
 
         if not assigned:
             raise HTTPException(status_code=404, detail="Inventory type not found")
@@ -74,10 +80,10 @@ async def deactivate_inventory_type(inv_type_id: str) -> dict:
         number_of_items = assigned[0].get("number_of_items", 0)
 
         if number_of_items > 0:
-            coll.update_one({"_id": ObjectId(inv_type_id)}, {"$set": {"active": False}})
+            await coll.update_one({"_id": ObjectId(inv_type_id)}, {"$set": {"active": False}})
             return {"message": "Inventory type is assigned to items and has been deactivated"}
         else:
-            coll.delete_one({"_id": ObjectId(inv_type_id)})
+            await coll.delete_one({"_id": ObjectId(inv_type_id)})
             return {"message": "Inventory type deleted successfully"}
 
     except HTTPException:
@@ -1,11 +1,18 @@
 import logging
+from datetime import datetime, timezone
+from typing import Optional
 
 from bson import ObjectId
 from models.orders import Order
 from utils.mongodb import get_collection
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from pipelines.orders_pipeline import get_order_statistics_pipeline
+from pymongo.errors import BulkWriteError
+from utils.order_stats import get_statistics, record_order, record_orders, stats_generation, to_statistics
+from utils.timeseries import BUCKET_UNITS, bucket_range, closed_buckets, is_settled, next_bucket
+from pipelines.orders_pipeline import order_timeseries_pipeline
+from utils.settings import settings_service
+from utils.streaming import CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, STREAM_BATCH_SIZE, csv_lines, ndjson_lines
 
 logging.basicConfig(level= logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,46 +20,258 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 coll= get_collection("Orders")
 appointment_coll = get_collection("Appointments")
-system_coll = get_collection("System")
+
+MAX_BATCH_ORDERS = 1000
+
+EXPORT_FORMATS = {"ndjson": NDJSON_MEDIA_TYPE, "csv": CSV_MEDIA_TYPE}
+EXPORT_COLUMNS = ["id", "appointment_id", "date_appointment", "subtotal", "taxes", "total", "created_at"]
 
 async def create_order(order: Order) -> Order:
     try:
-        appointment_exist = appointment_coll.find_one({"_id": ObjectId(order.appointment_id)})
+        appointment_exist = await appointment_coll.find_one({"_id": ObjectId(order.appointment_id)})
         if  not appointment_exist:
             raise HTTPException(status_code=404, detail="Appointment not found")
+        order.appointment_id = str(appointment_exist["_id"])
         
-        tax_result = system_coll.find_one({"key": "general_tax"})
-        if tax_result and "value" in tax_result:
-            try: 
-                tax_rate = float(tax_result["value"])
-            except ValueError:
-                 raise HTTPException(status_code=500, detail="Tax rate must be numeric")    
-        else:
-            print("DEBUG: No se encontro tasa de impuesto")    
-            tax_rate = 0.15
+        tax_rate = await settings_service.get_value("general_tax", 0.15)
     
         order.subtotal = order.subtotal
         order.taxes = order.subtotal * tax_rate
         order.total = order.subtotal + order.taxes
+        order.created_at = datetime.utcnow()
 
         new_doc = order.model_dump(exclude={"id"})
-        result = coll.insert_one(new_doc)
+        result = await coll.insert_one(new_doc)
         order.id = str(result.inserted_id)
+
+        # La orden ya quedo guardada: si falla el acumulado se corrige con python -m utils.order_stats --rebuild
+        try:
+            await record_order(new_doc, order.created_at)
+        except Exception as e:
+            logger.error(f"Could not update order statistics for {order.id}: {e}")
         return order
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating order: {str(e)}")
     
+async def create_orders_batch(orders: list[Order]) -> dict:
+    """Crea varias ordenes con una consulta $in de citas, una lectura del impuesto y un insert_many.
+
+    Devuelve un resultado por elemento (en el mismo orden); los que fallan no impiden crear el resto.
+    """
+    try:
+        if not orders:
+            raise HTTPException(status_code=400, detail="The batch is empty")
+        if len(orders) > MAX_BATCH_ORDERS:
+            raise HTTPException(status_code=400, detail=f"A batch can not exceed {MAX_BATCH_ORDERS} orders")
+
+        results = [{"index": i, "success": False} for i in range(len(orders))]
+
+        # 1. Las citas deben existir (una sola consulta)
+        pending = {}
+        for i, order in enumerate(orders):
+            if not order.appointment_id or not ObjectId.is_valid(order.appointment_id):
+                results[i]["error"] = "Invalid appointment_id format"
+                continue
+            # ObjectId acepta hex en mayusculas: se compara y se guarda normalizado
+            pending[i] = ObjectId(order.appointment_id)
+
+        cursor = appointment_coll.find({"_id": {"$in": list(set(pending.values()))}}, {"_id": 1})
+        existing = {doc["_id"] async for doc in cursor}
+        for i in [i for i, appointment_oid in pending.items() if appointment_oid not in existing]:
+            results[i]["error"] = "Appointment not found"
+            del pending[i]
+
+        # 2. Impuesto y totales de todo el lote en una pasada
+        tax_rate = await settings_service.get_value("general_tax", 0.15)
+        now = datetime.utcnow()
+        subtotals = [orders[i].subtotal for i in pending]
+        taxes = [subtotal * tax_rate for subtotal in subtotals]
+        docs = [
+            (i, {
+                "_id": ObjectId(),
+                "appointment_id": str(pending[i]),
+                "subtotal": subtotal,
+                "taxes": tax,
+                "total": subtotal + tax,
+                "created_at": now,
+            })
+            for i, subtotal, tax in zip(pending, subtotals, taxes)
+        ]
+
+        # 3. Insertar todas las ordenes de una vez
+        failed = {}
+        if docs:
+            try:
+                await coll.insert_many([doc for _, doc in docs], ordered=False)
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    failed[docs[err["index"]][0]] = err.get("errmsg", "Error creating order")
+
+        inserted = []
+        for i, doc in docs:
+            if i in failed:
+                results[i]["error"] = failed[i]
+                continue
+            inserted.append(doc)
+            results[i].update({
+                "success": True,
+                "id": str(doc["_id"]),
+                "appointment_id": doc["appointment_id"],
+                "subtotal": doc["subtotal"],
+                "taxes": doc["taxes"],
+                "total": doc["total"],
+                "created_at": doc["created_at"]
+            })
+
+        # Las ordenes ya quedaron guardadas: si falla el acumulado se corrige con python -m utils.order_stats --rebuild
+        try:
+            await record_orders(inserted, now)
+        except Exception as e:
+            logger.error(f"Could not update order statistics for batch: {e}")
+
+        created = len(inserted)
+        return {"created": created, "failed": len(results) - created, "results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating orders: {str(e)}")
+
+
 async def get_order_statistics():
     try:
-        pipeline = get_order_statistics_pipeline()
-        result = list(coll.aggregate(pipeline))
-        return result[0] if result else {
-            "total_orders": 0,
-            "total_sales": 0.0,
-            "avg_subtotal": 0.0,
-            "total_taxes": 0.0,
-            "max_order": 0.0,
-            "min_order": 0.0
+        # servido desde el acumulado de OrderStats (un documento), no desde Orders
+        return await get_statistics()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
+
+
+async def get_order_timeseries(date_from: datetime, date_to: datetime, bucket: str) -> dict:
+    """Totales por bucket en [date_from, date_to), alineado a buckets completos.
+
+    Los buckets que terminaron hace mas de TIMESERIES_CLOSE_GRACE se sirven de
+    memoria; solo se agrega desde Orders el tramo que falta (normalmente el
+    bucket en curso).
+    """
+    try:
+        if bucket not in BUCKET_UNITS:
+            raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKET_UNITS)}")
+        # Las fechas se guardan en UTC sin zona horaria
+        if date_from.tzinfo:
+            date_from = date_from.astimezone(timezone.utc).replace(tzinfo=None)
+        if date_to.tzinfo:
+            date_to = date_to.astimezone(timezone.utc).replace(tzinfo=None)
+        if date_to <= date_from:
+            raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+        try:
+            starts = bucket_range(date_from, date_to, bucket)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        now = datetime.utcnow()
+        generation = await stats_generation()
+        series = {}
+        missing = []
+        for start in starts:
+            cached = closed_buckets.get((generation, bucket, start)) if is_settled(start, bucket, now) else None
+            if cached is None:
+                missing.append(start)
+            else:
+                series[start] = cached
+
+        if missing:
+            pipeline = order_timeseries_pipeline(missing[0], next_bucket(missing[-1], bucket), bucket)
+            cursor = await coll.aggregate(pipeline)
+            rows = {row["_id"]: row async for row in cursor}
+            for start in missing:
+                series[start] = to_statistics(rows.get(start))
+                if is_settled(start, bucket, now):
+                    closed_buckets.set((generation, bucket, start), series[start])
+
+        return {
+            "bucket": bucket,
+            "from": starts[0],
+            "to": next_bucket(starts[-1], bucket),
+            "series": [{"start": start, **series[start]} for start in starts]
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")    
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
+
+
+async def _export_rows(query: dict, sort: list):
+    """Ordenes con la fecha de su cita, por lotes: una consulta $in de citas por lote, no por orden."""
+    cursor = coll.find(query, {"appointment_id": 1, "subtotal": 1, "taxes": 1, "total": 1, "created_at": 1})
+    cursor = cursor.sort(sort).batch_size(STREAM_BATCH_SIZE)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield await _with_appointment_dates(batch)
+            batch = []
+    if batch:
+        yield await _with_appointment_dates(batch)
+
+
+async def _with_appointment_dates(orders: list) -> list:
+    appointment_ids = list({
+        ObjectId(order["appointment_id"]) for order in orders
+        if order.get("appointment_id") and ObjectId.is_valid(order["appointment_id"])
+    })
+    cursor = appointment_coll.find({"_id": {"$in": appointment_ids}}, {"date_appointment": 1})
+    dates = {str(doc["_id"]): doc.get("date_appointment") async for doc in cursor}
+    return [
+        {
+            "id": str(order["_id"]),
+            "appointment_id": order.get("appointment_id"),
+            "date_appointment": dates.get(order.get("appointment_id")),
+            "subtotal": order.get("subtotal"),
+            "taxes": order.get("taxes"),
+            "total": order.get("total"),
+            "created_at": order.get("created_at"),
+        }
+        for order in orders
+    ]
+
+
+def export_orders(export_format: str, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+    """Valida los filtros y devuelve (generador de bytes, media type) para un StreamingResponse.
+
+    Con rango de fechas se recorre el indice (created_at, _id); sin rango, todas las ordenes por _id.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    # Las fechas se guardan en UTC sin zona horaria
+    if date_from and date_from.tzinfo:
+        date_from = date_from.astimezone(timezone.utc).replace(tzinfo=None)
+    if date_to and date_to.tzinfo:
+        date_to = date_to.astimezone(timezone.utc).replace(tzinfo=None)
+    if date_from and date_to and date_to <= date_from:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+
+    query = {}
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from
+        if date_to:
+            query["created_at"]["$lt"] = date_to
+        sort = [("created_at", 1), ("_id", 1)]
+    else:
+        sort = [("_id", 1)]
+
+    async def body():
+        header = True
+        async for rows in _export_rows(query, sort):
+            if export_format == "csv":
+                yield csv_lines(rows, EXPORT_COLUMNS, header=header)
+                header = False
+            else:
+                yield ndjson_lines(rows)
+        if export_format == "csv" and header:
+            yield csv_lines([], EXPORT_COLUMNS, header=True)
+
+    return body(), EXPORT_FORMATS[export_format]
@@ -8,6 +8,10 @@ from dotenv import load_dotenv
 from fastapi import HTTPException, Request
 
 from pipelines.service_pipelines import get_service_filter_pipeline
+from utils.streaming import STREAM_BATCH_SIZE, ndjson_stream
+
+# campos de Service que se leen en las rutas de lectura (se sirven sin re-validar)
+SERVICE_PROJECTION = {"name": 1, "description": 1, "price": 1, "active": 1}
 
 logging.basicConfig(level= logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,7 +22,7 @@ coll= get_collection("Services")
 async def create_service(service: Service) -> Service:
     try:
         service.name = service.name.strip().lower() 
-        existing_type = coll.find_one({"name": service.name})  
+        existing_type = await coll.find_one({"name": service.name})  
         if existing_type:
             raise HTTPException(status_code=400, detail="Service already exists")
         
@@ -27,38 +31,47 @@ async def create_service(service: Service) -> Service:
         if "active" not in service_dict:
             service_dict["active"] = True; 
         
-        inserted = coll.insert_one(service_dict)
+        inserted = await coll.insert_one(service_dict)
         service.id = str(inserted.inserted_id)
         return service
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating service: {str(e)}")
     
-async def get_services(filtro: Optional[str] = None, include_inactive: bool = False) -> list[Service]:
+def _services_query(filtro: Optional[str] = None) -> dict:
+    query = get_service_filter_pipeline(filtro) or {}
+    # en Services tambien vive la configuracion hours_before_changes (documentos con "key")
+    return {**query, "key": {"$exists": False}}
+
+async def get_services(filtro: Optional[str] = None, include_inactive: bool = False) -> list[dict]:
     try:
-        query = get_service_filter_pipeline(filtro) or {}
+        query = _services_query(filtro)
         # Solo filtra activos cuando NO nos piden incluir inactivos
-        services = []
-        for doc in coll.find(query):
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            services.append(Service(**doc))
-        return services
+        cursor = coll.find(query, SERVICE_PROJECTION).batch_size(STREAM_BATCH_SIZE)
+        return [_service_row(doc) async for doc in cursor]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching services: {str(e)}")
     
-async def get_service_by_id(service_id: str) -> Service:
+def _service_row(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    doc.setdefault("active", True)
+    return doc
+
+def stream_services(filtro: Optional[str] = None):
+    """Mismos servicios que get_services, como NDJSON y sin armar la lista completa."""
+    query = _services_query(filtro)
+    return ndjson_stream(coll.find(query, SERVICE_PROJECTION).batch_size(STREAM_BATCH_SIZE), _service_row)
+    
+async def get_service_by_id(service_id: str) -> dict:
     try:
         if not ObjectId.is_valid(service_id):
             raise HTTPException(status_code=400, detail="Invalid service ID format")
 
         # Quita el filtro de "active": True
-        doc = coll.find_one({"_id": ObjectId(service_id)})
+        doc = await coll.find_one({"_id": ObjectId(service_id)}, SERVICE_PROJECTION)
         if not doc:
             raise HTTPException(status_code=404, detail="Service not found")
 
-        doc["id"] = str(doc["_id"])
-        del doc["_id"]
-        return Service(**doc)
+        return _service_row(doc)
     except HTTPException:
         raise
     except Exception as e:
@@ -69,27 +82,27 @@ async def update_service(service_id: str, service: Service, request: Request) ->
         if not ObjectId.is_valid(service_id):
             raise HTTPException(status_code=400, detail="Invalid service ID format")
 
-        existing = coll.find_one({"_id": ObjectId(service_id)})
+        existing = await coll.find_one({"_id": ObjectId(service_id)})
         if not existing:
             raise HTTPException(status_code=404, detail="Service not found")
 
         # normalizar nombre y evitar duplicados (excluyendo el propio id)
         new_name = service.name.strip().lower()
-        dup = coll.find_one({"name": new_name, "_id": {"$ne": ObjectId(service_id)}})
+        dup = await coll.find_one({"name": new_name, "_id": {"$ne": ObjectId(service_id)}})
         if dup:
             raise HTTPException(status_code=400, detail="Service already exists")
 
         update_doc = service.model_dump(exclude={"id"})
         update_doc["name"] = new_name  # mantener normalizado
 
-        res = coll.update_one({"_id": ObjectId(service_id)}, {"$set": update_doc})
+        res = await coll.update_one({"_id": ObjectId(service_id)}, {"$set": update_doc})
         if res.matched_count == 0:
             raise HTTPException(status_code=404, detail="Service not found")
         if res.modified_count == 0:
             # nada cambió, pero devolvemos el recurso actual
-            updated = coll.find_one({"_id": ObjectId(service_id)})
+            updated = await coll.find_one({"_id": ObjectId(service_id)})
         else:
-            updated = coll.find_one({"_id": ObjectId(service_id)})
+            updated = await coll.find_one({"_id": ObjectId(service_id)})
 
         updated["id"] = str(updated["_id"])
         del updated["_id"]
@@ -105,11 +118,11 @@ async def deactivate_service(service_id: str, request: Request) -> dict:
         if not ObjectId.is_valid(service_id):
             raise HTTPException(status_code=400, detail="Invalid service ID format")
 
-        existing = coll.find_one({"_id": ObjectId(service_id)})
+        existing = await coll.find_one({"_id": ObjectId(service_id)})
         if not existing:
             raise HTTPException(status_code=404, detail="Service not found")
 
-        res = coll.update_one({"_id": ObjectId(service_id)}, {"$set": {"active": False}})
+        res = await coll.update_one({"_id": ObjectId(service_id)}, {"$set": {"active": False}})
         if res.modified_count == 0:
             raise HTTPException(status_code=400, detail="No changes were made")
 
@@ -0,0 +1,31 @@
+import logging
+
+from fastapi import HTTPException
+from models.system_settings import SystemSetting, SystemSettingUpdate
+from utils.settings import settings_service
+
+logging.basicConfig(level= logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def get_settings() -> list[SystemSetting]:
+    try:
+        # se recarga desde la base para que el admin vea siempre lo guardado
+        settings_service.invalidate()
+        return await settings_service.load()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching settings: {str(e)}")
+
+
+async def update_setting(key: str, setting: SystemSettingUpdate) -> SystemSetting:
+    try:
+        key = key.strip()
+        if not key:
+            raise HTTPException(status_code=400, detail="Setting key is required")
+        if setting.value < 0:
+            raise HTTPException(status_code=400, detail="Setting value must be non-negative")
+        return await settings_service.set(key, setting.value, setting.description)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating setting: {str(e)}")
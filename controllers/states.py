@@ -5,6 +5,7 @@ from models.states import State
 from utils.mongodb import get_collection
 from dotenv import load_dotenv
 from fastapi import HTTPException
+from utils.streaming import STREAM_BATCH_SIZE, ndjson_stream
 
 logging.basicConfig(level= logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,45 +13,51 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 coll= get_collection("States")
 
+# campos de State que se leen en las rutas de lectura (se sirven sin re-validar)
+STATE_PROJECTION = {"name": 1, "active": 1}
+
 
 async def create_state(state: State) -> State:
     try:
         state.name = state.name.strip().lower() 
-        existing_type = coll.find_one({"name": state.name}) 
+        existing_type = await coll.find_one({"name": state.name}) 
         if existing_type:
             raise HTTPException(status_code=400, detail="State already exists")
 
         state_dict = state.model_dump(exclude={"id"})
-        inserted = coll.insert_one(state_dict)
+        inserted = await coll.insert_one(state_dict)
         state.id = str(inserted.inserted_id)
         return state
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating state: {str(e)}")
     
     
-async def get_states() -> list[State]:
+async def get_states() -> list[dict]:
     try:
-        state = [] 
-        
-        for doc in coll.find(): 
-            doc['id'] = str(doc['_id']) 
-            del doc['_id'] 
-            state_obj = State(**doc) 
-            state.append(state_obj) 
-        return state
+        cursor = coll.find({}, STATE_PROJECTION).batch_size(STREAM_BATCH_SIZE)
+        return [_state_row(doc) async for doc in cursor]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching state: {str(e)}")
     
     
-async def get_state_id(state_id: str) ->State: 
+def _state_row(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    doc.setdefault("active", True)
+    return doc
+
+
+def stream_states():
+    """Mismos estados que get_states, como NDJSON y sin armar la lista completa."""
+    return ndjson_stream(coll.find({}, STATE_PROJECTION).batch_size(STREAM_BATCH_SIZE), _state_row)
+
+
+async def get_state_id(state_id: str) -> dict: 
     try:
-        doc = coll.find_one({"_id": ObjectId(state_id)}) 
+        doc = await coll.find_one({"_id": ObjectId(state_id)}, STATE_PROJECTION) 
         if not doc: 
             raise HTTPException(status_code=404, detail="State not found")
 
-        doc['id'] = str(doc['_id'])
-        del doc['_id']
-        return State(**doc)
+        return _state_row(doc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching state: {str(e)}")
 
@@ -58,13 +65,13 @@ async def get_state_id(state_id: str) ->State:
 async def update_state(state_id: str, state: State) -> State:
     try:
         state.name = state.name.strip().lower()
-        existing_type = coll.find_one({"name": state.name,"_id": {"$ne": ObjectId(state_id)}}) 
+        existing_type = await coll.find_one({"name": state.name,"_id": {"$ne": ObjectId(state_id)}}) 
         if existing_type:
             raise HTTPException(status_code=400, detail="State name already exists")
         
         state_dict = state.model_dump(exclude={"id"})
 
-        result = coll.update_one( 
+        result = await coll.update_one( 
             {"_id": ObjectId(state_id)},
             {"$set": state_dict} 
         )
@@ -76,9 +83,9 @@ async def update_state(state_id: str, state: State) -> State:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating state: {str(e)}")
     
-async def desactivate_state(state_id: str) -> State:
+async def desactivate_state(state_id: str) -> dict:
     try:
-        result = coll.update_one(
+        result = await coll.update_one(
             {"_id": ObjectId(state_id)},
             {"$set": {"active": False}} 
         )
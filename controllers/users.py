@@ -1,53 +1,41 @@
-import base64
-import json
+import asyncio
+import hashlib
 import os 
 import logging 
-import requests 
-import firebase_admin 
+import uuid
+import httpx
 
+from bson import ObjectId
 from fastapi import HTTPException 
 from dotenv import load_dotenv
-from firebase_admin import credentials, auth as firebase_auth  
+from pymongo.errors import BulkWriteError
 
 from models.users import User
 from models.login import Login
 
 from utils.security import create_jwt_token 
 from utils.mongodb import get_collection
+from utils.http import identity_post
+from utils.user_cache import user_cache
+from utils.firebase import auth_call, get_auth, run_blocking
 
 logging.basicConfig(level=logging.INFO) 
 logger = logging.getLogger(__name__) 
 
-def initialize_firebase():
-    if firebase_admin._apps:
-        return
-    try:
-        firebase_creds_base64 = os.getenv("FIREBASE_CREDENTIALS_BASE64")
-        if firebase_creds_base64:
-            firebase_creds_json = base64.b64decode(firebase_creds_base64).decode('utf-8')
-            firebase_creds = json.loads(firebase_creds_json)
-            cred = credentials.Certificate(firebase_creds)
-            firebase_admin.initialize_app(cred)
-            logger.info("Firebase initialized with environment variable credentials")
-        else:
-            cred = credentials.Certificate("secrets/telefonia-secreto.json")
-            firebase_admin.initialize_app(cred)    
-            logger.info("Firebase initialized with JSON file")
-            
-    except Exception as e:
-        logger.error(f"Failed to initialized Firebase: {e}")
-        raise HTTPException(status_code=500, detail=f"Firebase configuration error: {str(e)}")        
-
-initialize_firebase()
-
 users_coll = get_collection("Users") 
 
+MAX_BULK_USERS = 5000
+# import_users y delete_users aceptan como maximo 1000 usuarios por llamada
+FIREBASE_BATCH_SIZE = 1000
+IMPORT_HASH_ROUNDS = int(os.getenv("FIREBASE_IMPORT_HASH_ROUNDS", "10000"))
+
 async def create_user( user: User ) -> User:
 
     user_record = {}
     try:
-        user_record = firebase_auth.create_user(
-            email=user.email
+        user_record = await auth_call(
+            "create_user"
+            , email=user.email
             , password=user.password
         )
     except Exception as e:
@@ -69,8 +57,8 @@ async def create_user( user: User ) -> User:
         )
 
         user_dict = new_user.model_dump(exclude={"id", "password"})
-        print(str(user_dict))
-        inserted = coll.insert_one(user_dict)
+        inserted = await coll.insert_one(user_dict)
+        user_cache.invalidate(new_user.email)
         # logging(inserted)
         
         new_user.id = str(inserted.inserted_id)
@@ -78,17 +66,141 @@ async def create_user( user: User ) -> User:
         return new_user
 
     except Exception as e:
-        firebase_auth.delete_user(user_record.uid)
+        await auth_call("delete_user", user_record.uid)
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
     
+def _import_record(user: User):
+    """uid + ImportUserRecord con la contraseña ya hasheada (pbkdf2_sha256, CPU: corre en el pool)."""
+    uid = uuid.uuid4().hex
+    salt = os.urandom(16)
+    password_hash = hashlib.pbkdf2_hmac("sha256", user.password.encode(), salt, IMPORT_HASH_ROUNDS)
+    record = get_auth().ImportUserRecord(
+        uid=uid
+        , email=user.email
+        , password_hash=password_hash
+        , password_salt=salt
+    )
+    return uid, record
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _delete_firebase_users(uids: list):
+    """Compensacion: borra de Firebase los usuarios que no se pudieron guardar en Users."""
+    for chunk in _chunks(uids, FIREBASE_BATCH_SIZE):
+        try:
+            result = await auth_call("delete_users", chunk)
+            for err in result.errors:
+                logger.error(f"Could not delete firebase user {chunk[err.index]}: {err.reason}")
+        except Exception as e:
+            logger.error(f"Could not delete firebase users {chunk}: {e}")
+
+
+async def create_users_bulk(users: list[User]) -> dict:
+    """Alta masiva: import_users en Firebase (por bloques de 1000) y un insert_many en Users.
+
+    Devuelve un resultado por elemento (en el mismo orden). Si un usuario entra en
+    Firebase pero no en Users, se borra de Firebase.
+    """
+    try:
+        if not users:
+            raise HTTPException(status_code=400, detail="The batch is empty")
+        if len(users) > MAX_BULK_USERS:
+            raise HTTPException(status_code=400, detail=f"A batch can not exceed {MAX_BULK_USERS} users")
+
+        results = [{"index": i, "email": user.email, "success": False} for i, user in enumerate(users)]
+
+        # 1. Emails repetidos en el lote o ya registrados (una sola consulta)
+        pending = []
+        seen = set()
+        for i, user in enumerate(users):
+            if user.email in seen:
+                results[i]["error"] = "Duplicated email in batch"
+                continue
+            seen.add(user.email)
+            pending.append(i)
+
+        cursor = users_coll.find({"email": {"$in": list(seen)}}, {"email": 1})
+        existing = {doc["email"] async for doc in cursor}
+        for i in [i for i in pending if users[i].email in existing]:
+            results[i]["error"] = "User already exists"
+        pending = [i for i in pending if users[i].email not in existing]
+
+        # 2. Firebase: import_users con las contraseñas hasheadas en el pool
+        firebase_auth = await run_blocking(get_auth)
+        hash_alg = firebase_auth.UserImportHash.pbkdf2_sha256(rounds=IMPORT_HASH_ROUNDS)
+        uids = {}
+        for chunk in _chunks(pending, FIREBASE_BATCH_SIZE):
+            records = await asyncio.gather(*(run_blocking(_import_record, users[i]) for i in chunk))
+            try:
+                result = await auth_call("import_users", [record for _, record in records], hash_alg=hash_alg)
+            except Exception as e:
+                logger.warning(e)
+                for i in chunk:
+                    results[i]["error"] = "Error al registrar usuario en firebase"
+                continue
+            errors = {err.index: err.reason for err in result.errors}
+            for k, i in enumerate(chunk):
+                if k in errors:
+                    results[i]["error"] = f"Error al registrar usuario en firebase: {errors[k]}"
+                else:
+                    uids[i] = records[k][0]
+
+        # 3. Users: un insert_many sin orden; lo que falle se compensa en Firebase
+        docs = []
+        for i in uids:
+            user = users[i]
+            new_user = User(
+                name=user.name
+                , lastname=user.lastname
+                , email=user.email
+                , phone=user.phone
+                , password=user.password
+            )
+            user_dict = new_user.model_dump(exclude={"id", "password"})
+            user_dict["_id"] = ObjectId()
+            docs.append((i, user_dict))
+
+        failed = {}
+        if docs:
+            try:
+                await users_coll.insert_many([doc for _, doc in docs], ordered=False)
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    failed[docs[err["index"]][0]] = err.get("errmsg", "Database error")
+            except Exception as e:
+                await _delete_firebase_users(list(uids.values()))
+                raise e
+            if failed:
+                await _delete_firebase_users([uids[i] for i in failed])
+
+        for i, doc in docs:
+            user_cache.invalidate(doc["email"])
+            if i in failed:
+                results[i]["error"] = failed[i]
+                continue
+            results[i].update({"success": True, "id": str(doc["_id"])})
+
+        created = sum(1 for r in results if r["success"])
+        return {"created": created, "failed": len(results) - created, "results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating users: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 async def login(user: Login) -> dict:
     api_key = os.getenv("FIREBASE_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Config de autenticación incompleta")
 
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
     payload = {
         "email": user.email,
         "password": user.password,
@@ -96,8 +208,8 @@ async def login(user: Login) -> dict:
     }
 
     try:
-        resp = requests.post(url, json=payload, timeout=8)  # requests es sync; OK si lo aceptas
-    except requests.RequestException:
+        resp = await identity_post("accounts:signInWithPassword", api_key, payload)
+    except httpx.HTTPError:
         # Error de red/timeout con Firebase
         raise HTTPException(status_code=502, detail="Error de conexión con el proveedor de auth")
 
@@ -115,7 +227,7 @@ async def login(user: Login) -> dict:
         raise HTTPException(status_code=502, detail="Error al iniciar sesión. Intenta más tarde.")
 
     # Buscar usuario en tu base (puede no existir aunque Firebase haya autenticado)
-    user_info = users_coll.find_one({"email": user.email})
+    user_info = await users_coll.find_one({"email": user.email})
     if not user_info:
         # Decide si esto es 404 o 401; aquí 401 para no filtrar existencia
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
@@ -127,7 +239,9 @@ async def login(user: Login) -> dict:
         user_info.get("phone"),
         user_info.get("active"),
         user_info.get("admin"),
+        str(user_info["_id"]),
     )
+    user_cache.put(user_info["email"], user_info)
 
     return {
         "message": "Usuario autenticado correctamente",
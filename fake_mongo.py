@@ -0,0 +1,281 @@
+"""
+Coleccion de Mongo en memoria para las pruebas.
+
+Cubre solo lo que usan los controladores probados: filtros por igualdad y con
+$in/$nin/$ne/$gt/$gte/$lt/$lte/$exists/$type/$and/$or, insert_one/insert_many
+(con _id unico: DuplicateKeyError / BulkWriteError con codigo 11000),
+find/find_one (con sort/limit), count_documents, bulk_write de UpdateOne,
+update_one/update_many/find_one_and_update ($set/$setOnInsert/$unset/$inc/
+$max/$min, con upsert), delete_one/delete_many, create_indexes y aggregate
+con $match/$sort/$skip/$limit/$count/$facet o $indexStats (el uso de cada
+indice se fija en index_ops). Cada operacion cede el event loop una vez,
+para que las pruebas de concurrencia intercalen de verdad.
+"""
+import asyncio
+import copy
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+_MISSING = object()
+
+# alias de $type que se usan en las consultas de la API
+_BSON_TYPES = {"string": str, "objectId": ObjectId}
+
+
+def _match_value(value, cond) -> bool:
+    if isinstance(cond, dict) and cond and all(key.startswith("$") for key in cond):
+        for op, arg in cond.items():
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$exists" and (value is not _MISSING) != bool(arg):
+                return False
+            if op == "$type" and not isinstance(value, _BSON_TYPES[arg]):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or value is None:
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+        return True
+    return value == cond
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in cond):
+                return False
+        elif not _match_value(doc.get(key, _MISSING), cond):
+            return False
+    return True
+
+
+def _sorted(docs: list, spec) -> list:
+    keys = list(spec.items()) if isinstance(spec, dict) else list(spec)
+    for field, order in reversed(keys):
+        docs = sorted(docs, key=lambda doc: doc[field], reverse=order == -1)
+    return docs
+
+
+def run_pipeline(docs: list, pipeline: list) -> list:
+    for stage in pipeline:
+        (op, arg), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, arg)]
+        elif op == "$sort":
+            docs = _sorted(docs, arg)
+        elif op == "$skip":
+            docs = docs[arg:]
+        elif op == "$limit":
+            docs = docs[:arg]
+        elif op == "$count":
+            docs = [{arg: len(docs)}] if docs else []
+        elif op == "$facet":
+            docs = [{name: run_pipeline(docs, sub) for name, sub in arg.items()}]
+        else:
+            raise NotImplementedError(f"FakeCollection.aggregate no soporta {op}")
+    return docs
+
+
+def _apply(doc: dict, update: dict, inserting: bool):
+    for key, value in update.get("$set", {}).items():
+        doc[key] = value
+    if inserting:
+        for key, value in update.get("$setOnInsert", {}).items():
+            doc[key] = value
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+    for key, value in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + value
+    for key, value in update.get("$max", {}).items():
+        doc[key] = value if doc.get(key) is None else max(doc[key], value)
+    for key, value in update.get("$min", {}).items():
+        doc[key] = value if doc.get(key) is None else min(doc[key], value)
+
+
+class FakeResult:
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeCursor:
+
+    def __init__(self, docs: list):
+        self.docs = docs
+
+    def batch_size(self, n: int):
+        return self
+
+    def sort(self, key, direction=1):
+        self.docs = _sorted(self.docs, [(key, direction)] if isinstance(key, str) else key)
+        return self
+
+    def limit(self, n: int):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    def __aiter__(self):
+        async def gen():
+            for doc in self.docs:
+                yield doc
+        return gen()
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class FakeCollection:
+
+    def __init__(self, docs: list = None, name: str = "fake"):
+        self.name = name
+        self.docs = {}
+        self.fail_insert = None
+        # nombre del indice -> accesses.ops de $indexStats
+        self.index_ops = {"_id_": 0}
+        for doc in docs or []:
+            self._insert(doc)
+
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("E11000 duplicate key error", code=11000)
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def insert_one(self, doc: dict):
+        await asyncio.sleep(0)
+        if self.fail_insert:
+            raise self.fail_insert
+        self._insert(doc)
+        return FakeResult(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: list, ordered: bool = True):
+        await asyncio.sleep(0)
+        if self.fail_insert:
+            raise self.fail_insert
+        errors, inserted = [], []
+        for i, doc in enumerate(docs):
+            try:
+                self._insert(doc)
+                inserted.append(doc["_id"])
+            except DuplicateKeyError:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return FakeResult(inserted_ids=inserted)
+
+    def find(self, query: dict = None, projection: dict = None):
+        return FakeCursor([copy.deepcopy(doc) for doc in self.docs.values() if matches(doc, query)])
+
+    async def find_one(self, query: dict = None, projection: dict = None):
+        await asyncio.sleep(0)
+        for doc in self.docs.values():
+            if matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def count_documents(self, query: dict = None) -> int:
+        await asyncio.sleep(0)
+        return sum(1 for doc in self.docs.values() if matches(doc, query))
+
+    async def bulk_write(self, requests: list, ordered: bool = True):
+        await asyncio.sleep(0)
+        modified, errors = 0, []
+        for i, request in enumerate(requests):
+            if not isinstance(request, UpdateOne):
+                raise NotImplementedError("FakeCollection.bulk_write solo soporta UpdateOne")
+            try:
+                before, _ = self._update(request._filter, request._doc, request._upsert)
+            except DuplicateKeyError:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+                continue
+            modified += int(before is not None)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nModified": modified})
+        return FakeResult(modified_count=modified, matched_count=modified)
+
+    def _update(self, query: dict, update: dict, upsert: bool):
+        """Devuelve (antes, despues); antes es None si no habia documento."""
+        for doc in self.docs.values():
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                _apply(doc, update, inserting=False)
+                return before, doc
+        if not upsert:
+            return None, None
+        doc = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        _apply(doc, update, inserting=True)
+        self._insert(doc)
+        return None, self.docs[doc["_id"]]
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        before, after = self._update(query, update, upsert)
+        return FakeResult(matched_count=int(before is not None), modified_count=int(before is not None))
+
+    async def update_many(self, query: dict, update: dict):
+        await asyncio.sleep(0)
+        modified = 0
+        for doc in self.docs.values():
+            if matches(doc, query):
+                _apply(doc, update, inserting=False)
+                modified += 1
+        return FakeResult(matched_count=modified, modified_count=modified)
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: dict = None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE):
+        await asyncio.sleep(0)
+        before, after = self._update(query, update, upsert)
+        result = after if return_document == ReturnDocument.AFTER else before
+        return copy.deepcopy(result)
+
+    async def create_indexes(self, models: list) -> list:
+        await asyncio.sleep(0)
+        names = [model.document["name"] for model in models]
+        for name in names:
+            self.index_ops.setdefault(name, 0)
+        return names
+
+    async def aggregate(self, pipeline: list, **kwargs):
+        await asyncio.sleep(0)
+        if pipeline == [{"$indexStats": {}}]:
+            return FakeCursor([{"name": name, "accesses": {"ops": ops}} for name, ops in self.index_ops.items()])
+        return FakeCursor(run_pipeline([copy.deepcopy(doc) for doc in self.docs.values()], pipeline))
+
+    async def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+    async def delete_one(self, query: dict):
+        await asyncio.sleep(0)
+        for key, doc in self.docs.items():
+            if matches(doc, query):
+                del self.docs[key]
+                return FakeResult(deleted_count=1)
+        return FakeResult(deleted_count=0)
+
+    async def delete_many(self, query: dict):
+        await asyncio.sleep(0)
+        keys = [key for key, doc in self.docs.items() if matches(doc, query)]
+        for key in keys:
+            del self.docs[key]
+        return FakeResult(deleted_count=len(keys))
@@ -1,9 +1,23 @@
+import asyncio
 import logging  
-import uvicorn 
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request
 from dotenv import load_dotenv 
 
+from utils.mongodb import connect_mongo, close_mongo, get_pool_status
+from utils.indexes import ensure_indexes, index_report
+from utils.expiry import start_expiry_task
+from utils.slots import sync_slots
+from utils.order_stats import ensure_stats
+from utils.availability import availability_index, start_refresh_task
+from utils.tasks import stop_task
+from utils.http import close_http_client
+from utils.firebase import shutdown_executor, warm_up
+from utils.settings import settings_service
+from utils.security import require_admin
+from utils.serialization import ORJSONResponse
+
 from routes.users import router as users_router
 from routes.states import router as states_router
 from routes.appointment import router as appointment_router
@@ -11,8 +25,39 @@ from routes.services import router as service_router
 from routes.orders import router as orders_router
 from routes.inventory import router as inventory_router
 from routes.inventorytypes import router as inventorytypes_router
+from routes.settings import router as settings_router
+
+async def bootstrap_step(name: str, step):
+    try:
+        await step()
+    except Exception as e:
+        logger.error(f"Database bootstrap step {name} failed: {e}")
 
-app = FastAPI()  
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El cliente de Mongo se crea por worker (despues del fork) y se cierra al apagar
+    connect_mongo()
+    # cada paso por separado: si uno falla, los demas igual corren y el log dice cual fue
+    await bootstrap_step("ensure_indexes", ensure_indexes)
+    await bootstrap_step("sync_slots", sync_slots)
+    await bootstrap_step("availability_index.load", availability_index.load)
+    await bootstrap_step("settings_service.load", settings_service.load)
+    # primer arranque tras el deploy: OrderStats se siembra desde Orders
+    await bootstrap_step("ensure_stats", ensure_stats)
+    # Firebase se inicializa en segundo plano: el worker empieza a responder sin esperarlo
+    firebase_task = asyncio.create_task(warm_up())
+    expiry_task = start_expiry_task()
+    availability_task = start_refresh_task()
+    yield
+    await stop_task(availability_task)
+    await stop_task(expiry_task)
+    await stop_task(firebase_task)
+    await close_http_client()
+    shutdown_executor()
+    await close_mongo()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 #Add CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -47,10 +92,10 @@ def health_check():
         return {"status": "unhealthy", "error": str(e)}    
     
 @app.get("/ready")
-def readiness_check():
+async def readiness_check():
     try:
-        from utils.mongodb import test_connection
-        db_status = test_connection()
+        from utils.mongodb import t_connection
+        db_status = await t_connection()
         return {
             "status": "ready" if db_status else "not_ready",
             "database": "connected" if db_status else "disconnected",
@@ -59,6 +104,14 @@ def readiness_check():
     except Exception as e:
         return {"status": "not_ready", "error": str(e)}        
 
+@app.get("/metrics/db-pool", dependencies=[Depends(require_admin)])
+def db_pool_metrics(request: Request):
+    return get_pool_status()
+
+@app.get("/metrics/indexes", dependencies=[Depends(require_admin)])
+async def index_metrics(request: Request):
+    return await index_report()
+
 
 app.include_router(users_router)
 app.include_router(states_router)
@@ -67,6 +120,8 @@ app.include_router(service_router)
 app.include_router(orders_router)
 app.include_router(inventory_router)
 app.include_router(inventorytypes_router)
+app.include_router(settings_router)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
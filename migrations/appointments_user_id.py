@@ -0,0 +1,33 @@
+"""
+Migracion: normaliza Appointments.user_id a ObjectId.
+
+Las citas antiguas guardaban user_id como string, lo que obligaba a los
+pipelines a usar $expr/$toObjectId (sin indice). Este script reescribe esos
+documentos por lotes con bulk_write. Es reanudable: solo procesa documentos
+cuyo user_id todavia es string, asi que se puede cortar y volver a correr.
+
+    python -m migrations.appointments_user_id [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+
+from migrations.common import normalize_object_id_field
+from utils.mongodb import close_mongo
+
+
+async def migrate(batch_size: int = 1000, dry_run: bool = False) -> dict:
+    return await normalize_object_id_field("Appointments", "user_id", batch_size, dry_run)
+
+
+async def _main(args):
+    try:
+        await migrate(args.batch_size, args.dry_run)
+    finally:
+        await close_mongo()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normaliza Appointments.user_id a ObjectId")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(_main(parser.parse_args()))
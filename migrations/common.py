@@ -0,0 +1,52 @@
+"""
+Utilidades compartidas por las migraciones.
+"""
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection
+
+
+async def normalize_object_id_field(col_name: str, field: str, batch_size: int = 1000, dry_run: bool = False) -> dict:
+    """Convierte a ObjectId los valores string de `field` en `col_name`, por lotes con bulk_write.
+
+    Es reanudable: solo procesa documentos donde el campo todavia es string y
+    recorre la coleccion por _id, asi que se puede cortar y volver a correr.
+    """
+    coll = get_collection(col_name)
+    legacy_filter = {field: {"$type": "string"}}
+    pending = await coll.count_documents(legacy_filter)
+    print(f"{col_name} with string {field}: {pending}")
+
+    processed = updated = 0
+    invalid = []
+    last_id = None
+    while True:
+        query = dict(legacy_filter)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await coll.find(query, {field: 1}).sort("_id", 1).limit(batch_size).to_list()
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            if ObjectId.is_valid(doc[field]):
+                # el filtro incluye el valor original por si alguien lo cambio mientras tanto
+                ops.append(UpdateOne(
+                    {"_id": doc["_id"], field: doc[field]},
+                    {"$set": {field: ObjectId(doc[field])}}
+                ))
+            else:
+                invalid.append(str(doc["_id"]))
+
+        if ops and not dry_run:
+            result = await coll.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+        processed += len(batch)
+        print(f"  {processed}/{pending} processed, {updated} updated, {len(invalid)} invalid")
+
+    if invalid:
+        print(f"{col_name} documents with a {field} that is not an ObjectId (left untouched): {', '.join(invalid)}")
+    return {"processed": processed, "updated": updated, "invalid": invalid}
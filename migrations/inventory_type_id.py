@@ -0,0 +1,33 @@
+"""
+Migracion: normaliza Inventory.id_inventory_type a ObjectId.
+
+Los items se guardaban con id_inventory_type como string, asi que cada
+pipeline convertia el campo documento por documento antes del $lookup y el
+conteo de items por tipo no podia usar indice. Es reanudable igual que
+migrations/appointments_user_id.py.
+
+    python -m migrations.inventory_type_id [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+
+from migrations.common import normalize_object_id_field
+from utils.mongodb import close_mongo
+
+
+async def migrate(batch_size: int = 1000, dry_run: bool = False) -> dict:
+    return await normalize_object_id_field("Inventory", "id_inventory_type", batch_size, dry_run)
+
+
+async def _main(args):
+    try:
+        await migrate(args.batch_size, args.dry_run)
+    finally:
+        await close_mongo()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normaliza Inventory.id_inventory_type a ObjectId")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,41 @@
+"""
+Migracion: agrega created_at a las ordenes que no lo tienen.
+
+Las ordenes anteriores no guardaban fecha; se toma la fecha de creacion de su
+_id (ObjectId). Es reanudable: solo toca ordenes sin created_at. Al terminar
+sube la generacion de OrderStats para que los workers descarten las series de
+/statistics/timeseries que cachearon sin estas ordenes.
+
+    python -m migrations.orders_created_at [--dry-run]
+"""
+import argparse
+import asyncio
+
+from utils.mongodb import close_mongo, get_collection
+from utils.order_stats import bump_generation
+
+
+async def migrate(dry_run: bool = False) -> int:
+    coll = get_collection("Orders")
+    legacy_filter = {"created_at": {"$exists": False}}
+    pending = await coll.count_documents(legacy_filter)
+    print(f"Orders without created_at: {pending}")
+    if dry_run or not pending:
+        return 0
+    result = await coll.update_many(legacy_filter, [{"$set": {"created_at": {"$toDate": "$_id"}}}])
+    print(f"Updated: {result.modified_count}")
+    await bump_generation()
+    return result.modified_count
+
+
+async def _main(args):
+    try:
+        await migrate(args.dry_run)
+    finally:
+        await close_mongo()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agrega created_at a Orders a partir del _id")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(_main(parser.parse_args()))
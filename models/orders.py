@@ -1,4 +1,5 @@
 import re
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -31,3 +32,8 @@ class Order(BaseModel):
         gt=0
     )
     
+    created_at: Optional[datetime] = Field(
+        default=None,
+        description="Fecha de creación (UTC), la asigna la API"
+    )
+    
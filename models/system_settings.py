@@ -8,7 +8,15 @@ class SystemSetting(BaseModel):
     key: str = Field(
         description="Clave única de la configuración"
         )
-    value: int = Field(..., 
-        description="Valor numérico de la configuración"
+    value: float = Field(..., 
+        description="Valor numérico de la configuración (p.ej. 2 horas o 0.15 de impuesto)"
         )
-    description: Optional[str] = None       
\ No newline at end of file
+    description: Optional[str] = None
+
+
+class SystemSettingUpdate(BaseModel):
+    """Cuerpo de PUT /settings/{key}: la clave va en la ruta."""
+    value: float = Field(...,
+        description="Valor numérico de la configuración (p.ej. 2 horas o 0.15 de impuesto)"
+        )
+    description: Optional[str] = None
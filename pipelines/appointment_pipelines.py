@@ -1,6 +1,17 @@
 from datetime import datetime, timedelta
 from bson import ObjectId
 
+from pipelines.builder import PipelineBuilder
+
+# Estado de la CITA calculado al leer: una cita pasada se muestra inactiva aunque
+# utils/expiry.py todavia no la haya marcado en la base.
+EFFECTIVE_ACTIVE = {
+    "$and": [
+        {"$ifNull": ["$active", True]},
+        {"$gt": ["$date_appointment", "$$NOW"]}
+    ]
+}
+
 def date_appointment_pipeline(date_appointment: datetime, exclude_id: str = None) -> list:
     """
     Cuenta citas activas que caen en la ventana +/- 30 min para evitar solapes,
@@ -17,60 +28,41 @@ def date_appointment_pipeline(date_appointment: datetime, exclude_id: str = None
     if exclude_id and ObjectId.is_valid(exclude_id):
         match_stage["_id"] = {"$ne": ObjectId(exclude_id)}
 
-    return [
-        {"$match": match_stage},
-        {"$count": "count"}
-    ]
+    return PipelineBuilder().match(match_stage).count("count").build()
 
 def get_user_appointments_pipeline(
     user_oid: ObjectId, skip: int = 0, limit: int = 10, include_inactive: bool = True
 ) -> list:
-    # match por usuario (soporta user_id como ObjectId o string)
-    match_user = {
-        "$or": [
-            {"user_id": user_oid},  # si está guardado como ObjectId
-            {"$expr": {"$eq": [{"$toObjectId": "$user_id"}, user_oid]}}  # si es string
-        ]
-    }
+    return user_appointments_query(user_oid, skip, limit, include_inactive).build()
+
+
+def user_appointments_query(
+    user_oid: ObjectId, skip: int = 0, limit: int = 10, include_inactive: bool = True, after: tuple = None
+) -> PipelineBuilder:
+    # match por usuario (user_id se guarda como ObjectId, ver migrations/appointments_user_id.py)
+    match_user = {"user_id": user_oid}
     # si quisieras solo activas, cambia include_inactive=False
     if not include_inactive:
         match_user["active"] = True
 
-    return [
-        {"$match": match_user},
-
-        # Para armar user_name en la salida:
-        {"$addFields": {
-            "user_id_obj": {
-                "$cond": [
-                    {"$eq": [{"$type": "$user_id"}, "objectId"]},
-                    "$user_id",
-                    {"$toObjectId": "$user_id"}
-                ]
-            }
-        }},
-        {"$lookup": {
-            "from": "Users",        # OJO: cámbialo a "users" si tu colección es minúscula
-            "localField": "user_id_obj",
-            "foreignField": "_id",
-            "as": "user_info"
-        }},
-        {"$unwind": "$user_info"},
-
+    return (
+        PipelineBuilder()
+        .match(match_user)
+        # Para armar user_name en la salida. El usuario existe (se busco antes por email),
+        # asi que el join no descarta citas y la paginacion va antes del $lookup.
         # ❌ NO FILTRAR user_info.active AQUÍ (para ver citas aunque el user esté inactivo)
-
-        {"$sort": {"date_creation": -1}},
-        {"$skip": int(skip)},
-        {"$limit": int(limit)},
-
-        {"$project": {
+        .join("Users", "user_id", "_id", "user_info", required=False)
+        .keyset("date_creation", -1, after)
+        .skip(skip)
+        .limit(limit)
+        .project({
             "_id": 0,
             "id": {"$toString": "$_id"},
             "user_id": {"$toString": "$user_id"},
             "date_appointment": 1,
             "date_creation": 1,
             "comment": "$comment",
-            "active": "$active",
+            "active": EFFECTIVE_ACTIVE,
             "user_name": {
                 "$let": {
                     "vars": {
@@ -95,120 +87,78 @@ def get_user_appointments_pipeline(
                     }
                 }
             }
-        }}
-    ]
+        })
+    )
 
 
 def get_all_appointments_pipeline(skip: int = 0, limit: int = 10) -> list:
+    return all_appointments_query(skip, limit).build()
+
+
+def all_appointments_query(skip: int = 0, limit: int = 10, after: tuple = None) -> PipelineBuilder:
     """
     Todas las citas (enriquecidas con el usuario). Por defecto filtra a usuarios activos.
     Incluye id y active de la CITA para que el front pinte bien el estado.
     """
-    return [
-        # Soporta user_id como ObjectId o como string
-        {
-            "$addFields": {
-                "user_id_obj": {
-                    "$cond": [
-                        {"$eq": [{"$type": "$user_id"}, "objectId"]},
-                        "$user_id",
-                        {"$toObjectId": "$user_id"}
-                    ]
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "Users",
-                "localField": "user_id_obj",
-                "foreignField": "_id",
-                "as": "user_info"
-            }
-        },
-        {"$unwind": "$user_info"},
-        # Si quieres ver citas aunque el usuario esté inactivo, comenta este $match
-        {"$match": {"user_info.active": True}},
-
-        {"$sort": {"date_creation": -1}},
-        {"$skip": int(skip)},
-        {"$limit": int(limit)},
-
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},         # clave única para React
-                "user_id": {"$toString": "$user_id"},
-                "user_name": "$user_info.name",
-                "date_appointment": 1,
-                "date_creation": 1,
-                "comment": "$comment",
-                "active": "$active"                  # estado de la CITA (no del usuario)
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .join("Users", "user_id", "_id", "user_info")
+        # Si quieres ver citas aunque el usuario esté inactivo, comenta este filtro
+        # (sin él la paginación se adelanta al $lookup)
+        .match_joined({"user_info.active": True})
+        .keyset("date_creation", -1, after)
+        .skip(skip)
+        .limit(limit)
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},         # clave única para React
+            "user_id": {"$toString": "$user_id"},
+            "user_name": "$user_info.name",
+            "date_appointment": 1,
+            "date_creation": 1,
+            "comment": "$comment",
+            "active": EFFECTIVE_ACTIVE           # estado de la CITA (no del usuario)
+        })
+    )
 
 
 def get_appointment_by_id_pipeline(appointment_id: str) -> list:
     """
     Cita por ID (enriquecida con usuario). Devuelve id y active de la cita.
     """
-    return [
-        {"$match": {"_id": ObjectId(appointment_id)}},
-        {
-            "$addFields": {
-                "user_id_obj": {
-                    "$cond": [
-                        {"$eq": [{"$type": "$user_id"}, "objectId"]},
-                        "$user_id",
-                        {"$toObjectId": "$user_id"}
-                    ]
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "Users",
-                "localField": "user_id_obj",
-                "foreignField": "_id",
-                "as": "user_info"
-            }
-        },
-        {"$unwind": "$user_info"},
-        # Si quieres ver la cita aunque el usuario esté inactivo, comenta este $match
-        {"$match": {"user_info.active": True}},
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "user_name": "$user_info.name",
-                "user_id": {"$toString": "$user_id"},
-                "date_appointment": 1,
-                "date_creation": 1,
-                "comment": "$comment",
-                "active": "$active"   # estado de la CITA
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .match({"_id": ObjectId(appointment_id)})
+        .join("Users", "user_id", "_id", "user_info")
+        # Si quieres ver la cita aunque el usuario esté inactivo, comenta este filtro
+        .match_joined({"user_info.active": True})
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "user_name": "$user_info.name",
+            "user_id": {"$toString": "$user_id"},
+            "date_appointment": 1,
+            "date_creation": 1,
+            "comment": "$comment",
+            "active": EFFECTIVE_ACTIVE   # estado de la CITA
+        })
+        .build()
+    )
 
 
 def validate_user_pipeline(user_id: str) -> list:
     """
     Valida que el usuario exista y esté activo.
     """
-    return [
-        {
-            "$match": {
-                "_id": ObjectId(user_id),
-                "active": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "name": 1,
-                "active": 1,
-                "admin": 1
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .match({"_id": ObjectId(user_id), "active": True})
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "name": 1,
+            "active": 1,
+            "admin": 1
+        })
+        .build()
+    )
@@ -0,0 +1,187 @@
+"""
+Composicion de pipelines de agregacion.
+
+Los builders de pipelines/ describen QUE quieren (filtros, joins, orden,
+paginacion, proyeccion) y PipelineBuilder decide el orden de las etapas:
+$match, $sort, $skip y $limit se ejecutan antes de los $lookup siempre que
+sea seguro, para que una pagina de 10 cueste 10 lookups y no N.
+
+- $sort va antes de los joins si no ordena por campos traidos por un join
+  (filtrar despues no cambia el orden, y asi el orden sale del indice).
+- $skip/$limit van antes de los joins si ningun join puede descartar
+  documentos (join con required=True o filtro con match_joined).
+"""
+
+
+class PipelineBuilder:
+
+    def __init__(self):
+        self._match = {}
+        self._keyset = None
+        self._joins = []
+        self._joined_match = {}
+        self._sort = None
+        self._skip = None
+        self._limit = None
+        self._project = None
+        self._count = None
+
+    def match(self, query: dict) -> "PipelineBuilder":
+        """Filtro sobre campos del documento base (va antes de cualquier join)."""
+        self._match.update(query)
+        return self
+
+    def join(
+        self,
+        from_: str,
+        local_field: str,
+        foreign_field: str,
+        as_: str,
+        required: bool = True,
+        unwind: bool = True,
+        pipeline: list = None,
+    ) -> "PipelineBuilder":
+        """$lookup (+ $unwind).
+
+        required=True es un inner join: los documentos sin pareja se descartan,
+        por lo que la paginacion tiene que ir despues. required=False conserva
+        el documento aunque no haya pareja (preserveNullAndEmptyArrays).
+        """
+        lookup = {
+            "from": from_,
+            "localField": local_field,
+            "foreignField": foreign_field,
+            "as": as_,
+        }
+        if pipeline is not None:
+            lookup["pipeline"] = pipeline
+        stages = [{"$lookup": lookup}]
+        if unwind:
+            if required:
+                stages.append({"$unwind": f"${as_}"})
+            else:
+                stages.append({"$unwind": {"path": f"${as_}", "preserveNullAndEmptyArrays": True}})
+        self._joins.append({"as": as_, "stages": stages, "filters": unwind and required})
+        return self
+
+    def match_joined(self, query: dict) -> "PipelineBuilder":
+        """Filtro sobre campos traidos por un join (obliga a paginar despues del join)."""
+        self._joined_match.update(query)
+        return self
+
+    def sort(self, spec: dict) -> "PipelineBuilder":
+        self._sort = spec
+        return self
+
+    def keyset(self, field: str, direction: int, after: tuple = None) -> "PipelineBuilder":
+        """Orden por (field, _id) y, si se pasa after=(valor, _id), solo documentos posteriores a ese par."""
+        self._sort = {field: direction, "_id": direction}
+        self._keyset = None
+        if after is not None:
+            value, oid = after
+            op = "$gt" if direction == 1 else "$lt"
+            self._keyset = {"$or": [
+                {field: {op: value}},
+                {field: value, "_id": {op: oid}},
+            ]}
+        return self
+
+    def skip(self, n: int) -> "PipelineBuilder":
+        self._skip = int(n)
+        return self
+
+    def limit(self, n: int) -> "PipelineBuilder":
+        """None = sin limite (p.ej. respuestas en streaming)."""
+        self._limit = None if n is None else int(n)
+        return self
+
+    def project(self, spec: dict) -> "PipelineBuilder":
+        self._project = spec
+        return self
+
+    def count(self, field: str = "count") -> "PipelineBuilder":
+        self._count = field
+        return self
+
+    def _joined_fields(self) -> set:
+        return {join["as"] for join in self._joins}
+
+    def _sort_depends_on_join(self) -> bool:
+        if not self._sort:
+            return False
+        joined = self._joined_fields()
+        return any(key.split(".")[0] in joined for key in self._sort)
+
+    def _can_push_down(self) -> bool:
+        if self._joined_match or self._sort_depends_on_join():
+            return False
+        return not any(join["filters"] for join in self._joins)
+
+    def _match_stages(self, with_keyset: bool) -> list:
+        query = self._match
+        if with_keyset and self._keyset:
+            query = {"$and": [self._match, self._keyset]} if self._match else self._keyset
+        return [{"$match": query}] if query else []
+
+    def _join_stages(self) -> list:
+        stages = []
+        for join in self._joins:
+            stages.extend(join["stages"])
+        if self._joined_match:
+            stages.append({"$match": self._joined_match})
+        return stages
+
+    def _early_sort_stages(self) -> list:
+        if self._sort and not self._sort_depends_on_join():
+            return [{"$sort": self._sort}]
+        return []
+
+    def _late_sort_stages(self) -> list:
+        if self._sort and self._sort_depends_on_join():
+            return [{"$sort": self._sort}]
+        return []
+
+    def _skip_limit_stages(self) -> list:
+        stages = []
+        if self._skip:
+            stages.append({"$skip": self._skip})
+        if self._limit is not None:
+            stages.append({"$limit": self._limit})
+        return stages
+
+    def _project_stages(self) -> list:
+        return [{"$project": self._project}] if self._project else []
+
+    def filter_stages(self) -> list:
+        """Etapas que deciden QUE documentos entran en el resultado (sirven para contar)."""
+        stages = self._match_stages(with_keyset=False)
+        if not self._can_push_down():
+            stages += self._join_stages()
+        return stages
+
+    def facet(self) -> list:
+        """Pagina y total en una sola agregacion (paginacion por offset)."""
+        stages = self._match_stages(with_keyset=False) + self._early_sort_stages()
+        items = self._late_sort_stages() + self._skip_limit_stages()
+        if self._can_push_down():
+            items += self._join_stages()
+        else:
+            stages += self._join_stages()
+        items += self._project_stages()
+        return stages + [{
+            "$facet": {
+                "items": items,
+                "total": [{"$count": "total"}],
+            }
+        }]
+
+    def build(self) -> list:
+        stages = self._match_stages(with_keyset=True) + self._early_sort_stages()
+        if self._can_push_down():
+            stages += self._skip_limit_stages() + self._join_stages()
+        else:
+            stages += self._join_stages() + self._late_sort_stages() + self._skip_limit_stages()
+        stages += self._project_stages()
+        if self._count:
+            stages.append({"$count": self._count})
+        return stages
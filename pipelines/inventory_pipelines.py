@@ -3,152 +3,84 @@ Pipelines para Inventory
 """
 from bson import ObjectId
 
+from pipelines.builder import PipelineBuilder
+
+# Campos que devuelven todos los listados de inventario
+INVENTORY_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "id_inventory_type": {"$toString": "$id_inventory_type"},
+    "name": "$name",
+    "active": "$active",
+    "creation_date": "$creation_date",
+    "inventory_type_name": "$inventory_type.name"
+}
+
 
 def validate_inventory_type_pipeline(inventory_type_id: str) -> list:
     """
     Valida que un tipo de inventario exista y esté activo
     """
-    return [
-        {
-            "$match": {
-                "_id": ObjectId(inventory_type_id),
-                "active": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "name": "$name",
-                "active": "$active"
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .match({"_id": ObjectId(inventory_type_id), "active": True})
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "name": "$name",
+            "active": "$active"
+        })
+        .build()
+    )
 
 
 def get_inventory_with_type_pipeline(inventory_id: str) -> list:
     """
     Devuelve un inventario específico con información de su tipo
     """
-    return [
-        {"$match": {"_id": ObjectId(inventory_id)}},
-        {
-            "$addFields": {
-                "id_inventory_type_obj": {
-                    "$cond": [
-                        {"$eq": [{"$type": "$id_inventory_type"}, "objectId"]},
-                        "$id_inventory_type",
-                        {"$toObjectId": "$id_inventory_type"}
-                    ]
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "inventorytypes",
-                "localField": "id_inventory_type_obj",
-                "foreignField": "_id",
-                "as": "inventory_type"
-            }
-        },
-        {"$unwind": "$inventory_type"},
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "id_inventory_type": {"$toString": "$id_inventory_type_obj"},
-                "name": "$name",
-                "active": "$active",
-                "creation_date": "$creation_date",
-                "inventory_type_name": "$inventory_type.name"
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .match({"_id": ObjectId(inventory_id)})
+        .join("inventorytypes", "id_inventory_type", "_id", "inventory_type")
+        .project(INVENTORY_PROJECTION)
+        .build()
+    )
 
 
 def get_all_inventories_with_types_pipeline(skip: int = 0, limit: int = 10) -> list:
+    return all_inventories_with_types_query(skip, limit).build()
+
+
+def all_inventories_with_types_query(skip: int = 0, limit: int = 10, after: tuple = None) -> PipelineBuilder:
     """
-    Devuelve todos los inventarios con información de su tipo
+    Devuelve todos los inventarios con información de su tipo.
+    Un tipo con items asignados nunca se borra (solo se desactiva), asi que el
+    join no descarta items y la paginacion va antes del $lookup.
     """
-    return [
-        {
-            "$addFields": {
-                "id_inventory_type_obj": {
-                    "$cond": [
-                        {"$eq": [{"$type": "$id_inventory_type"}, "objectId"]},
-                        "$id_inventory_type",
-                        {"$toObjectId": "$id_inventory_type"}
-                    ]
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "inventorytypes",
-                "localField": "id_inventory_type_obj",
-                "foreignField": "_id",
-                "as": "inventory_type"
-            }
-        },
-        {"$unwind": "$inventory_type"},
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "id_inventory_type": {"$toString": "$id_inventory_type_obj"},
-                "name": "$name",
-                "active": "$active",
-                "creation_date": "$creation_date",
-                "inventory_type_name": "$inventory_type.name"
-            }
-        },
-        {"$skip": skip},
-        {"$limit": limit}
-    ]
+    return (
+        PipelineBuilder()
+        .join("inventorytypes", "id_inventory_type", "_id", "inventory_type", required=False)
+        .keyset("name", 1, after)
+        .skip(skip)
+        .limit(limit)
+        .project(INVENTORY_PROJECTION)
+    )
 
 
 def get_inventories_by_type_name_pipeline(type_name: str, skip: int = 0, limit: int = 10) -> list:
+    return inventories_by_type_name_query(type_name, skip, limit).build()
+
+
+def inventories_by_type_name_query(type_name: str, skip: int = 0, limit: int = 10) -> PipelineBuilder:
     """
     Devuelve inventarios filtrados por el nombre de su tipo
     """
-    return [
-        {
-            "$addFields": {
-                "id_inventory_type_obj": {
-                    "$cond": [
-                        {"$eq": [{"$type": "$id_inventory_type"}, "objectId"]},
-                        "$id_inventory_type",
-                        {"$toObjectId": "$id_inventory_type"}
-                    ]
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "inventorytypes",
-                "localField": "id_inventory_type_obj",
-                "foreignField": "_id",
-                "as": "inventory_type"
-            }
-        },
-        {"$unwind": "$inventory_type"},
-        {
-            "$match": {
-                "inventory_type.name": {"$regex": f"^{type_name}$", "$options": "i"},
-                "active": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "id_inventory_type": {"$toString": "$id_inventory_type_obj"},
-                "name": "$name",
-                "active": "$active",
-                "creation_date": "$creation_date",
-                "inventory_type_name": "$inventory_type.name"
-            }
-        },
-        {"$skip": skip},
-        {"$limit": limit}
-    ]
+    return (
+        PipelineBuilder()
+        .match({"active": True})
+        .join("inventorytypes", "id_inventory_type", "_id", "inventory_type")
+        .match_joined({"inventory_type.name": {"$regex": f"^{type_name}$", "$options": "i"}})
+        .skip(skip)
+        .limit(limit)
+        .project(INVENTORY_PROJECTION)
+    )
@@ -3,68 +3,44 @@ Pipelines para InventoryTypes
 """
 from bson import ObjectId
 
+from pipelines.builder import PipelineBuilder
+
 
 def get_inventory_type_pipeline(skip: int = 0, limit: int = 10) -> list:
     """
     Devuelve todos los tipos de inventario con el conteo de items en 'Inventory'
     """
-    return [
-        {
-            "$lookup": {
-                "from": "Inventory",
-                "let": {"typeId": {"$toString": "$_id"}},
-                "pipeline": [
-                    {
-                        "$addFields": {
-                            "id_inventory_type_str": {
-                                "$cond": [
-                                    {"$eq": [{"$type": "$id_inventory_type"}, "objectId"]},
-                                    {"$toString": "$id_inventory_type"},
-                                    "$id_inventory_type"
-                                ]
-                            }
-                        }
-                    },
-                    {
-                        "$match": {
-                            "$expr": {"$eq": ["$id_inventory_type_str", "$$typeId"]}
-                        }
-                    }
-                ],
-                "as": "items"
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "name": "$name",
-                "active": "$active",
-                "number_of_items": {"$size": "$items"}
-            }
-        },
-        {"$skip": skip},
-        {"$limit": limit}
-    ]
+    return (
+        PipelineBuilder()
+        # id_inventory_type se guarda como ObjectId (ver migrations/inventory_type_id.py),
+        # asi que el join usa el indice id_inventory_type_1
+        .join("Inventory", "_id", "id_inventory_type", "items",
+              unwind=False, pipeline=[{"$project": {"_id": 1}}])
+        .skip(skip)
+        .limit(limit)
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "name": "$name",
+            "active": "$active",
+            "number_of_items": {"$size": "$items"}
+        })
+        .build()
+    )
 
 
 def validate_type_is_assigned_pipeline(inventory_type_id: str) -> list:
     """
     Valida que un tipo de inventario exista y esté activo
     """
-    return [
-        {
-            "$match": {
-                "_id": ObjectId(inventory_type_id),
-                "active": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                "name": "$name",
-                "active": "$active"
-            }
-        }
-    ]
+    return (
+        PipelineBuilder()
+        .match({"_id": ObjectId(inventory_type_id), "active": True})
+        .project({
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "name": "$name",
+            "active": "$active"
+        })
+        .build()
+    )
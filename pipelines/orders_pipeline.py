@@ -1,26 +1,48 @@
+from datetime import datetime
 
-def get_order_statistics_pipeline():
-    return [
+
+def orders_before(until: datetime) -> dict:
+    """Ordenes creadas antes de until (las antiguas sin created_at cuentan como anteriores)."""
+    return {"$or": [{"created_at": {"$lt": until}}, {"created_at": {"$exists": False}}]}
+
+
+def order_stats_by_day_pipeline(until: datetime = None):
+    """Totales por dia (created_at, o la fecha del _id en ordenes antiguas) para reconstruir OrderStats.
+    Con until, solo las ordenes anteriores."""
+    pipeline = [{"$match": orders_before(until)}] if until else []
+    return pipeline + [
         {
             "$group": {
-                "_id": None,
+                "_id": {"$dateToString": {
+                    "format": "%Y-%m-%d",
+                    "date": {"$ifNull": ["$created_at", {"$toDate": "$_id"}]}
+                }},
                 "total_orders": {"$sum": 1},
                 "total_sales": {"$sum": "$total"},
-                "avg_subtotal": {"$avg": "$subtotal"},
+                "sum_subtotal": {"$sum": "$subtotal"},
                 "total_taxes": {"$sum": "$taxes"},
                 "max_order": {"$max": "$total"},
                 "min_order": {"$min": "$total"}
             }
-        },
+        }
+    ]
+
+
+def order_timeseries_pipeline(start: datetime, end: datetime, unit: str):
+    """Totales por bucket ($dateTrunc) en [start, end); usa el indice de created_at."""
+    return [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$project": {"_id": 0, "created_at": 1, "total": 1, "subtotal": 1, "taxes": 1}},
         {
-            "$project": {
-                "_id": 0,
-                "total_orders": 1,
-                "total_sales": 1,
-                "avg_subtotal": 1,
-                "total_taxes": 1,
-                "max_order": 1,
-                "min_order": 1
+            "$group": {
+                "_id": {"$dateTrunc": {"date": "$created_at", "unit": unit, "startOfWeek": "monday"}},
+                "total_orders": {"$sum": 1},
+                "total_sales": {"$sum": "$total"},
+                "sum_subtotal": {"$sum": "$subtotal"},
+                "total_taxes": {"$sum": "$taxes"},
+                "max_order": {"$max": "$total"},
+                "min_order": {"$min": "$total"}
             }
-        }
-    ]
\ No newline at end of file
+        },
+        {"$sort": {"_id": 1}}
+    ]
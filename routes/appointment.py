@@ -1,13 +1,19 @@
 import os
-from fastapi import APIRouter, Body, HTTPException, Header, Path, Query, Request
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Header, Path, Query, Request
 from models.appointment import Appointment, StandardResponse
 from utils.mongodb import get_collection
-from utils.security import SECRET_KEY, validate_admin, validate_user
-from firebase_admin import auth as firebase_auth  
+from utils.security import require_user, require_admin
+from utils.serialization import trusted
+from utils.streaming import ndjson_response, wants_stream
 
 from controllers.appointment import(
     create_appointment_users,
+    create_appointments_batch,
     get_appointments,
+    stream_appointments,
+    get_availability,
     get_appointment_by_id,
     update_appointment,
     disable_appointment
@@ -15,30 +21,47 @@ from controllers.appointment import(
 
 router = APIRouter()
 
-@router.post("/appointments", response_model=Appointment, tags=["🗓️ Appointments"])
-@validate_user
+@router.post("/appointments", response_model=Appointment, tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
 async def create_appointment_endpoint(request:Request, appointment: Appointment) -> Appointment:
     return await create_appointment_users(request, appointment)
 
 
-@router.get("/appointments", response_model=dict, tags=["🗓️ Appointments"])
-@validate_user
-async def get_appointment_lookup_endpoint(request: Request) -> dict:
-    return await get_appointments(request)
+@router.post("/appointments/batch", response_model=dict, tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
+async def create_appointments_batch_endpoint(request: Request, appointments: list[Appointment]) -> dict:
+    return await create_appointments_batch(request, appointments)
 
-@router.get("/appointments/{appointment_id}", response_model=dict, tags=["🗓️ Appointments"])
-@validate_admin
+
+@router.get("/appointments", response_model=dict, tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
+async def get_appointment_lookup_endpoint(
+    request: Request,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la pagina anterior"),
+    approximate: bool = False,
+    stream: bool = Query(default=False, description="Responder como NDJSON, fila por fila (sin skip/limit)")
+) -> dict:
+    if wants_stream(request, stream):
+        return ndjson_response(await stream_appointments(request, cursor))
+    return trusted(await get_appointments(request, skip, limit, cursor, approximate))
+
+@router.get("/appointments/availability", response_model=dict, tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
+async def get_availability_endpoint(
+    request: Request,
+    date_from: datetime = Query(alias="from", description="Inicio del rango", examples=["2025-08-11T00:00:00"]),
+    date_to: datetime = Query(alias="to", description="Fin del rango (exclusivo)", examples=["2025-08-18T00:00:00"])
+) -> dict:
+    return trusted(await get_availability(date_from, date_to))
+
+@router.get("/appointments/{appointment_id}", response_model=dict, tags=["🗓️ Appointments"], dependencies=[Depends(require_admin)])
 async def get_appointment_by_id_endpoint(appointment_id:str ,request: Request) -> dict:
-    return await get_appointment_by_id(appointment_id)
+    return trusted(await get_appointment_by_id(appointment_id))
 
 
-@router.put("/appointments/{appointment_id}", response_model=Appointment, tags=["🗓️ Appointments"])
-@validate_user
+@router.put("/appointments/{appointment_id}", response_model=Appointment, tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
 async def update_appointment_route(appointment_id: str, appointment: Appointment,request: Request
 ):
     return await update_appointment(appointment_id, appointment, request)
 
-@router.delete("/appointments/{appointment_id}", tags=["🗓️ Appointments"])
-@validate_user
+@router.delete("/appointments/{appointment_id}", tags=["🗓️ Appointments"], dependencies=[Depends(require_user)])
 async def disable_appointment_endpoint(appointment_id: str, request: Request):
     return await disable_appointment(appointment_id, request)
\ No newline at end of file
@@ -1,35 +1,45 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request
 from models.inventory import Inventory
 from controllers.inventory import (
     create_inventory,
     get_inventories,
+    stream_inventories,
     get_inventory_by_id,
     update_inventory,
     deactivate_inventory
 )
-from utils.security import validate_user, validate_admin  
+from utils.security import require_user
+from utils.serialization import trusted
+from utils.streaming import ndjson_response, wants_stream
 
 router = APIRouter(tags=["📦 Inventories"])
 
-@router.post("/inventories", response_model=Inventory)
-@validate_user
+@router.post("/inventories", response_model=Inventory, dependencies=[Depends(require_user)])
 async def create_inventory_endpoint(request: Request, inventory: Inventory) -> Inventory:
     return await create_inventory(inventory)
 
 @router.get("/inventories", response_model=dict)
-async def get_inventories_endpoint(skip: int = 0, limit: int = 1000) -> dict:
-    return await get_inventories(skip, limit)
+async def get_inventories_endpoint(
+    request: Request,
+    skip: int = 0,
+    limit: int = 1000,
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la pagina anterior"),
+    approximate: bool = False,
+    stream: bool = Query(default=False, description="Responder como NDJSON, fila por fila (sin skip/limit)")
+) -> dict:
+    if wants_stream(request, stream):
+        return ndjson_response(stream_inventories(cursor))
+    return trusted(await get_inventories(skip, limit, cursor, approximate))
 
 @router.get("/inventories/{inventory_id}", response_model=dict)
 async def get_inventory_by_id_endpoint(inventory_id: str) -> dict:
-    return await get_inventory_by_id(inventory_id)
+    return trusted(await get_inventory_by_id(inventory_id))
 
-@router.put("/inventories/{inventory_id}", response_model=dict)
-@validate_user
+@router.put("/inventories/{inventory_id}", response_model=dict, dependencies=[Depends(require_user)])
 async def update_inventory_endpoint(request: Request, inventory_id: str, inventory: Inventory) -> dict:
     return await update_inventory(inventory_id, inventory)
 
-@router.delete("/inventories/{inventory_id}", response_model=dict)
-@validate_user
+@router.delete("/inventories/{inventory_id}", response_model=dict, dependencies=[Depends(require_user)])
 async def deactivate_inventory_endpoint(request: Request, inventory_id: str) -> dict:
     return await deactivate_inventory(inventory_id)
@@ -1,21 +1,52 @@
-from fastapi import APIRouter, Request
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from models.orders import Order
-from utils.security import validate_admin
+from utils.security import require_admin
+from utils.serialization import trusted
 
 from controllers.orders import(
     create_order,
-    get_order_statistics
+    create_orders_batch,
+    export_orders,
+    get_order_statistics,
+    get_order_timeseries
 )
 
 router = APIRouter()
 
-@router.post("/orders", response_model=Order, tags=["📦 Orders"])
-@validate_admin
+@router.post("/orders", response_model=Order, tags=["📦 Orders"], dependencies=[Depends(require_admin)])
 async def create_order_endpoint(request: Request, order: Order) -> Order:
     return await create_order(order)
 
-@router.get("/statistics", tags=["📊 Estadísticas"])
-@validate_admin
+@router.post("/orders/batch", response_model=dict, tags=["📦 Orders"], dependencies=[Depends(require_admin)])
+async def create_orders_batch_endpoint(request: Request, orders: list[Order]) -> dict:
+    return await create_orders_batch(orders)
+
+@router.get("/orders/export", tags=["📦 Orders"], dependencies=[Depends(require_admin)])
+async def export_orders_endpoint(
+    request: Request,
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(default=None, alias="from", description="Inicio del rango (created_at)"),
+    date_to: Optional[datetime] = Query(default=None, alias="to", description="Fin del rango (exclusivo)")
+) -> StreamingResponse:
+    body, media_type = export_orders(format, date_from, date_to)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'}
+    )
+
+@router.get("/statistics", tags=["📊 Estadísticas"], dependencies=[Depends(require_admin)])
 async def get_order_statistics_endpoints(request: Request):
-    return await get_order_statistics()
+    return trusted(await get_order_statistics())
 
+@router.get("/statistics/timeseries", tags=["📊 Estadísticas"], dependencies=[Depends(require_admin)])
+async def get_order_timeseries_endpoint(
+    request: Request,
+    date_from: datetime = Query(alias="from", description="Inicio del rango", examples=["2025-01-01T00:00:00"]),
+    date_to: datetime = Query(alias="to", description="Fin del rango (exclusivo)", examples=["2025-07-01T00:00:00"]),
+    bucket: str = Query(default="day", pattern="^(day|week|month)$")
+) -> dict:
+    return trusted(await get_order_timeseries(date_from, date_to, bucket))
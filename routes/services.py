@@ -1,11 +1,14 @@
 from typing import Optional
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Depends, Query, Request
 from models.service import Service
-from utils.security import validate_admin, validate_user
+from utils.security import require_user
+from utils.serialization import trusted
+from utils.streaming import ndjson_response, wants_stream
 
 from controllers.service import(
     create_service,
     get_services,
+    stream_services,
     get_service_by_id,
     update_service,
     deactivate_service
@@ -13,8 +16,7 @@ from controllers.service import(
 
 router = APIRouter()
 
-@router.post("/services", response_model=Service, tags=["🛠️ Service"])
-@validate_user
+@router.post("/services", response_model=Service, tags=["🛠️ Service"], dependencies=[Depends(require_user)])
 async def create_service_endpoint(request: Request, service: Service) -> Service:
     return await create_service(service)
 
@@ -22,20 +24,21 @@ async def create_service_endpoint(request: Request, service: Service) -> Service
 async def get_services_querystring_endpoint(
     request: Request,
     filtro: Optional[str] = Query(default=None, description="Buscar por nombre o descripción"),
-    include_inactive: bool = Query(default=False, description="Incluir servicios inactivos")
+    include_inactive: bool = Query(default=False, description="Incluir servicios inactivos"),
+    stream: bool = Query(default=False, description="Responder como NDJSON, fila por fila")
 ) -> list[Service]:
-    return await get_services(filtro, include_inactive)
+    if wants_stream(request, stream):
+        return ndjson_response(stream_services(filtro))
+    return trusted(await get_services(filtro, include_inactive))
 
 @router.get("/services/{service_id}", response_model=Service, tags=["🛠️ Service"])
 async def get_service_by_id_endpoint(request: Request, service_id: str) -> Service:
-    return await get_service_by_id(service_id)
+    return trusted(await get_service_by_id(service_id))
 
-@router.put("/services/{service_id}", response_model=Service, tags=["🛠️ Service"])
-@validate_user
+@router.put("/services/{service_id}", response_model=Service, tags=["🛠️ Service"], dependencies=[Depends(require_user)])
 async def update_service_endpoint(request: Request, service_id: str, service: Service) -> Service:
     return await update_service(service_id, service, request)
 
-@router.delete("/services/{service_id}", response_model=dict, tags=["🛠️ Service"])
-@validate_user
+@router.delete("/services/{service_id}", response_model=dict, tags=["🛠️ Service"], dependencies=[Depends(require_user)])
 async def deactivate_service_endpoint(request: Request, service_id: str) -> dict:
     return await deactivate_service(service_id, request)
\ No newline at end of file
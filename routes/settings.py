@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Request
+from models.system_settings import SystemSetting, SystemSettingUpdate
+from utils.security import require_admin
+
+from controllers.settings import (
+    get_settings,
+    update_setting
+)
+
+router = APIRouter()
+
+@router.get("/settings", response_model=list[SystemSetting], tags=["⚙️ Settings"], dependencies=[Depends(require_admin)])
+async def get_settings_endpoint(request: Request) -> list[SystemSetting]:
+    return await get_settings()
+
+@router.put("/settings/{key}", response_model=SystemSetting, tags=["⚙️ Settings"], dependencies=[Depends(require_admin)])
+async def update_setting_endpoint(request: Request, key: str, setting: SystemSettingUpdate) -> SystemSetting:
+    return await update_setting(key, setting)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Query, Request
 from models.states import State
-from utils.security import validate_admin
+from utils.security import require_admin
+from utils.serialization import trusted
+from utils.streaming import ndjson_response, wants_stream
 
 from controllers.states import(
     create_state,
     get_states,
+    stream_states,
     get_state_id,
     update_state,
     desactivate_state
@@ -12,28 +15,28 @@ from controllers.states import(
 
 router = APIRouter()
 
-@router.post("/states", response_model=State, tags=["⏳ States"])
-@validate_admin
+@router.post("/states", response_model=State, tags=["⏳ States"], dependencies=[Depends(require_admin)])
 async def create_state_endpoint(request: Request, state: State) -> State:
     return await create_state(state)
 
-@router.get("/states", response_model=list[State], tags=["⏳ States"])
-@validate_admin
-async def get_states_endpoints(request:Request) -> list[State]:
-    return await get_states()
+@router.get("/states", response_model=list[State], tags=["⏳ States"], dependencies=[Depends(require_admin)])
+async def get_states_endpoints(
+    request: Request,
+    stream: bool = Query(default=False, description="Responder como NDJSON, fila por fila")
+) -> list[State]:
+    if wants_stream(request, stream):
+        return ndjson_response(stream_states())
+    return trusted(await get_states())
 
-@router.get("/states/{state_id}", response_model=State, tags=["⏳ States"])
-@validate_admin
+@router.get("/states/{state_id}", response_model=State, tags=["⏳ States"], dependencies=[Depends(require_admin)])
 async def get_state_id_endpoint(request: Request, state_id: str) -> State:
-    return await get_state_id(state_id)
+    return trusted(await get_state_id(state_id))
 
-@router.put("/states/{state_id}", response_model=State, tags=["⏳ States"])
-@validate_admin
+@router.put("/states/{state_id}", response_model=State, tags=["⏳ States"], dependencies=[Depends(require_admin)])
 async def update_state_endpoint(request: Request, state_id: str, state: State) -> State:
     return await update_state(state_id, state)   
 
-@router.delete("/states/{state_id}", response_model=State, tags=["⏳ States"])
-@validate_admin
+@router.delete("/states/{state_id}", response_model=State, tags=["⏳ States"], dependencies=[Depends(require_admin)])
 async def desactivate_state_endpoint(request: Request, state_id: str) -> State:
     return await desactivate_state(state_id)
   
\ No newline at end of file
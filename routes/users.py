@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from models.users import User
 from models.login import Login
+from utils.security import require_admin
 
 from controllers.users import (
     create_user,
+    create_users_bulk,
     login
 )
 
@@ -13,6 +15,10 @@ router = APIRouter()
 async def create_user_endpoint(request: Request, user: User) -> User:
     return await create_user(user)
 
+@router.post("/users/bulk", response_model=dict, tags=["👤 Autentication"], dependencies=[Depends(require_admin)])
+async def create_users_bulk_endpoint(request: Request, users: list[User]) -> dict:
+    return await create_users_bulk(users)
+
 @router.post("/login",response_model=dict, tags=["👤 Autentication"])
 async def login_access(request: Request, log: Login) -> dict:
     return await login(log)
@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from utils.mongodb import get_mongo_client, t_connection, get_collection
+from utils.mongodb import get_mongo_client, t_connection, get_collection, close_mongo
 import os 
 from dotenv import load_dotenv
 
@@ -10,9 +11,15 @@ def test_env_variables():
     assert mongodb_uri is not None, "MONGODB_URI no esta configurada"
     print(f"Database: {mongodb_uri}")
 
+async def check_connection():
+    try:
+        return await t_connection()
+    finally:
+        await close_mongo()
+
 def test_connect():
     try:
-        connection_result = t_connection()
+        connection_result = asyncio.run(check_connection())
         assert connection_result is True, "La conexion a la DB fallo"
     except Exception as e:
         pytest.fail(f"Error en la conexion a MongoDb {str(e)}")    
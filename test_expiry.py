@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import utils.expiry as expiry
+import utils.slots as slots
+from fake_mongo import FakeCollection
+from utils.availability import AvailabilityIndex
+
+NOW = datetime(2099, 5, 1, 12, 0)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    appointments, slots_coll = FakeCollection(), FakeCollection()
+    monkeypatch.setattr(expiry, "coll", appointments)
+    monkeypatch.setattr(slots, "appointments_coll", appointments)
+    monkeypatch.setattr(slots, "slots_coll", slots_coll)
+    monkeypatch.setattr(slots, "availability_index", AvailabilityIndex())
+    return appointments, slots_coll
+
+
+def test_expire_past_appointments_in_one_update_and_releases_slots(db):
+    appointments, slots_coll = db
+    old_claim = NOW - slots.SLOT_CLAIM_GRACE - timedelta(seconds=1)
+    past, past_inactive, future = ObjectId(), ObjectId(), ObjectId()
+    appointments._insert({"_id": past, "date_appointment": datetime(2099, 5, 1, 9, 0), "active": True})
+    appointments._insert({"_id": past_inactive, "date_appointment": datetime(2099, 5, 1, 10, 0), "active": False})
+    appointments._insert({"_id": future, "date_appointment": datetime(2099, 5, 1, 14, 0), "active": True})
+    for hour, minute, appointment_id, claimed_at in (
+        (9, 0, past, old_claim),               # pasado: se libera
+        (14, 0, future, old_claim),            # cita activa: se queda
+        (16, 0, ObjectId(), old_claim),        # huerfano viejo: se libera
+        (16, 30, ObjectId(), NOW),             # huerfano dentro de la gracia: se queda
+    ):
+        slots_coll._insert({"_id": datetime(2099, 5, 1, hour, minute), "appointment_id": appointment_id,
+                            "claimed_at": claimed_at})
+
+    update_many = appointments.update_many
+    calls = []
+
+    async def counting_update_many(query, update):
+        calls.append(query)
+        return await update_many(query, update)
+    appointments.update_many = counting_update_many
+
+    assert asyncio.run(expiry.expire_past_appointments(NOW)) == 1
+
+    assert len(calls) == 1
+    assert appointments.docs[past]["active"] is False
+    assert appointments.docs[future]["active"] is True
+    assert sorted(slots_coll.docs) == [datetime(2099, 5, 1, 14, 0), datetime(2099, 5, 1, 16, 30)]
+
+
+def test_expiry_loop_survives_errors(monkeypatch):
+    calls = []
+
+    async def failing_expire():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("Mongo no disponible")
+        raise asyncio.CancelledError()
+    monkeypatch.setattr(expiry, "expire_past_appointments", failing_expire)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(expiry.run_expiry_loop(interval=0))
+    assert len(calls) == 2
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import controllers.users as users_controller
+from fake_mongo import FakeCollection
+from models.users import User
+from utils.firebase import auth_call, set_auth_backend, shutdown_executor
+
+
+class FakeAuth:
+    """Sustituto local de firebase_admin.auth."""
+
+    ImportUserRecord = SimpleNamespace
+
+    class UserImportHash:
+        @staticmethod
+        def pbkdf2_sha256(rounds):
+            return ("pbkdf2_sha256", rounds)
+
+    def __init__(self, reject=()):
+        self.users = {}
+        self.threads = []
+        self.reject = set(reject)
+        self.deleted = []
+
+    def create_user(self, email, password):
+        self.threads.append(threading.current_thread().name)
+        self.users[email] = password
+        return email
+
+    def import_users(self, records, hash_alg=None):
+        errors = []
+        for index, record in enumerate(records):
+            if record.email in self.reject:
+                errors.append(SimpleNamespace(index=index, reason="INVALID_EMAIL"))
+            else:
+                self.users[record.email] = record.uid
+        return SimpleNamespace(errors=errors)
+
+    def delete_users(self, uids):
+        self.deleted.extend(uids)
+        self.users = {email: uid for email, uid in self.users.items() if uid not in uids}
+        return SimpleNamespace(errors=[])
+
+
+@pytest.fixture
+def fake_auth():
+    fake = FakeAuth(reject={"rechazado@example.com"})
+    set_auth_backend(fake)
+    yield fake
+    set_auth_backend(None)
+    shutdown_executor()
+
+
+def make_user(email: str) -> User:
+    return User(name="Ana", lastname="Lopez", email=email, phone="9999-9999", password="Secret123!")
+
+
+def test_auth_calls_run_in_the_firebase_pool():
+    fake = FakeAuth()
+    set_auth_backend(fake)
+    try:
+        uid = asyncio.run(auth_call("create_user", email="ana@example.com", password="Secret1!"))
+    finally:
+        set_auth_backend(None)
+        shutdown_executor()
+    assert uid == "ana@example.com"
+    assert fake.threads[0].startswith("firebase")
+
+
+def test_import_record_hashes_password_with_pbkdf2(fake_auth):
+    uid, record = users_controller._import_record(make_user("ana@example.com"))
+    expected = hashlib.pbkdf2_hmac("sha256", b"Secret123!", record.password_salt, users_controller.IMPORT_HASH_ROUNDS)
+    assert record.uid == uid
+    assert record.password_hash == expected
+
+
+class UsersWithUniqueEmail(FakeCollection):
+    """Users con un email que Mongo rechaza al insertar (como el indice unico)."""
+
+    def __init__(self, docs, fail_email):
+        super().__init__(docs)
+        self.fail_email = fail_email
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc["email"] == self.fail_email:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key error"})
+            else:
+                self._insert(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def test_bulk_import_reports_each_user_and_compensates(fake_auth, monkeypatch):
+    users_coll = UsersWithUniqueEmail([{"email": "existe@example.com"}], fail_email="carrera@example.com")
+    monkeypatch.setattr(users_controller, "users_coll", users_coll)
+    monkeypatch.setattr(users_controller, "IMPORT_HASH_ROUNDS", 1)
+    batch = [make_user(email) for email in (
+        "nuevo@example.com", "nuevo@example.com", "existe@example.com", "rechazado@example.com", "carrera@example.com",
+    )]
+
+    result = asyncio.run(users_controller.create_users_bulk(batch))
+
+    assert (result["created"], result["failed"]) == (1, 4)
+    results = result["results"]
+    assert results[0]["success"] and results[0]["id"]
+    assert results[1]["error"] == "Duplicated email in batch"
+    assert results[2]["error"] == "User already exists"
+    assert "INVALID_EMAIL" in results[3]["error"]
+    assert "duplicate key" in results[4]["error"]
+    # el que entro en Firebase pero no en Users se borra de Firebase
+    assert set(fake_auth.users) == {"nuevo@example.com"}
+    assert len(fake_auth.deleted) == 1
+    assert {doc["email"] for doc in users_coll.docs.values()} == {"existe@example.com", "nuevo@example.com"}
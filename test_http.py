@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+
+import utils.http as http
+
+
+def with_transport(handler, coro_factory, monkeypatch):
+    async def run():
+        http._client = httpx.AsyncClient(base_url="http://stub/v1", transport=httpx.MockTransport(handler))
+        try:
+            return await coro_factory()
+        finally:
+            await http.close_http_client()
+    monkeypatch.setattr(http, "IDENTITY_TOOLKIT_BACKOFF", 0)
+    return asyncio.run(run())
+
+
+def test_identity_post_retries_transient_errors(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"idToken": "abc"})
+
+    resp = with_transport(handler, lambda: http.identity_post("accounts:signInWithPassword", "k", {}), monkeypatch)
+    assert resp.json() == {"idToken": "abc"}
+    assert len(calls) == 3
+    assert calls[0].url.path == "/v1/accounts:signInWithPassword"
+    assert calls[0].url.params["key"] == "k"
+
+
+def test_identity_post_does_not_retry_auth_errors(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "INVALID_PASSWORD"}})
+
+    resp = with_transport(handler, lambda: http.identity_post("accounts:signInWithPassword", "k", {}), monkeypatch)
+    assert resp.status_code == 400
+    assert len(calls) == 1
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+import utils.indexes as indexes
+from fake_mongo import FakeCollection
+from utils.indexes import REQUIRED_INDEXES, ensure_indexes, index_report
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    colls = {}
+    monkeypatch.setattr(indexes, "get_collection", lambda name: colls.setdefault(name, FakeCollection()))
+    return colls
+
+
+def test_ensure_indexes_creates_every_declared_index(collections):
+    created = asyncio.run(ensure_indexes())
+    for col_name, declared in REQUIRED_INDEXES.items():
+        names = [index.document["name"] for index in declared]
+        assert created[col_name] == names
+        assert set(names) <= set(collections[col_name].index_ops)
+
+
+def test_index_report_flags_missing_unused_and_undeclared(collections):
+    asyncio.run(ensure_indexes())
+    for coll in collections.values():
+        for name in coll.index_ops:
+            coll.index_ops[name] = 10
+    users = collections["Users"]
+    del users.index_ops["email_1"]
+    users.index_ops["phone_1"] = 0
+    collections["Orders"].index_ops["created_at_1__id_1"] = 0
+
+    report = asyncio.run(index_report())
+
+    assert report["Users"] == {"missing": ["email_1"], "unused": ["phone_1"], "undeclared": ["phone_1"]}
+    assert report["Orders"] == {"missing": [], "unused": ["created_at_1__id_1"], "undeclared": []}
+    assert report["States"] == {"missing": [], "unused": [], "undeclared": []}
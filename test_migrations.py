@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import migrations.common as common
+from fake_mongo import FakeCollection
+from migrations.common import normalize_object_id_field
+
+
+@pytest.fixture
+def appointments(monkeypatch):
+    user_ids = [ObjectId() for _ in range(5)]
+    coll = FakeCollection(
+        [{"_id": ObjectId(), "user_id": str(oid)} for oid in user_ids]
+        + [{"_id": ObjectId(), "user_id": "no-es-un-id"}, {"_id": ObjectId(), "user_id": user_ids[0]}]
+    )
+    monkeypatch.setattr(common, "get_collection", lambda name: coll)
+    return coll, user_ids
+
+
+def test_converts_string_ids_and_skips_invalid(appointments):
+    coll, user_ids = appointments
+    result = asyncio.run(normalize_object_id_field("Appointments", "user_id", batch_size=2))
+
+    assert result["processed"] == 6
+    assert result["updated"] == 5
+    assert len(result["invalid"]) == 1
+    values = [doc["user_id"] for doc in coll.docs.values()]
+    assert values.count("no-es-un-id") == 1
+    assert sorted(v for v in values if isinstance(v, ObjectId)) == sorted(user_ids + [user_ids[0]])
+
+
+def test_dry_run_writes_nothing(appointments):
+    coll, _ = appointments
+    result = asyncio.run(normalize_object_id_field("Appointments", "user_id", batch_size=2, dry_run=True))
+    assert result["updated"] == 0
+    assert sum(isinstance(doc["user_id"], str) for doc in coll.docs.values()) == 6
+
+
+def test_resumes_after_partial_run(appointments):
+    coll, user_ids = appointments
+    bulk_write = coll.bulk_write
+    calls = []
+
+    async def crash_on_second_batch(requests, ordered=True):
+        calls.append(len(requests))
+        if len(calls) == 2:
+            raise RuntimeError("conexion perdida")
+        return await bulk_write(requests, ordered=ordered)
+    coll.bulk_write = crash_on_second_batch
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(normalize_object_id_field("Appointments", "user_id", batch_size=2))
+    assert sum(isinstance(doc["user_id"], ObjectId) for doc in coll.docs.values()) == 3
+
+    # la segunda corrida solo ve los que siguen siendo string
+    coll.bulk_write = bulk_write
+    result = asyncio.run(normalize_object_id_field("Appointments", "user_id", batch_size=2))
+    assert result["processed"] == 4
+    assert result["updated"] == 3
+    assert sum(isinstance(doc["user_id"], ObjectId) for doc in coll.docs.values()) == 6
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from utils.mongodb import PoolMetrics, get_pool_settings
+
+
+def test_pool_settings_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "")
+    monkeypatch.delenv("MONGO_MAX_CONNECTING", raising=False)
+    settings = get_pool_settings()
+    assert settings["maxPoolSize"] == 20
+    # vacia o ausente: valor por defecto
+    assert settings["minPoolSize"] == 0
+    assert settings["maxConnecting"] == 2
+
+
+def test_pool_metrics_track_checkouts():
+    metrics = PoolMetrics()
+    metrics.connection_created(SimpleNamespace())
+    metrics.connection_created(SimpleNamespace())
+    for duration in (0.002, 0.004):
+        metrics.connection_check_out_started(SimpleNamespace())
+        metrics.connection_checked_out(SimpleNamespace(duration=duration))
+    metrics.connection_check_out_started(SimpleNamespace())
+    metrics.connection_check_out_failed(SimpleNamespace())
+    metrics.connection_checked_in(SimpleNamespace())
+
+    snapshot = metrics.snapshot()
+    assert snapshot["open_connections"] == 2
+    assert snapshot["checked_out"] == 1
+    assert snapshot["wait_queue"] == 0
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checkout_failures"] == 1
+    assert snapshot["checkout_latency_avg_ms"] == 3.0
+    assert snapshot["checkout_latency_max_ms"] == 4.0
+
+    metrics.reset()
+    assert metrics.snapshot()["checkouts"] == 0
@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.order_stats as order_stats
+from fake_mongo import FakeCollection
+from utils.tdigest import TDigest
+from utils.order_stats import EMPTY_STATISTICS, _merge, day_id, stats_update, stats_update_many, to_statistics
+
+
+def test_stats_update_uses_atomic_operators():
+    update = stats_update({"subtotal": 100.0, "taxes": 15.0, "total": 115.0})
+    assert update["$inc"] == {"total_orders": 1, "total_sales": 115.0, "sum_subtotal": 100.0, "total_taxes": 15.0}
+    assert update["$max"] == {"max_order": 115.0}
+    assert update["$min"] == {"min_order": 115.0}
+
+
+def test_to_statistics_matches_previous_response():
+    doc = {"total_orders": 2, "total_sales": 345.0, "sum_subtotal": 300.0, "total_taxes": 45.0,
+           "max_order": 230.0, "min_order": 115.0}
+    assert to_statistics(doc) == {
+        "total_orders": 2, "total_sales": 345.0, "avg_subtotal": 150.0,
+        "total_taxes": 45.0, "max_order": 230.0, "min_order": 115.0
+    }
+    assert to_statistics(None) == EMPTY_STATISTICS
+
+
+def test_merge_days_into_all_time():
+    day1 = {"total_orders": 1, "total_sales": 115.0, "sum_subtotal": 100.0, "total_taxes": 15.0,
+            "max_order": 115.0, "min_order": 115.0}
+    day2 = {"total_orders": 1, "total_sales": 230.0, "sum_subtotal": 200.0, "total_taxes": 30.0,
+            "max_order": 230.0, "min_order": 230.0}
+    total = _merge(_merge({}, day1), day2)
+    assert total["total_orders"] == 2
+    assert total["max_order"] == 230.0 and total["min_order"] == 115.0
+    assert day_id(datetime(2025, 8, 6, 23, 59)) == "day:2025-08-06"
+
+
+def test_batch_update_aggregates_orders():
+    update = stats_update_many([
+        {"subtotal": 100.0, "taxes": 15.0, "total": 115.0},
+        {"subtotal": 200.0, "taxes": 30.0, "total": 230.0},
+    ])
+    assert update["$inc"] == {"total_orders": 2, "total_sales": 345.0, "sum_subtotal": 300.0, "total_taxes": 45.0}
+    assert update["$max"] == {"max_order": 230.0}
+    assert update["$min"] == {"min_order": 115.0}
+
+
+def test_ensure_stats_seeds_once(monkeypatch):
+    stats = FakeCollection()
+    seeds = []
+
+    async def fake_seed(until):
+        seeds.append(until)
+        return 3
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+    monkeypatch.setattr(order_stats, "seed_stats", fake_seed)
+
+    async def two_workers():
+        return await asyncio.gather(order_stats.ensure_stats(), order_stats.ensure_stats())
+
+    assert sorted(asyncio.run(two_workers())) == [False, True]
+    assert asyncio.run(order_stats.ensure_stats()) is False
+    assert len(seeds) == 1
+    meta = stats.docs[order_stats.META_ID]
+    assert "rebuilt_at" in meta and "rebuilding_since" not in meta
+    assert meta["seed_until"] == seeds[0]
+
+
+def test_ensure_stats_retries_after_failed_seed(monkeypatch):
+    stats = FakeCollection()
+    seeds = []
+
+    async def failing_seed(until):
+        seeds.append(until)
+        raise RuntimeError("Orders no disponible")
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+    monkeypatch.setattr(order_stats, "seed_stats", failing_seed)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(order_stats.ensure_stats())
+    # sin marca: el proximo arranque vuelve a intentarlo, con el mismo corte
+    assert "rebuilding_since" not in stats.docs[order_stats.META_ID]
+    with pytest.raises(RuntimeError):
+        asyncio.run(order_stats.ensure_stats())
+    assert seeds[0] == seeds[1]
+
+
+def test_ensure_stats_resumes_a_stale_claim(monkeypatch, caplog):
+    claimed = datetime.utcnow() - order_stats.STATS_REBUILD_TIMEOUT - timedelta(seconds=1)
+    stats = FakeCollection([{"_id": order_stats.META_ID, "rebuilding_since": claimed, "seed_until": claimed}])
+    seeds = []
+
+    async def fake_seed(until):
+        seeds.append(until)
+        return 0
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+    monkeypatch.setattr(order_stats, "seed_stats", fake_seed)
+
+    # el worker que la reclamo murio a mitad: otro la retoma con el mismo corte
+    assert asyncio.run(order_stats.ensure_stats()) is True
+    assert seeds == [claimed]
+    assert "never finished" in caplog.text
+
+    # una marca reciente es de un worker que sigue sembrando
+    stats.docs[order_stats.META_ID] = {"_id": order_stats.META_ID, "rebuilding_since": datetime.utcnow()}
+    assert asyncio.run(order_stats.ensure_stats()) is False
+
+
+def test_ensure_stats_seeds_after_a_migration_bumped_the_generation(monkeypatch):
+    stats = FakeCollection()
+    seeds = []
+
+    async def fake_seed(until):
+        seeds.append(until)
+        return 0
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+    monkeypatch.setattr(order_stats, "seed_stats", fake_seed)
+
+    # la migracion de created_at corre antes del primer arranque y crea "meta" solo con generation
+    asyncio.run(order_stats.bump_generation())
+    assert asyncio.run(order_stats.ensure_stats()) is True
+    assert len(seeds) == 1
+    assert stats.docs[order_stats.META_ID]["generation"] == 2
+
+
+def test_seed_adds_older_orders_to_what_record_order_counted(monkeypatch):
+    day = datetime(2025, 8, 6)
+    stats = FakeCollection()
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+
+    async def compute_from_orders(until):
+        digest = TDigest()
+        digest.add(100.0)
+        doc = {"total_orders": 1, "total_sales": 100.0, "sum_subtotal": 90.0, "total_taxes": 10.0,
+               "max_order": 100.0, "min_order": 100.0}
+        return {order_stats.ALL_TIME_ID: dict(doc), day_id(day): {**doc, "day": day, "digest": digest.to_dict()}}
+    monkeypatch.setattr(order_stats, "compute_from_orders", compute_from_orders)
+
+    # mientras se siembra, otro worker ya registro una orden nueva del mismo dia
+    new_order = {"total_orders": 1, "total_sales": 50.0, "sum_subtotal": 45.0, "total_taxes": 5.0,
+                 "max_order": 50.0, "min_order": 50.0}
+    stats._insert({"_id": order_stats.ALL_TIME_ID, **new_order})
+    stats._insert({"_id": day_id(day), **new_order, "day": day, "digest_buffer": [50.0], "digest_version": 0})
+
+    assert asyncio.run(order_stats.seed_stats(day)) == 2
+    all_time = stats.docs[order_stats.ALL_TIME_ID]
+    assert (all_time["total_orders"], all_time["total_sales"]) == (2, 150.0)
+    assert (all_time["max_order"], all_time["min_order"]) == (100.0, 50.0)
+    assert order_stats._digest_of(stats.docs[day_id(day)]).count == 2
+
+    # retomar la siembra no vuelve a sumar los documentos ya sembrados
+    assert asyncio.run(order_stats.seed_stats(day)) == 0
+    assert stats.docs[order_stats.ALL_TIME_ID]["total_orders"] == 2
+
+
+def _day_doc(day: datetime, totals: list) -> dict:
+    return {"_id": day_id(day), "day": day, "digest_buffer": totals}
+
+
+def test_percentiles_follow_rebuilds_and_late_orders(monkeypatch):
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    stats = FakeCollection([
+        {"_id": order_stats.META_ID, "generation": 1},
+        _day_doc(today - timedelta(days=3), [100.0] * 10),
+        _day_doc(today - timedelta(days=1), [100.0] * 10),
+    ])
+    monkeypatch.setattr(order_stats, "stats_coll", stats)
+    monkeypatch.setattr(order_stats, "_closed_days", {"generation": None, "until": None, "digest": TDigest()})
+
+    assert asyncio.run(order_stats.order_percentiles())["p99_order"] == 100.0
+
+    # orden tardia de ayer (llego despues de medianoche): se ve sin reiniciar
+    stats.docs[day_id(today - timedelta(days=1))]["digest_buffer"] += [5000.0] * 10
+    assert asyncio.run(order_stats.order_percentiles())["p99_order"] > 100.0
+
+    # un rebuild cambia un dia cerrado y sube la generacion: se vuelve a combinar
+    stats.docs[day_id(today - timedelta(days=3))]["digest_buffer"] = [1.0] * 30
+    stats.docs[order_stats.META_ID]["generation"] = 2
+    assert asyncio.run(order_stats.order_percentiles())["median_order"] < 100.0
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import controllers.orders as orders_controller
+from fake_mongo import FakeCollection
+from models.orders import Order
+
+APPOINTMENT = ObjectId()
+
+
+class OrdersRejectingSubtotal(FakeCollection):
+    """Orders que rechaza (como un validador de esquema) las ordenes con cierto subtotal."""
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc["subtotal"] == 13.0:
+                errors.append({"index": i, "code": 121, "errmsg": "Document failed validation"})
+            else:
+                self._insert(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+@pytest.fixture
+def orders_db(monkeypatch):
+    orders = OrdersRejectingSubtotal()
+    recorded = []
+
+    async def tax_rate(key, default=None):
+        return 0.15
+
+    async def record_orders(docs, when):
+        recorded.extend(docs)
+    monkeypatch.setattr(orders_controller, "coll", orders)
+    monkeypatch.setattr(orders_controller, "appointment_coll", FakeCollection([{"_id": APPOINTMENT}]))
+    monkeypatch.setattr(orders_controller.settings_service, "get_value", tax_rate)
+    monkeypatch.setattr(orders_controller, "record_orders", record_orders)
+    return orders, recorded
+
+
+def test_batch_reports_each_order(orders_db):
+    orders, recorded = orders_db
+    batch = [
+        Order(appointment_id=str(APPOINTMENT), subtotal=100.0),
+        Order(appointment_id=str(APPOINTMENT).upper(), subtotal=200.0),
+        Order(appointment_id="no-es-un-id", subtotal=100.0),
+        Order(appointment_id=str(ObjectId()), subtotal=100.0),
+        Order(appointment_id=str(APPOINTMENT), subtotal=13.0),
+    ]
+
+    result = asyncio.run(orders_controller.create_orders_batch(batch))
+
+    assert (result["created"], result["failed"]) == (2, 3)
+    ok, upper, invalid, missing, rejected = result["results"]
+    assert ok["success"] and ok["total"] == pytest.approx(115.0)
+    # el id en mayusculas es la misma cita y se guarda normalizado
+    assert upper["success"] and upper["appointment_id"] == str(APPOINTMENT)
+    assert invalid["error"] == "Invalid appointment_id format"
+    assert missing["error"] == "Appointment not found"
+    assert rejected["error"] == "Document failed validation"
+    assert {doc["appointment_id"] for doc in orders.docs.values()} == {str(APPOINTMENT)}
+    assert len(recorded) == 2
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import utils.pagination as pagination
+from fake_mongo import FakeCollection
+from pipelines.builder import PipelineBuilder
+from utils.cache import TTLCache
+from utils.pagination import decode_cursor, encode_cursor, paginate, paginate_cursor
+
+
+def test_cursor_roundtrip_datetime():
+    oid = ObjectId()
+    value = datetime(2025, 8, 6, 14, 30, 15, 123000)
+    assert decode_cursor(encode_cursor(value, oid)) == (value, oid)
+
+
+def test_cursor_roundtrip_string():
+    oid = ObjectId()
+    assert decode_cursor(encode_cursor("iPhone 14 Pro", str(oid))) == ("iPhone 14 Pro", oid)
+
+
+def test_invalid_cursor():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture
+def items(monkeypatch):
+    monkeypatch.setattr(pagination, "_count_cache", TTLCache(maxsize=16, ttl=60))
+    docs = [{"_id": oid, "id": str(oid), "name": f"item {i:02d}", "active": i % 3 != 0}
+            for i, oid in enumerate(ObjectId() for _ in range(25))]
+    return FakeCollection(docs, name="Inventory")
+
+
+def test_paginate_facet_returns_page_and_total(items):
+    query = PipelineBuilder().keyset("name", 1)
+    page = asyncio.run(paginate(items, query, skip=10, limit=10, cursor_field="name"))
+
+    assert [item["name"] for item in page["items"]] == [f"item {i:02d}" for i in range(10, 20)]
+    # el total cuenta lo mismo que lista la query (activas e inactivas), no count({"active": True})
+    assert page["total"] == 25
+    assert decode_cursor(page["next_cursor"])[0] == "item 19"
+
+    last = asyncio.run(paginate(items, PipelineBuilder().keyset("name", 1), skip=20, limit=10, cursor_field="name"))
+    assert len(last["items"]) == 5 and last["next_cursor"] is None
+
+
+def test_paginate_cursor_walks_all_pages(items):
+    seen, token, pages = [], None, 0
+    while True:
+        after = decode_cursor(token) if token else None
+        page = asyncio.run(paginate_cursor(items, PipelineBuilder().keyset("name", 1, after=after), 10, "name"))
+        pages += 1
+        seen += [item["name"] for item in page["items"]]
+        assert page["total"] == 25
+        token = page["next_cursor"]
+        if token is None:
+            break
+
+    # limit + 1: la ultima pagina (5 items) no devuelve next_cursor
+    assert pages == 3
+    assert seen == [f"item {i:02d}" for i in range(25)]
+
+
+def test_paginate_cursor_exact_multiple_has_no_extra_page(items):
+    page = asyncio.run(paginate_cursor(items, PipelineBuilder().keyset("name", 1), 25, "name"))
+    assert len(page["items"]) == 25 and page["next_cursor"] is None
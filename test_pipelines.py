@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from pipelines.builder import PipelineBuilder
+from pipelines.appointment_pipelines import (
+    date_appointment_pipeline,
+    get_all_appointments_pipeline,
+    get_appointment_by_id_pipeline,
+    get_user_appointments_pipeline,
+    validate_user_pipeline
+)
+from pipelines.inventory_pipelines import (
+    validate_inventory_type_pipeline,
+    get_inventory_with_type_pipeline,
+    get_all_inventories_with_types_pipeline,
+    get_inventories_by_type_name_pipeline
+)
+from pipelines.inventory_type_pipelines import (
+    get_inventory_type_pipeline,
+    validate_type_is_assigned_pipeline
+)
+
+OID = str(ObjectId())
+
+
+def stage_names(pipeline: list) -> list:
+    return [next(iter(stage)) for stage in pipeline]
+
+
+def test_builder_pushes_pagination_before_left_join():
+    pipeline = (
+        PipelineBuilder()
+        .match({"active": True})
+        .join("Users", "user_id", "_id", "user_info", required=False)
+        .sort({"date_creation": -1})
+        .skip(20)
+        .limit(10)
+        .project({"_id": 0})
+        .build()
+    )
+    assert stage_names(pipeline) == ["$match", "$sort", "$skip", "$limit", "$lookup", "$unwind", "$project"]
+    assert pipeline[5]["$unwind"]["preserveNullAndEmptyArrays"] is True
+
+
+def test_builder_keeps_pagination_after_filtering_join():
+    pipeline = (
+        PipelineBuilder()
+        .join("Users", "user_id", "_id", "user_info")
+        .match_joined({"user_info.active": True})
+        .sort({"date_creation": -1})
+        .limit(10)
+        .build()
+    )
+    # el $sort sobre campos base se adelanta; el $limit espera al filtro del join
+    assert stage_names(pipeline) == ["$sort", "$lookup", "$unwind", "$match", "$limit"]
+
+
+def test_builder_keyset_match_is_not_counted():
+    oid = ObjectId(OID)
+    query = (
+        PipelineBuilder()
+        .match({"active": True})
+        .keyset("name", 1, after=("abc", oid))
+        .limit(10)
+    )
+    pipeline = query.build()
+    assert stage_names(pipeline) == ["$match", "$sort", "$limit"]
+    assert pipeline[0]["$match"] == {"$and": [
+        {"active": True},
+        {"$or": [{"name": {"$gt": "abc"}}, {"name": "abc", "_id": {"$gt": oid}}]}
+    ]}
+    assert pipeline[1]["$sort"] == {"name": 1, "_id": 1}
+    assert query.filter_stages() == [{"$match": {"active": True}}]
+
+
+def test_builder_facet_keeps_count_branch_free_of_pagination():
+    pipeline = (
+        PipelineBuilder()
+        .match({"active": True})
+        .join("Users", "user_id", "_id", "user_info", required=False)
+        .sort({"date_creation": -1})
+        .skip(10)
+        .limit(10)
+        .project({"_id": 0})
+        .facet()
+    )
+    assert stage_names(pipeline) == ["$match", "$sort", "$facet"]
+    assert stage_names(pipeline[2]["$facet"]["items"]) == ["$skip", "$limit", "$lookup", "$unwind", "$project"]
+    assert pipeline[2]["$facet"]["total"] == [{"$count": "total"}]
+
+
+def test_builder_keeps_sort_on_joined_field_after_join():
+    pipeline = (
+        PipelineBuilder()
+        .join("Users", "user_id", "_id", "user_info", required=False)
+        .sort({"user_info.name": 1})
+        .limit(10)
+        .build()
+    )
+    assert stage_names(pipeline) == ["$lookup", "$unwind", "$sort", "$limit"]
+
+
+def test_date_appointment_pipeline():
+    pipeline = date_appointment_pipeline(datetime(2030, 1, 1, 10, 0), OID)
+    assert stage_names(pipeline) == ["$match", "$count"]
+    assert pipeline[0]["$match"]["_id"] == {"$ne": ObjectId(OID)}
+
+
+def test_user_appointments_pipeline_paginates_before_lookup():
+    pipeline = get_user_appointments_pipeline(ObjectId(OID), 10, 10)
+    assert stage_names(pipeline) == ["$match", "$sort", "$skip", "$limit", "$lookup", "$unwind", "$project"]
+    assert pipeline[0]["$match"] == {"user_id": ObjectId(OID)}
+
+
+def test_all_appointments_pipeline_filters_active_users_before_paginating():
+    pipeline = get_all_appointments_pipeline(0, 10)
+    assert stage_names(pipeline) == ["$sort", "$lookup", "$unwind", "$match", "$limit", "$project"]
+
+
+def test_appointment_by_id_pipeline():
+    pipeline = get_appointment_by_id_pipeline(OID)
+    assert stage_names(pipeline) == ["$match", "$lookup", "$unwind", "$match", "$project"]
+
+
+def test_validate_pipelines():
+    for pipeline in (
+        validate_user_pipeline(OID),
+        validate_inventory_type_pipeline(OID),
+        validate_type_is_assigned_pipeline(OID),
+    ):
+        assert stage_names(pipeline) == ["$match", "$project"]
+
+
+def test_inventory_with_type_pipeline():
+    pipeline = get_inventory_with_type_pipeline(OID)
+    assert stage_names(pipeline) == ["$match", "$lookup", "$unwind", "$project"]
+
+
+def test_all_inventories_pipeline_paginates_before_lookup():
+    pipeline = get_all_inventories_with_types_pipeline(5, 10)
+    assert stage_names(pipeline) == ["$sort", "$skip", "$limit", "$lookup", "$unwind", "$project"]
+
+
+def test_inventories_by_type_name_pipeline_matches_active_before_lookup():
+    pipeline = get_inventories_by_type_name_pipeline("product", 0, 10)
+    assert stage_names(pipeline) == ["$match", "$lookup", "$unwind", "$match", "$limit", "$project"]
+    assert pipeline[0]["$match"] == {"active": True}
+
+
+def test_inventory_type_pipeline_paginates_before_lookup():
+    pipeline = get_inventory_type_pipeline(0, 10)
+    assert stage_names(pipeline) == ["$limit", "$lookup", "$project"]
+
+
+def test_all_inventories_pipeline_without_limit_for_streaming():
+    from pipelines.inventory_pipelines import all_inventories_with_types_query
+    pipeline = all_inventories_with_types_query(0, None).build()
+    assert stage_names(pipeline) == ["$sort", "$lookup", "$unwind", "$project"]
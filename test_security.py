@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from utils.security import _token_cache, create_jwt_token, require_admin, require_user, verify_token
+
+
+def fake_request(token: str):
+    return SimpleNamespace(headers={"Authorization": f"Bearer {token}"}, state=SimpleNamespace())
+
+
+def test_verify_token_decodes_once(monkeypatch):
+    token = create_jwt_token("Ana", "Lopez", "ana@example.com", "555", True, False)
+    first = verify_token(token)
+
+    import utils.security as security
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **kw: pytest.fail("decoded twice"))
+    assert verify_token(token) is first
+
+
+def test_require_user_fills_request_state():
+    token = create_jwt_token("Ana", "Lopez", "ana@example.com", "555", True, False)
+    request = fake_request(token)
+    claims = asyncio.run(require_user(request))
+    assert request.state.email == "ana@example.com"
+    assert request.state.admin is False
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(require_admin(request, claims))
+    assert exc.value.status_code == 401
+
+
+def test_rejects_invalid_tokens():
+    _token_cache.clear()
+    with pytest.raises(HTTPException) as exc:
+        verify_token("not-a-token")
+    assert exc.value.status_code == 401
+
+    inactive = create_jwt_token("Ana", "Lopez", "ana@example.com", "555", False, False)
+    with pytest.raises(HTTPException):
+        verify_token(inactive)
+    assert len(_token_cache) == 0
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(require_user(SimpleNamespace(headers={"Authorization": "Basic abc"}, state=SimpleNamespace())))
+    assert exc.value.status_code == 400
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, ObjectId
+
+import controllers.service as service_controller
+from fake_mongo import FakeCollection
+from models.service import Service
+from utils.serialization import ORJSONResponse, dumps, trusted
+
+OID = ObjectId()
+
+
+def test_dumps_encodes_bson_types():
+    doc = {"_id": OID, "price": Decimal128("12.50"), "total": Decimal("3.5"), "when": datetime(2025, 8, 6, 10, 0)}
+    assert json.loads(dumps(doc)) == {"_id": str(OID), "price": 12.5, "total": 3.5, "when": "2025-08-06T10:00:00"}
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_trusted_response_is_json():
+    resp = trusted([{"id": str(OID), "active": True}], status_code=201)
+    assert isinstance(resp, ORJSONResponse)
+    assert resp.status_code == 201
+    assert resp.headers["content-type"] == "application/json"
+    assert json.loads(resp.body) == [{"id": str(OID), "active": True}]
+
+
+def test_get_services_returns_rows_matching_the_model(monkeypatch):
+    # en Services tambien vive hours_before_changes (documento con "key"): no debe salir
+    fake = FakeCollection([
+        {"_id": OID, "name": "linea", "description": "instalacion", "price": 100.0},
+        {"key": "hours_before_changes", "value": 2},
+    ])
+    find, projections = fake.find, []
+
+    def recording_find(query, projection=None):
+        projections.append(projection)
+        return find(query, projection)
+    monkeypatch.setattr(fake, "find", recording_find)
+    monkeypatch.setattr(service_controller, "coll", fake)
+
+    rows = asyncio.run(service_controller.get_services())
+
+    assert rows == [{"id": str(OID), "name": "linea", "description": "instalacion", "price": 100.0, "active": True}]
+    assert Service(**rows[0]).model_dump() == rows[0]
+    assert projections == [service_controller.SERVICE_PROJECTION]
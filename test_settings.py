@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import controllers.settings as settings_controller
+import utils.settings as settings
+from models.system_settings import SystemSetting, SystemSettingUpdate
+from utils.settings import SettingsService
+
+
+def test_get_value_is_served_from_cache():
+    service = SettingsService(ttl=60)
+    service._cache.set("general_tax", SystemSetting(id="1", key="general_tax", value=0.15))
+    service._cache.set("hours_before_changes", None)
+
+    assert asyncio.run(service.get_value("general_tax", 0)) == 0.15
+    # una clave inexistente queda cacheada como None y usa el default
+    assert asyncio.run(service.get_value("hours_before_changes", 2)) == 2
+
+
+def test_invalidate_drops_cached_key():
+    service = SettingsService(ttl=60)
+    service._cache.set("general_tax", SystemSetting(key="general_tax", value=0.15))
+    service.invalidate("general_tax")
+    assert len(service._cache) == 0
+
+
+def test_general_tax_uses_short_ttl(monkeypatch):
+    monkeypatch.setattr(settings, "SETTINGS_KEY_TTL", {"general_tax": 0})
+    service = SettingsService(ttl=60)
+    service._cache_set("general_tax", SystemSetting(key="general_tax", value=0.15))
+    service._cache_set("hours_before_changes", SystemSetting(key="hours_before_changes", value=2))
+    # TTL 0: otro worker pudo cambiarlo, se vuelve a leer de la base
+    assert service._cache.get("general_tax") is None
+    assert service._cache.get("hours_before_changes").value == 2
+
+
+def test_update_body_does_not_take_a_key():
+    assert "key" not in SystemSettingUpdate.model_fields
+    assert SystemSettingUpdate(value=0.16).description is None
+
+
+def test_update_setting_accepts_zero_and_rejects_negative(monkeypatch):
+    async def fake_set(key, value, description=None):
+        return SystemSetting(key=key, value=value, description=description)
+    monkeypatch.setattr(settings_controller.settings_service, "set", fake_set)
+
+    # 0 es valido (p.ej. sin impuesto o sin horas minimas para cambios)
+    saved = asyncio.run(settings_controller.update_setting("general_tax", SystemSettingUpdate(value=0)))
+    assert saved.value == 0
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(settings_controller.update_setting("general_tax", SystemSettingUpdate(value=-1)))
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Setting value must be non-negative"
@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+import controllers.appointment as appointment_controller
+import utils.slots as slots
+from fake_mongo import FakeCollection
+from models.appointment import Appointment
+from utils.availability import AvailabilityIndex
+from utils.slots import claim_slot, release_orphan_slots, release_slot, slot_bucket
+
+DATE = datetime(2099, 5, 1, 10, 15)
+USER = {"_id": ObjectId(), "admin": False, "active": True}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Slots y Appointments en memoria: las pruebas no escriben en el cluster del .env
+    slots_coll, appointments_coll = FakeCollection(), FakeCollection()
+    monkeypatch.setattr(slots, "slots_coll", slots_coll)
+    monkeypatch.setattr(slots, "appointments_coll", appointments_coll)
+    monkeypatch.setattr(slots, "availability_index", AvailabilityIndex())
+    monkeypatch.setattr(appointment_controller, "coll", appointments_coll)
+
+    async def request_user(request):
+        return USER
+    monkeypatch.setattr(appointment_controller, "get_request_user", request_user)
+    return SimpleNamespace(slots=slots_coll, appointments=appointments_coll)
+
+
+def book(date_appointment: datetime = DATE):
+    return appointment_controller.create_appointment_users(
+        SimpleNamespace(state=SimpleNamespace(email="user@test.com")),
+        Appointment(date_appointment=date_appointment, comment="revision de linea")
+    )
+
+
+def test_slot_bucket():
+    assert slot_bucket(datetime(2030, 5, 1, 9, 0)) == datetime(2030, 5, 1, 9, 0)
+    assert slot_bucket(datetime(2030, 5, 1, 9, 29, 59, 999)) == datetime(2030, 5, 1, 9, 0)
+    assert slot_bucket(datetime(2030, 5, 1, 9, 30)) == datetime(2030, 5, 1, 9, 30)
+    assert slot_bucket(datetime(2030, 5, 1, 16, 45, 10)) == datetime(2030, 5, 1, 16, 30)
+
+
+def test_availability_free_slots():
+    index = AvailabilityIndex()
+    index.add(datetime(2030, 5, 1, 9, 30))
+    index.add(datetime(2030, 5, 1, 16, 0))
+    index.add(datetime(2030, 5, 2, 9, 0))
+    index.remove(datetime(2030, 5, 2, 9, 0))
+
+    free = index.free_slots(datetime(2030, 5, 1), datetime(2030, 5, 2), now=datetime(2030, 4, 1))
+    # 9:00 a 17:00 cada 30 minutos = 17 bloques, menos 2 reservados
+    assert len(free) == 15
+    assert free[0] == datetime(2030, 5, 1, 9, 0)
+    assert datetime(2030, 5, 1, 9, 30) not in free
+    assert datetime(2030, 5, 1, 16, 0) not in free
+    assert free[-1] == datetime(2030, 5, 1, 17, 0)
+
+    # no ofrece horarios pasados
+    free = index.free_slots(datetime(2030, 5, 1), datetime(2030, 5, 2), now=datetime(2030, 5, 1, 12, 0))
+    assert free[0] == datetime(2030, 5, 1, 12, 30)
+
+
+def test_concurrent_bookings_create_one_appointment(db):
+    # 100 reservas simultaneas para el mismo horario por el endpoint: solo una puede ganar
+    async def book_all():
+        return await asyncio.gather(*(book() for _ in range(100)), return_exceptions=True)
+
+    results = asyncio.run(book_all())
+    created = [r for r in results if isinstance(r, Appointment)]
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(created) == 1, "Mas de una reserva tomo el mismo horario"
+    assert len(rejected) == 99 and all(r.status_code == 400 for r in rejected)
+    assert len(db.appointments.docs) == 1
+    assert db.slots.docs[slot_bucket(DATE)]["appointment_id"] == ObjectId(created[0].id)
+
+
+def test_failed_insert_releases_slot(db):
+    db.appointments.fail_insert = RuntimeError("insert failed")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(book())
+    assert exc.value.status_code == 500
+    assert db.slots.docs == {}
+
+
+def test_release_only_own_slot(db):
+    async def claim_and_release():
+        owner, other = ObjectId(), ObjectId()
+        assert await claim_slot(DATE, owner)
+        released_by_other = await release_slot(DATE, other)
+        released_by_owner = await release_slot(DATE, owner)
+        reclaimed = await claim_slot(DATE, other)
+        return released_by_other, released_by_owner, reclaimed
+
+    released_by_other, released_by_owner, reclaimed = asyncio.run(claim_and_release())
+    assert not released_by_other
+    assert released_by_owner
+    assert reclaimed
+
+
+def test_release_slots_keeps_index_for_slots_of_other_appointments(db):
+    owner, other = ObjectId(), ObjectId()
+    mine, taken = datetime(2099, 5, 1, 9, 0), datetime(2099, 5, 1, 10, 0)
+    for bucket, appointment_id in ((mine, owner), (taken, other)):
+        db.slots._insert({"_id": bucket, "appointment_id": appointment_id, "claimed_at": DATE})
+        slots.availability_index.add(bucket)
+
+    assert asyncio.run(slots.release_slots([(mine, owner), (taken, owner)])) == 1
+    assert list(db.slots.docs) == [taken]
+    assert slots.availability_index.booked_between(mine, taken + timedelta(minutes=1)) == [taken]
+
+
+def test_release_orphan_slots(db):
+    now = datetime(2099, 4, 1, 12, 0)
+    old = now - slots.SLOT_CLAIM_GRACE - timedelta(seconds=1)
+    active, moved, inactive, missing, recent = (ObjectId() for _ in range(5))
+    db.appointments._insert({"_id": active, "date_appointment": datetime(2099, 5, 1, 9, 0), "active": True})
+    db.appointments._insert({"_id": moved, "date_appointment": datetime(2099, 5, 1, 11, 0), "active": True})
+    db.appointments._insert({"_id": inactive, "date_appointment": datetime(2099, 5, 1, 12, 0), "active": False})
+    for hour, appointment_id, claimed_at in (
+        (9, active, old), (10, moved, old), (12, inactive, old), (13, missing, old), (14, recent, now),
+    ):
+        db.slots._insert({"_id": datetime(2099, 5, 1, hour, 0), "appointment_id": appointment_id, "claimed_at": claimed_at})
+
+    assert asyncio.run(release_orphan_slots(now)) == 3
+    # queda el de la cita activa y la reserva reciente (su cita puede estar insertandose)
+    assert sorted(db.slots.docs) == [datetime(2099, 5, 1, 9, 0), datetime(2099, 5, 1, 14, 0)]
+
+
+def test_batch_reports_each_item(db):
+    db.slots._insert({"_id": datetime(2099, 5, 1, 11, 0), "appointment_id": ObjectId(), "claimed_at": DATE})
+    batch = [
+        Appointment(date_appointment=datetime(2099, 5, 1, 9, 0), comment="ok"),
+        Appointment(date_appointment=datetime(2099, 5, 1, 20, 0), comment="fuera de horario"),
+        Appointment(date_appointment=datetime(2099, 5, 1, 9, 10), comment="mismo bloque que la primera"),
+        Appointment(date_appointment=datetime(2099, 5, 1, 11, 0), comment="bloque ya reservado"),
+        Appointment(date_appointment=datetime(2099, 5, 1, 10, 0), comment="ok", user_id=str(ObjectId())),
+    ]
+    request = SimpleNamespace(state=SimpleNamespace(email="user@test.com"))
+
+    result = asyncio.run(appointment_controller.create_appointments_batch(request, batch))
+
+    assert (result["created"], result["failed"]) == (1, 4)
+    assert [r["success"] for r in result["results"]] == [True, False, False, False, False]
+    assert "between 9:00 AM and 5:00 PM" in result["results"][1]["error"]
+    assert "already an appointment" in result["results"][2]["error"]
+    assert "already an appointment" in result["results"][3]["error"]
+    assert "another user" in result["results"][4]["error"]
+    assert len(db.appointments.docs) == 1
+    assert db.slots.docs[datetime(2099, 5, 1, 9, 0)]["appointment_id"] == ObjectId(result["results"][0]["id"])
+
+
+def test_batch_insert_failure_releases_slots(db):
+    db.appointments.fail_insert = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]})
+    request = SimpleNamespace(state=SimpleNamespace(email="user@test.com"))
+    batch = [Appointment(date_appointment=datetime(2099, 5, 1, 9, 0), comment="falla")]
+
+    result = asyncio.run(appointment_controller.create_appointments_batch(request, batch))
+
+    assert result["results"][0] == {"index": 0, "success": False, "error": "validation"}
+    assert db.slots.docs == {}
+
+
+def test_claim_slots_releases_inserted_on_unexpected_error(db, monkeypatch):
+    class FailingSlots(FakeCollection):
+        async def insert_many(self, docs, ordered=True):
+            for doc in docs[1:]:
+                self._insert(doc)
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]})
+    failing = FailingSlots()
+    monkeypatch.setattr(slots, "slots_coll", failing)
+    claims = [(datetime(2099, 5, 1, hour, 0), ObjectId()) for hour in (9, 10, 11)]
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(slots.claim_slots(claims))
+    assert failing.docs == {}
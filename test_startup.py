@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_app_imports_without_secrets():
+    # variables vacias: load_dotenv no las sobreescribe con las del .env
+    env = {**os.environ, "MONGODB_URI": "", "DATABASE_NAME": "", "FIREBASE_CREDENTIALS_BASE64": ""}
+    code = "import sys, main; assert 'firebase_admin' not in sys.modules; assert 'uvicorn' not in sys.modules"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
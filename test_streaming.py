@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from controllers.orders import EXPORT_COLUMNS, export_orders
+from utils.streaming import csv_lines, ndjson_lines
+
+OID = ObjectId()
+ROW = {"id": str(OID), "appointment_id": None, "date_appointment": datetime(2025, 8, 6, 10, 0),
+       "subtotal": 100.0, "taxes": 15.0, "total": 115.0, "created_at": datetime(2025, 8, 1, 9, 30)}
+
+
+def test_ndjson_lines_encode_bson_types():
+    lines = ndjson_lines([{"_id": OID, "when": datetime(2025, 8, 6)}, ROW]).decode().splitlines()
+    assert json.loads(lines[0]) == {"_id": str(OID), "when": "2025-08-06T00:00:00"}
+    assert json.loads(lines[1])["total"] == 115.0
+
+
+def test_csv_lines_header_once():
+    text = csv_lines([ROW], EXPORT_COLUMNS, header=True).decode()
+    header, row = text.splitlines()
+    assert header == ",".join(EXPORT_COLUMNS)
+    assert row.startswith(f"{OID},,2025-08-06T10:00:00,100.0")
+
+
+def test_export_rejects_bad_filters_before_streaming():
+    with pytest.raises(HTTPException) as exc:
+        export_orders("xml")
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        export_orders("csv", datetime(2025, 2, 1), datetime(2025, 1, 1))
+    _, media_type = export_orders("csv", datetime(2025, 1, 1))
+    assert media_type == "text/csv"
+
+
+def test_stream_opt_in_by_query_or_accept_header():
+    from types import SimpleNamespace
+    from utils.streaming import wants_stream
+
+    assert wants_stream(SimpleNamespace(headers={}), stream=True)
+    assert wants_stream(SimpleNamespace(headers={"accept": "application/x-ndjson"}))
+    assert not wants_stream(SimpleNamespace(headers={"accept": "application/json"}))
+
+
+def test_ndjson_stream_writes_in_batches(monkeypatch):
+    import asyncio
+    import utils.streaming as streaming
+
+    async def cursor():
+        for i in range(5):
+            yield {"_id": i}
+
+    async def collect():
+        return [chunk async for chunk in streaming.ndjson_stream(cursor(), lambda doc: {"id": doc["_id"]})]
+
+    monkeypatch.setattr(streaming, "STREAM_BATCH_SIZE", 2)
+    chunks = asyncio.run(collect())
+    assert len(chunks) == 3
+    assert b"".join(chunks).decode().splitlines()[-1] == '{"id":4}'
+
+
+def test_export_range_sort_is_backed_by_an_index():
+    from utils.indexes import REQUIRED_INDEXES
+    keys = [list(index.document["key"].items()) for index in REQUIRED_INDEXES["Orders"]]
+    assert [("created_at", 1), ("_id", 1)] in keys
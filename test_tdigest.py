@@ -0,0 +1,52 @@
+import bisect
+import random
+
+from utils.order_stats import _digest_of
+from utils.tdigest import TDigest
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def rank_error(sorted_values: list, estimate: float, q: float) -> float:
+    return abs(bisect.bisect(sorted_values, estimate) / len(sorted_values) - q)
+
+
+def synthetic_totals(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    # mezcla de ordenes chicas frecuentes y algunas muy grandes (cola larga)
+    return [rng.lognormvariate(6, 0.8) if rng.random() < 0.95 else rng.uniform(5000, 50000) for _ in range(n)]
+
+
+def test_quantiles_match_exact_percentiles():
+    values = synthetic_totals(50000)
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    exact = sorted(values)
+    for q in QUANTILES:
+        assert rank_error(exact, digest.quantile(q), q) < 0.005
+    assert len(digest) < 200
+
+
+def test_daily_digests_merge_like_a_single_digest():
+    values = synthetic_totals(30000, seed=11)
+    days = [TDigest() for _ in range(30)]
+    for i, value in enumerate(values):
+        days[i % 30].add(value)
+
+    merged = TDigest()
+    for day in days:
+        merged.merge(TDigest.from_dict(day.to_dict()))
+    exact = sorted(values)
+    assert merged.count == len(values)
+    assert merged.min == exact[0] and merged.max == exact[-1]
+    for q in QUANTILES:
+        assert rank_error(exact, merged.quantile(q), q) < 0.01
+
+
+def test_stored_digest_includes_pending_buffer():
+    stored = TDigest().add(10.0).add(20.0).to_dict()
+    digest = _digest_of({"digest": stored, "digest_buffer": [30.0, 40.0]})
+    assert digest.count == 4
+    assert digest.min == 10.0 and digest.max == 40.0
+    assert TDigest().quantile(0.5) is None
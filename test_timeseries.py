@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import controllers.orders as orders_controller
+from fake_mongo import FakeCursor
+from pipelines.orders_pipeline import order_timeseries_pipeline
+from utils.cache import TTLCache
+from utils.timeseries import bucket_range, bucket_start, is_settled, next_bucket
+
+
+def test_bucket_start_aligns_like_date_trunc():
+    when = datetime(2025, 8, 6, 15, 30)  # miercoles
+    assert bucket_start(when, "day") == datetime(2025, 8, 6)
+    assert bucket_start(when, "week") == datetime(2025, 8, 4)
+    assert bucket_start(when, "month") == datetime(2025, 8, 1)
+
+
+def test_next_bucket_rolls_over_year():
+    assert next_bucket(datetime(2025, 12, 1), "month") == datetime(2026, 1, 1)
+    assert next_bucket(datetime(2025, 12, 29), "week") == datetime(2026, 1, 5)
+
+
+def test_bucket_range_covers_partial_buckets():
+    starts = bucket_range(datetime(2025, 1, 15), datetime(2025, 3, 2), "month")
+    assert starts == [datetime(2025, 1, 1), datetime(2025, 2, 1), datetime(2025, 3, 1)]
+    with pytest.raises(ValueError):
+        bucket_range(datetime(2000, 1, 1), datetime(2025, 1, 1), "day")
+
+
+def test_timeseries_pipeline_matches_indexed_range_first():
+    pipeline = order_timeseries_pipeline(datetime(2025, 1, 1), datetime(2025, 2, 1), "week")
+    assert pipeline[0] == {"$match": {"created_at": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 2, 1)}}}
+    assert pipeline[2]["$group"]["_id"]["$dateTrunc"]["startOfWeek"] == "monday"
+
+
+def test_bucket_is_cached_only_after_grace():
+    now = datetime(2025, 8, 6, 0, 2)
+    assert not is_settled(datetime(2025, 8, 5), "day", now)
+    assert is_settled(datetime(2025, 8, 4), "day", now)
+
+
+def test_cached_buckets_are_dropped_on_new_generation(monkeypatch):
+    calls = []
+    generation = {"value": 1}
+
+    class FakeOrders:
+        async def aggregate(self, pipeline):
+            calls.append(pipeline[0]["$match"]["created_at"])
+            return FakeCursor([{"_id": datetime(2025, 1, 1), "total_orders": len(calls), "total_sales": 1.0,
+                                "sum_subtotal": 1.0, "total_taxes": 0.0, "max_order": 1.0, "min_order": 1.0}])
+
+    async def fake_generation():
+        return generation["value"]
+    monkeypatch.setattr(orders_controller, "coll", FakeOrders())
+    monkeypatch.setattr(orders_controller, "stats_generation", fake_generation)
+    monkeypatch.setattr(orders_controller, "closed_buckets", TTLCache(maxsize=100, ttl=60))
+
+    def series():
+        result = asyncio.run(orders_controller.get_order_timeseries(datetime(2025, 1, 1), datetime(2025, 1, 2), "day"))
+        return result["series"][0]["total_orders"]
+
+    assert series() == 1
+    assert series() == 1 and len(calls) == 1
+    # un rebuild o la migracion de created_at suben la generacion: se vuelve a calcular
+    generation["value"] = 2
+    assert series() == 2
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import controllers.appointment as appointment_controller
+import utils.user_cache as user_cache_module
+from fake_mongo import FakeCollection
+from models.appointment import Appointment
+from utils.security import SECRET_KEY, _user_oid, create_jwt_token
+from utils.user_cache import UserCache
+
+
+def test_cached_user_is_served_without_query():
+    cache = UserCache(maxsize=10, ttl=60)
+    oid = ObjectId()
+    cache.put("ana@example.com", {"_id": oid, "admin": 1, "email": "ana@example.com"})
+
+    user = asyncio.run(cache.get("ana@example.com"))
+    assert user == {"_id": oid, "admin": True, "active": True}
+
+
+def test_invalidate_drops_user():
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put("ana@example.com", {"_id": ObjectId()})
+    cache.invalidate("ana@example.com")
+    assert len(cache._cache) == 0
+
+
+def test_token_carries_user_id():
+    oid = ObjectId()
+    token = create_jwt_token("Ana", "Lopez", "ana@example.com", "555", True, False, str(oid))
+    payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    assert _user_oid(payload) == oid
+    assert _user_oid({}) is None
+
+
+def test_inactive_user_can_not_update_or_disable_appointments(monkeypatch):
+    user_oid, appointment_oid = ObjectId(), ObjectId()
+    cache = UserCache(maxsize=10, ttl=60)
+    cache.put("ana@example.com", {"_id": user_oid, "active": False})
+    monkeypatch.setattr(user_cache_module, "user_cache", cache)
+    monkeypatch.setattr(appointment_controller, "coll", FakeCollection([
+        {"_id": appointment_oid, "user_id": user_oid, "date_appointment": datetime(2099, 5, 1, 10, 0), "active": True}
+    ]))
+    request = SimpleNamespace(state=SimpleNamespace(email="ana@example.com"))
+    appointment = Appointment(date_appointment=datetime(2099, 5, 2, 10, 0), comment="mover")
+
+    for call in (
+        appointment_controller.update_appointment(str(appointment_oid), appointment, request),
+        appointment_controller.disable_appointment(str(appointment_oid), request),
+    ):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(call)
+        assert exc.value.status_code == 401
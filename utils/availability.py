@@ -0,0 +1,86 @@
+"""
+Indice en memoria de los bloques reservados, para responder horarios libres sin ir a Mongo.
+
+Se carga desde Slots al arrancar, se actualiza en cada reserva/liberacion
+(utils/slots.py) y se refresca cada AVAILABILITY_REFRESH_SECONDS para
+recoger lo que reservaron otros workers.
+"""
+import asyncio
+import bisect
+import logging
+import os
+from datetime import datetime, time, timedelta
+
+from utils.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = 30
+OPENING_TIME = time(9, 0)
+CLOSING_TIME = time(17, 0)  # ultima hora de inicio permitida (ver create_appointment_users)
+AVAILABILITY_REFRESH_SECONDS = float(os.getenv("AVAILABILITY_REFRESH_SECONDS", "60"))
+
+slots_coll = get_collection("Slots")
+
+
+class AvailabilityIndex:
+
+    def __init__(self):
+        self._booked = []
+        self.loaded_at = None
+
+    async def load(self):
+        now = datetime.utcnow()
+        cursor = slots_coll.find({"_id": {"$gte": now - timedelta(minutes=SLOT_MINUTES)}}, {"_id": 1})
+        self._booked = sorted([doc["_id"] async for doc in cursor])
+        self.loaded_at = now
+
+    def add(self, bucket: datetime):
+        i = bisect.bisect_left(self._booked, bucket)
+        if i == len(self._booked) or self._booked[i] != bucket:
+            self._booked.insert(i, bucket)
+
+    def remove(self, bucket: datetime):
+        i = bisect.bisect_left(self._booked, bucket)
+        if i < len(self._booked) and self._booked[i] == bucket:
+            del self._booked[i]
+
+    def booked_between(self, start: datetime, end: datetime) -> list:
+        lo = bisect.bisect_left(self._booked, start)
+        hi = bisect.bisect_left(self._booked, end)
+        return self._booked[lo:hi]
+
+    def free_slots(self, start: datetime, end: datetime, now: datetime = None) -> list:
+        """Inicios de bloque libres en [start, end) dentro del horario de atencion y en el futuro."""
+        now = now or datetime.utcnow()
+        booked = set(self.booked_between(start, end))
+        step = timedelta(minutes=SLOT_MINUTES)
+        free = []
+        day = start.date()
+        while day <= end.date():
+            slot = datetime.combine(day, OPENING_TIME)
+            last = datetime.combine(day, CLOSING_TIME)
+            while slot <= last:
+                if start <= slot < end and slot > now and slot not in booked:
+                    free.append(slot)
+                slot += step
+            day += timedelta(days=1)
+        return free
+
+
+availability_index = AvailabilityIndex()
+
+
+async def run_refresh_loop(interval: float = AVAILABILITY_REFRESH_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await availability_index.load()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Availability refresh failed: {e}")
+
+
+def start_refresh_task() -> asyncio.Task:
+    return asyncio.create_task(run_refresh_loop(), name="availability-refresh")
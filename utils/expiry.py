@@ -0,0 +1,52 @@
+"""
+Expiracion de citas pasadas.
+
+Una tarea en segundo plano (arrancada desde el lifespan de main.py) marca
+active=False en todas las citas cuya fecha ya paso, con un solo update_many
+sobre el indice active_1_date_appointment_1. Los GET no escriben: calculan
+"active" al vuelo (ver EFFECTIVE_ACTIVE en pipelines/appointment_pipelines.py).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from utils.mongodb import get_collection
+from utils.slots import release_orphan_slots, release_past_slots
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT_EXPIRY_INTERVAL = float(os.getenv("APPOINTMENT_EXPIRY_INTERVAL_SECONDS", "300"))
+
+coll = get_collection("Appointments")
+
+
+async def expire_past_appointments(now: datetime = None) -> int:
+    """Desactiva todas las citas activas con fecha anterior a `now`. Devuelve cuantas cambio."""
+    now = now or datetime.utcnow()
+    result = await coll.update_many(
+        {"date_appointment": {"$lt": now}, "active": True},
+        {"$set": {"active": False}}
+    )
+    # los bloques de horarios pasados ya no pueden reservarse; se limpian
+    await release_past_slots(now)
+    # y los de citas que nunca llegaron a insertarse
+    await release_orphan_slots(now)
+    return result.modified_count
+
+
+async def run_expiry_loop(interval: float = APPOINTMENT_EXPIRY_INTERVAL):
+    while True:
+        try:
+            expired = await expire_past_appointments()
+            if expired:
+                logger.info(f"Expired {expired} past appointments")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Appointment expiry failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_expiry_task() -> asyncio.Task:
+    return asyncio.create_task(run_expiry_loop(), name="appointment-expiry")
@@ -0,0 +1,105 @@
+"""
+Acceso a firebase_admin.auth desde codigo async.
+
+El SDK de Firebase es bloqueante, asi que sus llamadas se ejecutan en un
+ThreadPoolExecutor acotado (FIREBASE_MAX_WORKERS) y no en el event loop.
+El modulo de auth se puede sustituir por uno falso en pruebas con
+set_auth_backend().
+
+Nada de Firebase se importa ni se inicializa al importar este modulo: el SDK
+se carga en el primer uso (o en warm_up(), desde el lifespan) dentro del pool.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_MAX_WORKERS = int(os.getenv("FIREBASE_MAX_WORKERS", "8"))
+
+_executor = None
+_auth_backend = None
+
+
+def initialize_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if firebase_admin._apps:
+        return
+    try:
+        firebase_creds_base64 = os.getenv("FIREBASE_CREDENTIALS_BASE64")
+        if firebase_creds_base64:
+            firebase_creds_json = base64.b64decode(firebase_creds_base64).decode('utf-8')
+            firebase_creds = json.loads(firebase_creds_json)
+            cred = credentials.Certificate(firebase_creds)
+            firebase_admin.initialize_app(cred)
+            logger.info("Firebase initialized with environment variable credentials")
+        else:
+            cred = credentials.Certificate("secrets/telefonia-secreto.json")
+            firebase_admin.initialize_app(cred)
+            logger.info("Firebase initialized with JSON file")
+
+    except Exception as e:
+        logger.error(f"Failed to initialized Firebase: {e}")
+        raise HTTPException(status_code=500, detail=f"Firebase configuration error: {str(e)}")
+
+
+def set_auth_backend(backend):
+    """Sustituye firebase_admin.auth (p.ej. por un fake en pruebas). None vuelve al SDK real."""
+    global _auth_backend
+    _auth_backend = backend
+
+
+def get_auth():
+    if _auth_backend is not None:
+        return _auth_backend
+    initialize_firebase()
+    from firebase_admin import auth as firebase_auth
+    return firebase_auth
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FIREBASE_MAX_WORKERS, thread_name_prefix="firebase")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        executor, _executor = _executor, None
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Ejecuta una funcion bloqueante en el pool de Firebase."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+def _call(method: str, *args, **kwargs):
+    return getattr(get_auth(), method)(*args, **kwargs)
+
+
+async def auth_call(method: str, *args, **kwargs):
+    """Llama a firebase_admin.auth.<method> en el pool, p.ej. await auth_call("create_user", email=...).
+
+    La inicializacion del SDK (si aun no se hizo) tambien ocurre en el pool.
+    """
+    return await run_blocking(_call, method, *args, **kwargs)
+
+
+async def warm_up():
+    """Inicializa Firebase en el pool sin bloquear el arranque; si falla, se reintenta en el primer uso."""
+    try:
+        await run_blocking(get_auth)
+    except Exception as e:
+        logger.error(f"Firebase warm up failed: {e}")
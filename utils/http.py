@@ -0,0 +1,69 @@
+"""
+Cliente HTTP asincrono compartido para el identity toolkit de Firebase.
+
+Un solo httpx.AsyncClient por worker (keep-alive y pool de conexiones), creado
+al primer uso y cerrado en el lifespan. La URL base se puede apuntar a un stub
+local (IDENTITY_TOOLKIT_URL) para pruebas y benchmarks.
+"""
+import asyncio
+import logging
+import os
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_TOOLKIT_URL = os.getenv("IDENTITY_TOOLKIT_URL", "https://identitytoolkit.googleapis.com/v1")
+IDENTITY_TOOLKIT_TIMEOUT = float(os.getenv("IDENTITY_TOOLKIT_TIMEOUT", "8"))
+IDENTITY_TOOLKIT_RETRIES = int(os.getenv("IDENTITY_TOOLKIT_RETRIES", "2"))
+IDENTITY_TOOLKIT_BACKOFF = float(os.getenv("IDENTITY_TOOLKIT_BACKOFF", "0.2"))
+IDENTITY_TOOLKIT_MAX_CONNECTIONS = int(os.getenv("IDENTITY_TOOLKIT_MAX_CONNECTIONS", "100"))
+
+# respuestas transitorias que vale la pena reintentar
+RETRY_STATUS = {502, 503, 504}
+
+_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=IDENTITY_TOOLKIT_URL,
+            timeout=IDENTITY_TOOLKIT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=IDENTITY_TOOLKIT_MAX_CONNECTIONS,
+                max_keepalive_connections=IDENTITY_TOOLKIT_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+async def identity_post(path: str, api_key: str, payload: dict) -> httpx.Response:
+    """POST al identity toolkit con reintentos (errores de red, timeouts y 502/503/504).
+
+    Los errores de Firebase (4xx, p.ej. INVALID_PASSWORD) se devuelven tal cual.
+    Si se agotan los reintentos se propaga la excepcion de httpx.
+    """
+    client = get_http_client()
+    # sin "/" inicial httpx interpreta "accounts:..." como un esquema
+    path = "/" + path.lstrip("/")
+    for attempt in range(IDENTITY_TOOLKIT_RETRIES + 1):
+        last = attempt == IDENTITY_TOOLKIT_RETRIES
+        try:
+            resp = await client.post(path, params={"key": api_key}, json=payload)
+            if resp.status_code not in RETRY_STATUS or last:
+                return resp
+            logger.warning(f"Identity toolkit returned {resp.status_code}, retrying")
+        except httpx.TransportError as e:
+            if last:
+                raise
+            logger.warning(f"Identity toolkit request failed ({e!r}), retrying")
+        await asyncio.sleep(IDENTITY_TOOLKIT_BACKOFF * (2 ** attempt))
@@ -0,0 +1,115 @@
+"""
+Indices requeridos por las consultas de la API.
+
+Se crean (de forma idempotente) al arrancar la app y se pueden revisar con:
+
+    python -m utils.indexes            # reporte de indices faltantes / sin uso
+    python -m utils.indexes --ensure   # crea los faltantes y luego reporta
+"""
+import asyncio
+import json
+import logging
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from utils.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_INDEXES = {
+    "Users": [
+        # login y validacion de usuario: find_one({"email"})
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+    ],
+    "Appointments": [
+        # chequeo de solapes: active + rango de date_appointment; tambien count({"active": True})
+        IndexModel([("active", ASCENDING), ("date_appointment", ASCENDING)], name="active_1_date_appointment_1"),
+        # listado de citas de un usuario ordenado por (date_creation, _id), tambien por keyset
+        IndexModel(
+            [("user_id", ASCENDING), ("date_creation", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_1_date_creation_-1__id_-1"
+        ),
+        # listado general ordenado por (date_creation, _id), tambien por keyset
+        IndexModel([("date_creation", DESCENDING), ("_id", DESCENDING)], name="date_creation_-1__id_-1"),
+    ],
+    "Services": [
+        IndexModel([("name", ASCENDING)], name="name_1"),
+        # configuraciones guardadas en Services (hours_before_changes)
+        IndexModel([("key", ASCENDING)], name="key_1", sparse=True),
+    ],
+    "System": [
+        IndexModel([("key", ASCENDING)], name="key_1", unique=True),
+    ],
+    "Inventory": [
+        IndexModel([("active", ASCENDING)], name="active_1"),
+        # listado ordenado por (name, _id), tambien por keyset
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+        # join Inventory -> inventorytypes y conteo de items por tipo
+        IndexModel([("id_inventory_type", ASCENDING)], name="id_inventory_type_1"),
+    ],
+    "Orders": [
+        # /statistics/timeseries: rango por created_at; incluye los montos para que el $group no lea documentos
+        IndexModel(
+            [("created_at", ASCENDING), ("total", ASCENDING), ("subtotal", ASCENDING), ("taxes", ASCENDING)],
+            name="created_at_1_total_1_subtotal_1_taxes_1"
+        ),
+        # /orders/export con rango: orden (created_at, _id) sin SORT en memoria
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_1__id_1"),
+    ],
+    "OrderStats": [
+        # percentiles: digests de los dias cerrados que aun no estan combinados en memoria
+        IndexModel([("day", ASCENDING)], name="day_1", sparse=True),
+    ],
+    "inventorytypes": [
+        IndexModel([("name", ASCENDING)], name="name_1"),
+    ],
+    "States": [
+        IndexModel([("name", ASCENDING)], name="name_1"),
+    ],
+}
+
+
+async def ensure_indexes() -> dict:
+    """Crea los indices declarados. Si uno falla (p.ej. duplicados en un unique) se registra y se sigue."""
+    created = {}
+    for col_name, indexes in REQUIRED_INDEXES.items():
+        coll = get_collection(col_name)
+        created[col_name] = []
+        for index in indexes:
+            try:
+                name = await coll.create_indexes([index])
+                created[col_name].extend(name)
+            except OperationFailure as e:
+                logger.error(f"Could not create index {index.document['name']} on {col_name}: {e}")
+    return created
+
+
+async def index_report() -> dict:
+    """Compara los indices declarados con los existentes y su uso segun $indexStats."""
+    report = {}
+    for col_name, indexes in REQUIRED_INDEXES.items():
+        coll = get_collection(col_name)
+        declared = {index.document["name"] for index in indexes}
+
+        cursor = await coll.aggregate([{"$indexStats": {}}])
+        stats = await cursor.to_list()
+        existing = {s["name"]: s.get("accesses", {}).get("ops", 0) for s in stats}
+
+        report[col_name] = {
+            "missing": sorted(declared - existing.keys()),
+            "unused": sorted(name for name, ops in existing.items() if ops == 0 and name != "_id_"),
+            "undeclared": sorted(name for name in existing if name not in declared and name != "_id_"),
+        }
+    return report
+
+
+async def _main(ensure: bool):
+    if ensure:
+        await ensure_indexes()
+    print(json.dumps(await index_report(), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main("--ensure" in sys.argv[1:]))
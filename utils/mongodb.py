@@ -1,43 +1,202 @@
 import os
+import threading
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
+from pymongo.monitoring import ConnectionPoolListener
 from pymongo.server_api import ServerApi
 
 load_dotenv()
 
-DB = os.getenv("DATABASE_NAME")
-URI = os.getenv("MONGODB_URI")
 
-if not DB:
-    raise ValueError("Database name not found. Set DATABASE_NAME enviornment variable")
-if not URI:
-    raise ValueError("MongoDB URI not found. Set MONGODB_URI enviornment variable")
+def get_database_name() -> str:
+    db = os.getenv("DATABASE_NAME")
+    if not db:
+        raise ValueError("Database name not found. Set DATABASE_NAME enviornment variable")
+    return db
+
+
+def get_mongo_uri() -> str:
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise ValueError("MongoDB URI not found. Set MONGODB_URI enviornment variable")
+    return uri
+
+
+def _env_int(name: str, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def get_pool_settings() -> dict:
+    """Configuracion del pool tomada del entorno.
+
+    Con varios workers de uvicorn el total de conexiones contra Atlas es
+    workers * MONGO_MAX_POOL_SIZE, asi que hay que dimensionarlo contra el
+    limite del cluster.
+    """
+    settings = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 50),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+        "maxConnecting": _env_int("MONGO_MAX_CONNECTING", 2),
+    }
+    return settings
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """Listener de pymongo que lleva contadores del pool de conexiones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checked_out = 0
+            self.wait_queue = 0
+            self.open_connections = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_time_total_ms = 0.0
+            self.checkout_time_max_ms = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.checkout_time_total_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                "checked_out": self.checked_out,
+                "wait_queue": self.wait_queue,
+                "open_connections": self.open_connections,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_latency_avg_ms": round(avg, 3),
+                "checkout_latency_max_ms": round(self.checkout_time_max_ms, 3),
+            }
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.wait_queue += 1
+
+    def connection_checked_out(self, event):
+        duration_ms = (event.duration or 0.0) * 1000
+        with self._lock:
+            self.wait_queue = max(0, self.wait_queue - 1)
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_time_total_ms += duration_ms
+            self.checkout_time_max_ms = max(self.checkout_time_max_ms, duration_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.wait_queue = max(0, self.wait_queue - 1)
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
 
 _client = None
-def get_mongo_client():
-    """"Obtiene el cliente de MongoDB (lazy loading)"""
+def connect_mongo():
+    """Crea el cliente de MongoDB. Se llama desde el lifespan de la app (despues del fork del worker).
+
+    Las variables de entorno se validan aqui y no al importar el modulo.
+    """
     global _client
     if _client is None:
-        _client = MongoClient(  
-            URI
+        uri = get_mongo_uri()
+        get_database_name()
+        pool_metrics.reset()
+        _client = AsyncMongoClient(
+            uri
             , server_api = ServerApi("1")
             , tls = True
             , tlsAllowInvalidCertificates = True
             , serverSelectionTimeoutMS=5000
+            , event_listeners=[pool_metrics]
+            , **get_pool_settings()
         )
-    return _client    
+    return _client
+
+async def close_mongo():
+    """Cierra el cliente de MongoDB al apagar la app."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
+
+def get_mongo_client():
+    """"Obtiene el cliente asincrono de MongoDB (lo crea si aun no existe, p.ej. en scripts y tests)"""
+    if _client is None:
+        return connect_mongo()
+    return _client
+
+
+class LazyCollection:
+    """Referencia a una coleccion que se resuelve contra el cliente actual en cada uso.
+
+    Permite declarar las colecciones a nivel de modulo sin abrir conexiones al importar.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def resolve(self):
+        return get_mongo_client()[get_database_name()][self.name]
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
+
 
 def get_collection( col ):
-    """"Obtiene una coleccion de MongoDB"""
-    client = get_mongo_client()
-    return client[DB][col]
+    """"Obtiene una coleccion de MongoDB (todas las operaciones se hacen con await)"""
+    return LazyCollection(col)
+
+def get_pool_status() -> dict:
+    """Estado del pool para /metrics/db-pool"""
+    return {
+        "connected": _client is not None,
+        "settings": get_pool_settings(),
+        **pool_metrics.snapshot(),
+    }
 
-def t_connection():
+async def t_connection():
     """Funcion para probar la conexion (solo cuando sea necesario)"""
     try:
         client = get_mongo_client()
-        client.admin.command("ping")
+        await client.admin.command("ping")
         return True
-    except Exception as e: 
+    except Exception as e:
         print (f"Error connection to MongoDB: {e}")
-        return False
\ No newline at end of file
+        return False
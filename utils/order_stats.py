@@ -0,0 +1,386 @@
+"""
+Estadisticas de ordenes materializadas en la coleccion OrderStats.
+
+Cada orden nueva actualiza (con $inc/$max/$min, atomico por documento) un
+documento global {_id: "all"} y uno por dia {_id: "day:YYYY-MM-DD"}, asi
+/statistics lee un solo documento en vez de recorrer Orders.
+
+Los dias guardan ademas un t-digest de los totales (utils/tdigest.py) para
+los percentiles: cada orden se agrega con $push a digest_buffer y, cuando el
+buffer llega a ORDER_DIGEST_BUFFER, se compacta dentro de "digest" con una
+actualizacion condicionada por digest_version (si dos procesos compactan a
+la vez, solo uno gana y nunca se pierden valores del buffer).
+
+El documento {_id: "meta"} registra cuando se reconstruyo OrderStats desde
+Orders por ultima vez y una "generation" que sube con cada rebuild o migracion
+de Orders; los workers la usan para invalidar lo que tienen en memoria. Si
+nunca se reconstruyo (primer arranque despues del deploy, con Orders ya
+poblada) el lifespan llama a ensure_stats(), que siembra una vez (un solo
+worker) las ordenes anteriores al arranque, digests diarios incluidos, sumando
+a lo que las ordenes nuevas ya hayan registrado en los demas workers.
+
+Si los contadores se desvian (p.ej. una orden se guardo pero la actualizacion
+de OrderStats fallo) se pueden revisar y recalcular desde Orders con:
+
+    python -m utils.order_stats            # compara OrderStats con Orders
+    python -m utils.order_stats --rebuild  # recalcula OrderStats desde cero (con la API detenida)
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from pipelines.orders_pipeline import order_stats_by_day_pipeline, orders_before
+from utils.mongodb import close_mongo, get_collection
+from utils.tdigest import TDigest
+
+logger = logging.getLogger(__name__)
+
+stats_coll = get_collection("OrderStats")
+orders_coll = get_collection("Orders")
+
+ALL_TIME_ID = "all"
+META_ID = "meta"
+COUNTERS = ("total_orders", "total_sales", "sum_subtotal", "total_taxes")
+ORDER_DIGEST_BUFFER = int(os.getenv("ORDER_DIGEST_BUFFER", "200"))
+PERCENTILES = {"median_order": 0.5, "p90_order": 0.9, "p99_order": 0.99}
+# una siembra que lleva mas que esto sin terminar se da por muerta (worker reiniciado a mitad) y otro la retoma
+STATS_REBUILD_TIMEOUT = timedelta(seconds=float(os.getenv("STATS_REBUILD_TIMEOUT_SECONDS", "1800")))
+
+EMPTY_STATISTICS = {
+    "total_orders": 0,
+    "total_sales": 0.0,
+    "avg_subtotal": 0.0,
+    "total_taxes": 0.0,
+    "max_order": 0.0,
+    "min_order": 0.0
+}
+
+# digest combinado de los dias anteriores a "until" (antes de ayer) para una generacion de OrderStats;
+# ayer se sigue leyendo de la base porque pueden llegar ordenes tardias justo despues de medianoche
+_closed_days = {"generation": None, "until": None, "digest": TDigest()}
+_closed_days_lock = asyncio.Lock()
+
+
+def day_id(when: datetime) -> str:
+    return f"day:{when.strftime('%Y-%m-%d')}"
+
+
+def stats_update_many(order_docs: list) -> dict:
+    totals = [doc["total"] for doc in order_docs]
+    return {
+        "$inc": {
+            "total_orders": len(order_docs),
+            "total_sales": sum(totals),
+            "sum_subtotal": sum(doc["subtotal"] for doc in order_docs),
+            "total_taxes": sum(doc["taxes"] for doc in order_docs),
+        },
+        "$max": {"max_order": max(totals)},
+        "$min": {"min_order": min(totals)},
+    }
+
+
+def stats_update(order_doc: dict) -> dict:
+    return stats_update_many([order_doc])
+
+
+async def record_order(order_doc: dict, when: datetime):
+    """Suma una orden al acumulado global y al del dia (y su total al buffer del digest del dia)."""
+    await record_orders([order_doc], when)
+
+
+async def record_orders(order_docs: list, when: datetime):
+    """Como record_order, para varias ordenes del mismo dia con una sola actualizacion por documento."""
+    if not order_docs:
+        return
+    update = stats_update_many(order_docs)
+    day_update = {
+        **update,
+        "$push": {"digest_buffer": {"$each": [doc["total"] for doc in order_docs]}},
+        "$setOnInsert": {"day": datetime(when.year, when.month, when.day), "digest_version": 0},
+    }
+    _, day = await asyncio.gather(
+        stats_coll.update_one({"_id": ALL_TIME_ID}, update, upsert=True),
+        stats_coll.find_one_and_update(
+            {"_id": day_id(when)},
+            day_update,
+            projection={"buffered": {"$size": "$digest_buffer"}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    )
+    if day["buffered"] >= ORDER_DIGEST_BUFFER:
+        await compact_day(day["_id"])
+
+
+def _digest_of(doc: dict) -> TDigest:
+    digest = TDigest.from_dict(doc["digest"]) if doc.get("digest") else TDigest()
+    if doc.get("seed_digest"):
+        digest.merge(TDigest.from_dict(doc["seed_digest"]))
+    for value in doc.get("digest_buffer", []):
+        digest.add(value)
+    return digest
+
+
+async def compact_day(key: str) -> bool:
+    """Pasa el buffer del dia al digest. Devuelve False si otro proceso compacto primero.
+    seed_digest (ordenes de antes de la siembra) queda aparte y no se toca."""
+    doc = await stats_coll.find_one({"_id": key}, {"digest": 1, "digest_buffer": 1, "digest_version": 1})
+    buffered = len(doc.get("digest_buffer", [])) if doc else 0
+    if not buffered:
+        return False
+    version = doc.get("digest_version", 0)
+    # se quitan solo los primeros `buffered` valores: los que llegaron despues siguen en el buffer
+    result = await stats_coll.update_one(
+        {"_id": key, "digest_version": version} if "digest_version" in doc else {"_id": key, "digest_version": {"$exists": False}},
+        [{"$set": {
+            "digest": {"$literal": _digest_of(doc).to_dict()},
+            "digest_version": version + 1,
+            "digest_buffer": {"$slice": ["$digest_buffer", buffered, {"$max": [1, {"$size": "$digest_buffer"}]}]},
+        }}]
+    )
+    return result.modified_count == 1
+
+
+def to_statistics(doc: dict) -> dict:
+    """Documento de OrderStats -> respuesta de /statistics."""
+    if not doc or not doc.get("total_orders"):
+        return dict(EMPTY_STATISTICS)
+    return {
+        "total_orders": doc["total_orders"],
+        "total_sales": doc["total_sales"],
+        "avg_subtotal": doc["sum_subtotal"] / doc["total_orders"],
+        "total_taxes": doc["total_taxes"],
+        "max_order": doc["max_order"],
+        "min_order": doc["min_order"]
+    }
+
+
+async def order_percentiles() -> dict:
+    """Percentiles del total de las ordenes combinando los digests diarios.
+
+    Los dias hasta antes de ayer se combinan una vez por proceso, por dia y
+    por generacion (un rebuild la sube y se vuelven a leer); en cada llamada
+    solo se leen "meta", ayer y hoy, en una consulta.
+    """
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    yesterday = today - timedelta(days=1)
+    recent = {
+        doc["_id"]: doc
+        async for doc in stats_coll.find(
+            {"_id": {"$in": [META_ID, day_id(yesterday), day_id(today)]}},
+            {"generation": 1, "digest": 1, "seed_digest": 1, "digest_buffer": 1}
+        )
+    }
+    generation = recent.pop(META_ID, {}).get("generation", 0)
+
+    async with _closed_days_lock:
+        if _closed_days["generation"] != generation:
+            _closed_days.update(generation=generation, until=None, digest=TDigest())
+        if _closed_days["until"] != yesterday:
+            query = {"day": {"$lt": yesterday}}
+            if _closed_days["until"] is not None:
+                query["day"]["$gte"] = _closed_days["until"]
+            async for doc in stats_coll.find(query, {"digest": 1, "seed_digest": 1, "digest_buffer": 1}):
+                _closed_days["digest"].merge(_digest_of(doc))
+            _closed_days["until"] = yesterday
+        digest = TDigest.from_dict(_closed_days["digest"].to_dict())
+
+    for doc in recent.values():
+        digest.merge(_digest_of(doc))
+    return {name: digest.quantile(q) if digest.count else 0.0 for name, q in PERCENTILES.items()}
+
+
+async def get_statistics() -> dict:
+    statistics = to_statistics(await stats_coll.find_one({"_id": ALL_TIME_ID}))
+    statistics.update(await order_percentiles())
+    return statistics
+
+
+def _merge(total: dict, day: dict) -> dict:
+    if not total:
+        return {key: day[key] for key in (*COUNTERS, "max_order", "min_order")}
+    merged = {key: total[key] + day[key] for key in COUNTERS}
+    merged["max_order"] = max(total["max_order"], day["max_order"])
+    merged["min_order"] = min(total["min_order"], day["min_order"])
+    return merged
+
+
+async def compute_from_orders(until: datetime = None) -> dict:
+    """Recalcula desde Orders: {_id: documento} para el global y cada dia (con su digest).
+    Con until, solo las ordenes creadas antes."""
+    cursor = await orders_coll.aggregate(order_stats_by_day_pipeline(until))
+    docs = {}
+    total = {}
+    async for row in cursor:
+        day = datetime.strptime(row.pop("_id"), "%Y-%m-%d")
+        docs[day_id(day)] = {**row, "day": day, "digest_buffer": [], "digest_version": 0}
+        total = _merge(total, row)
+    if total:
+        docs[ALL_TIME_ID] = total
+
+    digests = {}
+    async for order in orders_coll.find(orders_before(until) if until else {}, {"total": 1, "created_at": 1}):
+        when = order.get("created_at") or order["_id"].generation_time
+        digests.setdefault(day_id(when), TDigest()).add(order["total"])
+    for key, digest in digests.items():
+        docs[key]["digest"] = digest.to_dict()
+    return docs
+
+
+def _differs(stored: dict, expected: dict) -> bool:
+    for key in (*COUNTERS, "max_order", "min_order"):
+        if not math.isclose(stored.get(key, 0) or 0, expected.get(key, 0) or 0, rel_tol=1e-9, abs_tol=1e-6):
+            return True
+    return False
+
+
+async def check_stats() -> dict:
+    """Compara OrderStats con lo recalculado desde Orders."""
+    expected = await compute_from_orders()
+    stored = {doc["_id"]: doc async for doc in stats_coll.find({"_id": {"$ne": META_ID}})}
+    return {
+        "missing": sorted(expected.keys() - stored.keys()),
+        "unexpected": sorted(stored.keys() - expected.keys()),
+        "mismatched": sorted(key for key in expected.keys() & stored.keys() if _differs(stored[key], expected[key])),
+    }
+
+
+async def _mark_rebuilt():
+    await stats_coll.update_one(
+        {"_id": META_ID},
+        {"$set": {"rebuilt_at": datetime.utcnow()}, "$unset": {"rebuilding_since": ""}, "$inc": {"generation": 1}},
+        upsert=True
+    )
+
+
+async def stats_generation() -> int:
+    meta = await stats_coll.find_one({"_id": META_ID}, {"generation": 1})
+    return meta.get("generation", 0) if meta else 0
+
+
+async def bump_generation():
+    """Invalida en todos los workers los resultados cacheados (despues de cambiar Orders por fuera de la API)."""
+    await stats_coll.update_one({"_id": META_ID}, {"$inc": {"generation": 1}}, upsert=True)
+
+
+async def rebuild_stats() -> int:
+    """Reescribe OrderStats desde Orders (python -m utils.order_stats --rebuild).
+
+    Reemplaza cada documento entero, asi que lo que record_order sume mientras
+    corre se pierde: usar con la API detenida o en un momento sin ordenes. El
+    arranque no la usa (ver seed_stats). Sube la generacion de "meta": los
+    workers descartan el digest de dias cerrados que tienen en memoria.
+    """
+    expected = await compute_from_orders()
+    if expected:
+        await stats_coll.bulk_write([ReplaceOne({"_id": key}, doc, upsert=True) for key, doc in expected.items()])
+    await stats_coll.delete_many({"_id": {"$nin": [*expected, META_ID]}})
+    await _mark_rebuilt()
+    return len(expected)
+
+
+def _seed_update(key: str, doc: dict, seeded_at: datetime) -> dict:
+    update = {
+        "$inc": {counter: doc[counter] for counter in COUNTERS},
+        "$max": {"max_order": doc["max_order"]},
+        "$min": {"min_order": doc["min_order"]},
+        "$set": {"seeded_at": seeded_at},
+    }
+    if key != ALL_TIME_ID:
+        update["$set"]["seed_digest"] = doc["digest"]
+        update["$setOnInsert"] = {"day": doc["day"], "digest_version": 0}
+    return update
+
+
+async def seed_stats(until: datetime) -> int:
+    """Suma a OrderStats las ordenes creadas antes de until, sin pisar lo que record_order ya sumo.
+
+    Las ordenes desde until las cuentan los workers al crearlas; aqui se aplican
+    solo las anteriores como $inc/$max/$min (el digest queda en seed_digest).
+    Cada documento se siembra una sola vez (seeded_at): si otro worker retoma
+    una siembra cortada, los documentos ya sembrados dan clave duplicada y se
+    saltan. Devuelve cuantos documentos sembro.
+    """
+    expected = await compute_from_orders(until)
+    if not expected:
+        return 0
+    seeded_at = datetime.utcnow()
+    requests = [
+        UpdateOne({"_id": key, "seeded_at": {"$exists": False}}, _seed_update(key, doc, seeded_at), upsert=True)
+        for key, doc in expected.items()
+    ]
+    try:
+        await stats_coll.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        return len(expected) - len(errors)
+    return len(expected)
+
+
+async def ensure_stats() -> bool:
+    """Siembra OrderStats desde Orders si nunca se hizo ("meta" sin rebuilt_at).
+
+    "meta" puede existir sin siembra (bump_generation de una migracion corrida
+    antes del primer arranque), asi que se reclama con rebuilding_since: el
+    primer worker que lo pone siembra; los demas arrancan y sirven ordenes
+    mientras tanto. La marca guarda tambien seed_until, el corte entre lo que
+    siembra seed_stats y lo que cuenta record_order. Una marca de hace mas de
+    STATS_REBUILD_TIMEOUT se da por abandonada y se retoma con el mismo corte.
+    Si la siembra falla se quita la marca para reintentar en el proximo arranque.
+    Devuelve True si este proceso sembro.
+    """
+    claimed_at = datetime.utcnow()
+    try:
+        before = await stats_coll.find_one_and_update(
+            {
+                "_id": META_ID,
+                "rebuilt_at": {"$exists": False},
+                "$or": [
+                    {"rebuilding_since": {"$exists": False}},
+                    {"rebuilding_since": {"$lt": claimed_at - STATS_REBUILD_TIMEOUT}},
+                ],
+            },
+            {"$set": {"rebuilding_since": claimed_at}, "$setOnInsert": {"seed_until": claimed_at}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # "meta" ya existe y no cumple el filtro: ya se sembro o lo esta haciendo otro worker
+        return False
+    before = before or {}
+    if before.get("rebuilding_since"):
+        logger.warning(f"OrderStats seed claimed at {before['rebuilding_since']} never finished; resuming it")
+    until = before.get("seed_until") or before.get("rebuilding_since") or claimed_at
+    try:
+        # "meta" creado por bump_generation no tiene corte: se fija antes de sembrar nada
+        await stats_coll.update_one({"_id": META_ID, "seed_until": {"$exists": False}}, {"$set": {"seed_until": until}})
+        count = await seed_stats(until)
+        await _mark_rebuilt()
+    except BaseException:
+        await stats_coll.update_one({"_id": META_ID, "rebuilding_since": claimed_at}, {"$unset": {"rebuilding_since": ""}})
+        raise
+    logger.info(f"OrderStats seeded from Orders created before {until} ({count} documents)")
+    return True
+
+
+async def _main(rebuild: bool):
+    try:
+        if rebuild:
+            print(f"Rebuilt {await rebuild_stats()} OrderStats documents")
+        print(json.dumps(await check_stats(), indent=2))
+    finally:
+        await close_mongo()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main("--rebuild" in sys.argv[1:]))
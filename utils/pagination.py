@@ -0,0 +1,110 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pipelines.builder import PipelineBuilder
+from utils.cache import TTLCache
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+_count_cache = TTLCache(maxsize=512, ttl=COUNT_CACHE_TTL)
+
+
+def encode_cursor(value, oid) -> str:
+    """Token opaco con el par (valor de orden, _id) del ultimo elemento de la pagina."""
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": str(oid)}
+    else:
+        payload = {"v": value, "id": str(oid)}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+        return value, ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _next_cursor(items: list, cursor_field: str):
+    last = items[-1]
+    return encode_cursor(last.get(cursor_field), last["id"])
+
+
+async def _approximate_total(coll, query: PipelineBuilder) -> int:
+    """Total cacheado (o estimado por metadata si no hay filtros)."""
+    filter_stages = query.filter_stages()
+    key = (coll.name, repr(filter_stages))
+    total = _count_cache.get(key)
+    if total is None:
+        if not filter_stages:
+            total = await coll.estimated_document_count()
+        else:
+            cursor = await coll.aggregate(filter_stages + [{"$count": "total"}])
+            result = await cursor.to_list()
+            total = result[0]["total"] if result else 0
+        _count_cache.set(key, total)
+    return total
+
+
+async def paginate(
+    coll, query: PipelineBuilder, skip: int, limit: int, approximate: bool = False, cursor_field: str = None
+) -> dict:
+    """Devuelve {items, total, skip, limit, next_cursor} paginando por offset.
+
+    total es la cantidad de documentos que devuelve la misma query sin
+    skip/limit (incluye las inactivas si la query las lista). Antes del $facet
+    los listados respondian count_documents({"active": True}), que no coincidia
+    con los items paginados.
+    Por defecto trae la pagina y el total en una sola agregacion con $facet.
+    Con approximate=True el total sale de una cache con TTL (o de
+    estimated_document_count) y solo se ejecuta el pipeline de la pagina.
+    Si se indica cursor_field, next_cursor permite seguir con paginate_cursor.
+    """
+    query.skip(skip).limit(limit)
+
+    if approximate:
+        cursor = await coll.aggregate(query.build())
+        items = await cursor.to_list()
+        total = await _approximate_total(coll, query)
+    else:
+        cursor = await coll.aggregate(query.facet())
+        result = await cursor.to_list()
+        facet = result[0] if result else {"items": [], "total": []}
+        items = facet["items"]
+        total = facet["total"][0]["total"] if facet["total"] else 0
+
+    next_cursor = None
+    if cursor_field and items and len(items) == limit and skip + limit < total:
+        next_cursor = _next_cursor(items, cursor_field)
+
+    return {"items": items, "total": int(total), "skip": skip, "limit": limit, "next_cursor": next_cursor}
+
+
+async def paginate_cursor(coll, query: PipelineBuilder, limit: int, cursor_field: str) -> dict:
+    """Pagina por keyset: la query ya trae keyset(..., after=decode_cursor(token)).
+
+    Cada pagina es un rango sobre el indice (cursor_field, _id), asi que cuesta
+    lo mismo en la pagina 1 que en la 10.000. El total es el aproximado (cacheado).
+    """
+    query.skip(0).limit(limit + 1)
+    cursor = await coll.aggregate(query.build())
+    items = await cursor.to_list()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = _next_cursor(items, cursor_field)
+
+    total = await _approximate_total(coll, query)
+    return {"items": items, "total": int(total), "limit": limit, "next_cursor": next_cursor}
@@ -1,14 +1,23 @@
 import os 
 import jwt
 
-from functools import wraps
+import hashlib
+import time
+
+from bson import ObjectId
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException, Request
+
+from utils.cache import TTLCache
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY") 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# sha256(token) -> claims ya verificados; cada entrada vive hasta el exp del token
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=3600)
 
 def create_jwt_token( 
         firstname:str
@@ -17,6 +26,7 @@ def create_jwt_token(
         , phone: str
         , active: bool
         , admin:bool
+        , user_id: str = None
     ):
     expiration = datetime.utcnow() + timedelta(hours=1) 
     token = jwt.encode( 
@@ -27,6 +37,7 @@ def create_jwt_token(
             "phone": phone, 
             "active": active,
             "admin": admin, 
+            "user_id": user_id,
             "exp": expiration,
             "iat": datetime.utcnow()
         },
@@ -35,96 +46,70 @@ def create_jwt_token(
     )
     return token 
 
-def validate_user(func):  
-    @wraps(func) 
-    async def wrapper( *args, **kwargs): 
-        request = kwargs.get('request') 
-        if not request:   
-            raise HTTPException(status_code = 400, detail= "Request object not found" ) 
-        authorization: str = request.headers.get("Authorization") 
-        if not authorization:
-            raise HTTPException(status_code=400, detail="Authotization header missing")
-        
-        schema, token = authorization.split() 
-        if schema.lower() != "bearer": 
-            raise HTTPException(status_code=400, detail="Invalid auth schema")
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"]) #
-            
-            email = payload.get("email") 
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            phone = payload.get("phone")
-            active= payload.get("active")
-            exp = payload.get("exp")
-            admin = payload.get("admin")
-            
-            #validación de campos
-            if email is None:
-                raise HTTPException(status_code=401, detail="Token invalid")
-            
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException(status_code=401, detail="Expired token")
-            
-            if not active:
-                raise HTTPException(status_code=401, detail="Inactive user")
-            
-            #guarda info en request.state
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.phone = phone
-            request.state.admin = admin
-            
-        except jwt.PyJWTError:
-            raise HTTPException(status_code=401, detail="Invalid token or expired token")    
-
-        
-        return await func( *args, **kwargs) #retorna la función original
-    
-    return wrapper  #devuelve la función decorada
-
-
-def validate_admin(func):
-    @wraps(func)
-    async def wrapper( *args, **kwargs): #parametros de ejecucuión y acceder
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException(status_code = 400, detail= "Request objecto not found" )
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException(status_code=400, detail="Authotization header missing")
-        
-        schema, token = authorization.split()
-        if schema.lower() != "bearer": 
-            raise HTTPException(status_code=400, detail="Invalid auth schema")
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            
-            email = payload.get("email")
-            firstname = payload.get("firstname")
-            lastname = payload.get("lastname")
-            admin= payload.get("admin")
-            active=payload.get("active")
-            exp = payload.get("exp")
-            
-            if email is None:
-                raise HTTPException(status_code=401, detail="Token invalid")
-            
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException(status_code=401, detail="Expired token")
-            
-            if not active or not admin:
-                raise HTTPException(status_code=401, detail="Inactive user or not admin")
-            
-            request.state.email = email
-            request.state.firstname = firstname
-            request.state.lastname = lastname
-            request.state.admin = admin
-            
-        except jwt.PyJWTError:
-            raise HTTPException(status_code=401, detail="Invalid token or expired token")    
-        
-        return await func( *args, **kwargs)
-    
-    return wrapper 
\ No newline at end of file
+def _user_oid(payload: dict):
+    """_id del usuario si viene en el token (los tokens antiguos no lo traen)."""
+    user_id = payload.get("user_id")
+    return ObjectId(user_id) if user_id and ObjectId.is_valid(user_id) else None
+
+def _bearer_token(request: Request) -> str:
+    authorization: str = request.headers.get("Authorization")
+    if not authorization:
+        raise HTTPException(status_code=400, detail="Authotization header missing")
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(status_code=400, detail="Invalid auth schema")
+    return parts[1]
+
+
+def verify_token(token: str) -> dict:
+    """Claims verificados del token. Cada token se decodifica una sola vez y
+    sus claims quedan en cache (por sha256 del token) hasta su exp."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = _token_cache.get(digest)
+    if claims is not None:
+        if claims["exp"] <= time.time():
+            _token_cache.pop(digest)
+            raise HTTPException(status_code=401, detail="Expired token")
+        return claims
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+
+    #validación de campos
+    if payload.get("email") is None or payload.get("exp") is None:
+        raise HTTPException(status_code=401, detail="Token invalid")
+    if not payload.get("active"):
+        raise HTTPException(status_code=401, detail="Inactive user")
+
+    claims = {
+        "email": payload["email"],
+        "firstname": payload.get("firstname"),
+        "lastname": payload.get("lastname"),
+        "phone": payload.get("phone"),
+        "admin": bool(payload.get("admin")),
+        "user_id": _user_oid(payload),
+        "exp": payload["exp"],
+    }
+    _token_cache.set(digest, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+
+async def require_user(request: Request) -> dict:
+    """Dependencia de FastAPI: valida el token y guarda los claims en request.state."""
+    claims = verify_token(_bearer_token(request))
+    request.state.email = claims["email"]
+    request.state.firstname = claims["firstname"]
+    request.state.lastname = claims["lastname"]
+    request.state.phone = claims["phone"]
+    request.state.admin = claims["admin"]
+    request.state.user_id = claims["user_id"]
+    return claims
+
+
+async def require_admin(request: Request, claims: dict = Depends(require_user)) -> dict:
+    """Como require_user, pero solo para administradores (sin volver a decodificar)."""
+    if not claims["admin"]:
+        raise HTTPException(status_code=401, detail="Inactive user or not admin")
+    return claims
@@ -0,0 +1,46 @@
+"""
+Serializacion JSON rapida (orjson) para respuestas que salen directo de Mongo.
+
+FastAPI, cuando una ruta tiene response_model, vuelve a validar cada elemento
+con Pydantic y despues lo pasa por jsonable_encoder antes de convertirlo a
+JSON. En las lecturas cuyo contenido ya controlamos (documentos guardados por
+la propia API, proyectados a los campos del modelo) eso es trabajo repetido:
+esas rutas devuelven trusted(...) y el documento se escribe tal cual con
+orjson. response_model se mantiene para la documentacion de OpenAPI.
+"""
+from decimal import Decimal
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(value):
+    """Tipos de BSON que orjson no conoce (datetime y date ya los serializa solo)."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=bson_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def trusted(content, status_code: int = 200) -> ORJSONResponse:
+    """Respuesta sin re-validar ni pasar por jsonable_encoder (solo para datos de la propia BD)."""
+    return ORJSONResponse(content, status_code=status_code)
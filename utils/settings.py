@@ -0,0 +1,109 @@
+"""
+Configuraciones del sistema (ver system_settings.txt) servidas desde memoria.
+
+Se precargan al arrancar, se sirven desde una cache con TTL y se invalidan
+en cuanto se editan por el endpoint de administracion (/settings).
+
+La cache es por proceso: el PUT invalida solo el worker que lo atendio y los
+demas siguen con el valor anterior hasta que vence su TTL. Por eso las claves
+con efecto en dinero (general_tax) usan un TTL corto (SETTINGS_KEY_TTL).
+"""
+import logging
+import os
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from models.system_settings import SystemSetting
+from utils.cache import TTLCache
+from utils.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+
+# TTL propio por clave (segundos); las demas usan SETTINGS_CACHE_TTL
+SETTINGS_KEY_TTL = {
+    "general_tax": float(os.getenv("GENERAL_TAX_CACHE_TTL", "15")),
+}
+
+# Coleccion donde vive cada clave hoy; las claves nuevas se guardan en System
+SETTINGS_COLLECTIONS = {
+    "hours_before_changes": "Services",
+    "general_tax": "System",
+}
+DEFAULT_COLLECTION = "System"
+
+_MISSING = object()
+
+
+def _to_setting(doc: dict) -> SystemSetting:
+    doc = dict(doc)
+    doc["id"] = str(doc.pop("_id"))
+    return SystemSetting(**doc)
+
+
+class SettingsService:
+
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self._cache = TTLCache(maxsize=256, ttl=ttl)
+
+    def _cache_set(self, key: str, setting):
+        self._cache.set(key, setting, SETTINGS_KEY_TTL.get(key))
+
+    def _collection(self, key: str):
+        return get_collection(SETTINGS_COLLECTIONS.get(key, DEFAULT_COLLECTION))
+
+    async def load(self) -> list:
+        """Precarga todas las claves conocidas y las que existan en System."""
+        settings = []
+        for col_name in set(SETTINGS_COLLECTIONS.values()) | {DEFAULT_COLLECTION}:
+            cursor = get_collection(col_name).find({"key": {"$exists": True}})
+            async for doc in cursor:
+                if SETTINGS_COLLECTIONS.get(doc["key"], DEFAULT_COLLECTION) != col_name:
+                    continue
+                setting = _to_setting(doc)
+                self._cache_set(setting.key, setting)
+                settings.append(setting)
+        for key in SETTINGS_COLLECTIONS:
+            if self._cache.get(key, _MISSING) is _MISSING:
+                self._cache_set(key, None)
+        return settings
+
+    async def get(self, key: str):
+        setting = self._cache.get(key, _MISSING)
+        if setting is _MISSING:
+            doc = await self._collection(key).find_one({"key": key})
+            setting = _to_setting(doc) if doc else None
+            self._cache_set(key, setting)
+        return setting
+
+    async def get_value(self, key: str, default=None):
+        setting = await self.get(key)
+        if setting is None:
+            logger.warning(f"Setting {key} not found, using default {default}")
+            return default
+        return setting.value
+
+    async def set(self, key: str, value: float, description: str = None) -> SystemSetting:
+        update = {"key": key, "value": value, "updated_at": datetime.utcnow()}
+        if description is not None:
+            update["description"] = description
+        doc = await self._collection(key).find_one_and_update(
+            {"key": key},
+            {"$set": update},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        setting = _to_setting(doc)
+        self._cache_set(key, setting)
+        return setting
+
+    def invalidate(self, key: str = None):
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key)
+
+
+settings_service = SettingsService()
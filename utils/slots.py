@@ -0,0 +1,202 @@
+"""
+Reserva de horarios para citas.
+
+Cada cita activa ocupa un bloque normalizado de 30 minutos en la coleccion
+Slots. El _id del documento ES el inicio del bloque, asi que el indice unico
+de _id garantiza que dos citas no tomen el mismo bloque: reservar es un solo
+insert_one y, bajo concurrencia, solo uno de los inserts gana.
+
+La reserva y el insert de la cita son dos escrituras: si el proceso muere entre
+ambas (o falla la liberacion tras un insert fallido) el bloque queda huerfano.
+release_orphan_slots() borra los bloques cuya cita no existe, ya no esta
+activa o se movio a otro bloque; corre al arrancar (sync_slots) y en la tarea
+de expiracion.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.mongodb import get_collection
+from utils.availability import SLOT_MINUTES, availability_index
+
+logger = logging.getLogger(__name__)
+
+# tiempo que se da a una reserva recien hecha para insertar su cita antes de considerarla huerfana
+SLOT_CLAIM_GRACE = timedelta(seconds=float(os.getenv("SLOT_CLAIM_GRACE_SECONDS", "300")))
+
+slots_coll = get_collection("Slots")
+appointments_coll = get_collection("Appointments")
+
+
+def slot_bucket(date_appointment: datetime) -> datetime:
+    """Inicio del bloque de 30 minutos que contiene la fecha."""
+    minute = date_appointment.minute - date_appointment.minute % SLOT_MINUTES
+    return date_appointment.replace(minute=minute, second=0, microsecond=0)
+
+
+async def claim_slot(date_appointment: datetime, appointment_id: ObjectId) -> bool:
+    """Reserva el bloque para la cita. Devuelve False si ya estaba tomado."""
+    bucket = slot_bucket(date_appointment)
+    try:
+        await slots_coll.insert_one({
+            "_id": bucket,
+            "appointment_id": appointment_id,
+            "claimed_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        availability_index.add(bucket)
+        return False
+    availability_index.add(bucket)
+    return True
+
+
+async def booked_buckets(start: datetime, end: datetime) -> set:
+    """Bloques ya reservados entre start y end (inclusive), con una sola consulta de rango."""
+    cursor = slots_coll.find({"_id": {"$gte": slot_bucket(start), "$lte": slot_bucket(end)}}, {"_id": 1})
+    return {doc["_id"] async for doc in cursor}
+
+
+async def claim_slots(claims: list) -> set:
+    """Reserva varios bloques con un insert_many. claims = [(date_appointment, appointment_id)].
+
+    Devuelve los appointment_id que obtuvieron su bloque; los demas perdieron
+    contra otra reserva.
+    """
+    if not claims:
+        return set()
+    now = datetime.utcnow()
+    docs = [
+        {"_id": slot_bucket(date_appointment), "appointment_id": appointment_id, "claimed_at": now}
+        for date_appointment, appointment_id in claims
+    ]
+    failed = set()
+    try:
+        await slots_coll.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        failed = {err["index"] for err in errors}
+        if any(err.get("code") != 11000 for err in errors):
+            # los bloques que si se insertaron quedarian huerfanos: se liberan antes de fallar
+            inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+            if inserted:
+                await slots_coll.delete_many({
+                    "$or": [{"_id": doc["_id"], "appointment_id": doc["appointment_id"]} for doc in inserted]
+                })
+            raise
+    claimed = set()
+    for i, doc in enumerate(docs):
+        availability_index.add(doc["_id"])
+        if i not in failed:
+            claimed.add(doc["appointment_id"])
+    return claimed
+
+
+async def release_slot(date_appointment: datetime, appointment_id: ObjectId) -> bool:
+    """Libera el bloque solo si sigue perteneciendo a esta cita."""
+    bucket = slot_bucket(date_appointment)
+    result = await slots_coll.delete_one({
+        "_id": bucket,
+        "appointment_id": appointment_id
+    })
+    if result.deleted_count > 0:
+        availability_index.remove(bucket)
+        return True
+    return False
+
+
+async def release_slots(claims: list) -> int:
+    """Libera varios bloques de una vez. claims = [(date_appointment, appointment_id)]."""
+    if not claims:
+        return 0
+    buckets = [(slot_bucket(date_appointment), appointment_id) for date_appointment, appointment_id in claims]
+    result = await slots_coll.delete_many({
+        "$or": [{"_id": bucket, "appointment_id": appointment_id} for bucket, appointment_id in buckets]
+    })
+    await _unindex_released([bucket for bucket, _ in buckets])
+    return result.deleted_count
+
+
+async def _unindex_released(buckets: list):
+    """Quita del indice solo los bloques que ya no existen: el delete filtra por
+    (_id, appointment_id), asi que un bloque que es de otra cita sigue reservado."""
+    cursor = slots_coll.find({"_id": {"$in": buckets}}, {"_id": 1})
+    remaining = {doc["_id"] async for doc in cursor}
+    for bucket in buckets:
+        if bucket not in remaining:
+            availability_index.remove(bucket)
+
+
+async def release_past_slots(before: datetime) -> int:
+    result = await slots_coll.delete_many({"_id": {"$lt": slot_bucket(before)}})
+    return result.deleted_count
+
+
+async def release_orphan_slots(now: datetime = None) -> int:
+    """Borra los bloques futuros cuya cita no existe, esta inactiva o ya esta en otro horario.
+    Devuelve cuantos borro.
+
+    Solo mira reservas de hace mas de SLOT_CLAIM_GRACE, para no tocar las que
+    todavia estan a punto de insertar su cita.
+    """
+    now = now or datetime.utcnow()
+    cursor = slots_coll.find(
+        {"_id": {"$gte": slot_bucket(now)}, "claimed_at": {"$lt": now - SLOT_CLAIM_GRACE}},
+        {"appointment_id": 1}
+    )
+    slots = [doc async for doc in cursor]
+    if not slots:
+        return 0
+    cursor = appointments_coll.find(
+        {"_id": {"$in": list({doc["appointment_id"] for doc in slots})}, "active": True},
+        {"date_appointment": 1}
+    )
+    # bloque que deberia ocupar cada cita activa (una cita movida deja de ser dueña del bloque anterior)
+    owned = {
+        doc["_id"]: slot_bucket(doc["date_appointment"])
+        async for doc in cursor
+        if isinstance(doc.get("date_appointment"), datetime)
+    }
+    orphans = [doc for doc in slots if owned.get(doc["appointment_id"]) != doc["_id"]]
+    if not orphans:
+        return 0
+    # se borra por (_id, appointment_id): si el bloque cambio de dueño entretanto, se respeta
+    result = await slots_coll.delete_many({
+        "$or": [{"_id": doc["_id"], "appointment_id": doc["appointment_id"]} for doc in orphans]
+    })
+    await _unindex_released([doc["_id"] for doc in orphans])
+    logger.warning(f"Released {result.deleted_count} orphan slots")
+    return result.deleted_count
+
+
+async def sync_slots() -> int:
+    """Crea los bloques que falten para las citas activas futuras (p.ej. citas previas a Slots)
+    y libera los huerfanos."""
+    await release_orphan_slots()
+    cursor = appointments_coll.find(
+        {"active": True, "date_appointment": {"$gte": datetime.utcnow()}},
+        {"date_appointment": 1}
+    )
+    ops = [
+        UpdateOne(
+            {"_id": slot_bucket(doc["date_appointment"])},
+            {"$setOnInsert": {"appointment_id": doc["_id"], "claimed_at": datetime.utcnow()}},
+            upsert=True
+        )
+        async for doc in cursor
+        if isinstance(doc.get("date_appointment"), datetime)
+    ]
+    if not ops:
+        return 0
+    try:
+        result = await slots_coll.bulk_write(ops, ordered=False)
+        return result.upserted_count
+    except BulkWriteError as e:
+        # otro worker pudo crear el mismo bloque a la vez; eso no es un error
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+        if errors:
+            raise
+        return e.details.get("nUpserted", 0)
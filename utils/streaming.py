@@ -0,0 +1,56 @@
+"""
+Respuestas que se escriben por partes (NDJSON / CSV) a medida que se lee el cursor,
+para que la memoria por request no dependa del tamaño del resultado.
+"""
+import csv
+import io
+from datetime import date, datetime
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from utils.serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# documentos por lote de cursor (y por escritura al cliente)
+STREAM_BATCH_SIZE = 1000
+
+
+def ndjson_lines(docs: list) -> bytes:
+    return b"".join(dumps(doc) + b"\n" for doc in docs)
+
+
+def csv_lines(rows: list, columns: list, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow({
+            key: value.isoformat() if isinstance(value, (datetime, date)) else value
+            for key, value in row.items()
+        })
+    return buffer.getvalue().encode()
+
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    """Streaming opt-in: ?stream=true o Accept: application/x-ndjson."""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def ndjson_stream(cursor, transform=None):
+    """Recorre el cursor y escribe un bloque de lineas NDJSON cada STREAM_BATCH_SIZE documentos."""
+    batch = []
+    async for doc in cursor:
+        batch.append(transform(doc) if transform else doc)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield ndjson_lines(batch)
+            batch = []
+    if batch:
+        yield ndjson_lines(batch)
+
+
+def ndjson_response(body) -> StreamingResponse:
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE)
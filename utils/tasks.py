@@ -0,0 +1,10 @@
+import asyncio
+
+
+async def stop_task(task: asyncio.Task):
+    """Cancela una tarea en segundo plano y espera a que termine."""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,129 @@
+"""
+t-digest (variante "merging", Dunning 2019) para estimar cuantiles.
+
+Resume una distribucion en unos pocos centroides (media, peso), con mas
+resolucion en las colas. Dos digests se pueden combinar, asi que se guarda uno
+por dia y los percentiles de cualquier rango salen de combinar los dias.
+"""
+import math
+
+DEFAULT_COMPRESSION = 100.0
+
+
+class TDigest:
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means = []
+        self._weights = []
+        self._buffer = []
+        self._buffer_limit = int(5 * compression)
+
+    def __len__(self):
+        self.compress()
+        return len(self._means)
+
+    def add(self, value: float, weight: float = 1.0) -> "TDigest":
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self._buffer_limit:
+            self.compress()
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        if other.count == 0:
+            return self
+        self._buffer.extend(zip(other._means, other._weights))
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self._buffer) >= self._buffer_limit:
+            self.compress()
+        return self
+
+    def _k(self, q: float) -> float:
+        # funcion de escala k1: centroides pequeños cerca de q=0 y q=1
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k: float) -> float:
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in items)
+
+        means, weights = [], []
+        q0 = 0.0
+        q_limit = self._q(self._k(q0) + 1)
+        mean, weight = items[0]
+        for value, w in items[1:]:
+            if q0 + (weight + w) / total <= q_limit:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                q0 += weight / total
+                q_limit = self._q(min(self._k(q0) + 1, self.compression / 4))
+                mean, weight = value, w
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float):
+        """Valor aproximado del cuantil q (0..1); None si el digest esta vacio."""
+        self.compress()
+        if not self._means:
+            return None
+        if len(self._means) == 1:
+            return self._means[0]
+        q = min(max(q, 0.0), 1.0)
+        target = q * self.count
+
+        # cada centroide cubre [acumulado, acumulado + peso]; se interpola entre sus centros
+        first, last = self._weights[0], self._weights[-1]
+        if target <= first / 2:
+            return self.min + (self._means[0] - self.min) * target / (first / 2)
+        if target >= self.count - last / 2:
+            return self.max - (self.max - self._means[-1]) * (self.count - target) / (last / 2)
+
+        cumulative = 0.0
+        for i in range(len(self._means) - 1):
+            left = cumulative + self._weights[i] / 2
+            right = cumulative + self._weights[i] + self._weights[i + 1] / 2
+            if target <= right:
+                fraction = (target - left) / (right - left)
+                return self._means[i] + (self._means[i + 1] - self._means[i]) * fraction
+            cumulative += self._weights[i]
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Representacion compacta para guardar en Mongo."""
+        self.compress()
+        return {
+            "compression": self.compression,
+            "means": self._means,
+            "weights": self._weights,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(data.get("compression", DEFAULT_COMPRESSION))
+        digest._means = list(data.get("means", []))
+        digest._weights = list(data.get("weights", []))
+        digest.count = float(sum(digest._weights))
+        if digest.count:
+            digest.min = data["min"]
+            digest.max = data["max"]
+        return digest
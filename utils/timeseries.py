@@ -0,0 +1,62 @@
+"""
+Buckets de tiempo (day, week, month) para las series de /statistics/timeseries.
+
+Los rangos se alinean a buckets completos, asi el resultado de un bucket que
+ya termino no cambia y se guarda en memoria sin volver a calcularse. Solo se
+guarda pasado TIMESERIES_CLOSE_GRACE desde su cierre (ordenes que todavia se
+estaban escribiendo en el limite) y con un TTL finito. Las claves llevan la
+generacion de OrderStats (utils/order_stats.py): un rebuild o la migracion de
+created_at la incrementan y todos los workers dejan de usar lo cacheado.
+"""
+import os
+from datetime import datetime, timedelta
+
+from utils.cache import TTLCache
+
+BUCKET_UNITS = ("day", "week", "month")
+MAX_TIMESERIES_BUCKETS = int(os.getenv("MAX_TIMESERIES_BUCKETS", "400"))
+
+TIMESERIES_CACHE_TTL = float(os.getenv("TIMESERIES_CACHE_TTL", "3600"))
+TIMESERIES_CLOSE_GRACE = timedelta(seconds=float(os.getenv("TIMESERIES_CLOSE_GRACE_SECONDS", "300")))
+
+# (generacion, unit, inicio del bucket) -> totales; solo buckets cerrados hace mas de la gracia
+closed_buckets = TTLCache(maxsize=int(os.getenv("TIMESERIES_CACHE_SIZE", "20000")), ttl=TIMESERIES_CACHE_TTL)
+
+
+def bucket_start(when: datetime, unit: str) -> datetime:
+    day = datetime(when.year, when.month, when.day)
+    if unit == "day":
+        return day
+    if unit == "week":
+        # semanas de lunes a domingo, igual que $dateTrunc con startOfWeek "monday"
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return datetime(when.year, when.month, 1)
+    raise ValueError(f"Unknown bucket unit {unit}")
+
+
+def next_bucket(start: datetime, unit: str) -> datetime:
+    if unit == "day":
+        return start + timedelta(days=1)
+    if unit == "week":
+        return start + timedelta(weeks=1)
+    if unit == "month":
+        return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    raise ValueError(f"Unknown bucket unit {unit}")
+
+
+def is_settled(start: datetime, unit: str, now: datetime) -> bool:
+    """True si el bucket cerro hace mas de TIMESERIES_CLOSE_GRACE y ya se puede cachear."""
+    return next_bucket(start, unit) + TIMESERIES_CLOSE_GRACE <= now
+
+
+def bucket_range(date_from: datetime, date_to: datetime, unit: str) -> list:
+    """Inicios de los buckets que tocan [date_from, date_to)."""
+    starts = []
+    start = bucket_start(date_from, unit)
+    while start < date_to:
+        starts.append(start)
+        if len(starts) > MAX_TIMESERIES_BUCKETS:
+            raise ValueError(f"Range can not exceed {MAX_TIMESERIES_BUCKETS} buckets")
+        start = next_bucket(start, unit)
+    return starts
@@ -0,0 +1,68 @@
+"""
+Cache de usuarios autenticados (email -> _id, admin, active).
+
+Las rutas de escritura de citas necesitan el _id y el flag admin del usuario
+del token en cada request; en vez de ir a Users cada vez se sirven desde una
+cache LRU+TTL. Cualquier escritura en Users debe llamar a invalidate().
+"""
+import os
+
+from fastapi import HTTPException, Request
+
+from utils.cache import TTLCache
+from utils.mongodb import get_collection
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+USER_PROJECTION = {"_id": 1, "admin": 1, "active": 1}
+
+users_coll = get_collection("Users")
+
+
+def _to_entry(doc: dict) -> dict:
+    return {
+        "_id": doc["_id"],
+        "admin": bool(doc.get("admin", False)),
+        "active": bool(doc.get("active", True)),
+    }
+
+
+class UserCache:
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, email: str):
+        """Usuario por email; los que no existen no se cachean (se pueden crear en cualquier momento)."""
+        entry = self._cache.get(email)
+        if entry is None:
+            doc = await users_coll.find_one({"email": email}, USER_PROJECTION)
+            if not doc:
+                return None
+            entry = _to_entry(doc)
+            self._cache.set(email, entry)
+        return entry
+
+    def put(self, email: str, doc: dict):
+        """Guarda un documento de Users ya leido (p.ej. en el login)."""
+        self._cache.set(email, _to_entry(doc))
+
+    def invalidate(self, email: str = None):
+        if email is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(email)
+
+
+user_cache = UserCache()
+
+
+async def get_request_user(request: Request) -> dict:
+    """Usuario del token (request.state.email) resuelto por la cache."""
+    user = await user_cache.get(request.state.email)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not user["active"]:
+        raise HTTPException(status_code=401, detail="Inactive user")
+    return user